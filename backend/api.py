@@ -1,44 +1,260 @@
 from __future__ import annotations
 
+import asyncio
+import gzip
 import hashlib
-import secrets
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, List, Optional
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 from uuid import uuid4
 
-import requests
-from fastapi import Depends, FastAPI, File, Header, HTTPException, Query, UploadFile, Response
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi import Depends, FastAPI, File, Header, HTTPException, Query, Request, UploadFile, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
 from pydantic import BaseModel
 
-from core.ppt_parser import Slide, parse_ppt
-from core.vector_store import index_ppt_file, query_similar_slides
-from core.llm_agent import AgentConfig, expand_slide_with_tools
-
-import markdown
-
-try: 
-    from weasyprint import HTML  
-except Exception:  
-    HTML = None  
+from core.ppt_parser import Slide, SlideDeck, parse_ppt
+from core.vector_store import (
+    assign_deck_shard,
+    compact_vector_store,
+    delete_deck_vectors,
+    embed_texts,
+    get_client,
+    index_slides,
+    query_across_shards,
+    query_similar_slides,
+    slide_content_hash,
+    update_indexed_slides,
+)
+from core.llm_agent import (
+    AgentConfig,
+    expand_slide_with_tools,
+    expand_slides_batched,
+    group_small_slides,
+    is_placeholder_output,
+    preload_llm_client,
+    retrieval_query_text,
+)
+from core.lifecycle import DeckActivity
+from core.metrics import (
+    HTTP_INFLIGHT,
+    HTTP_REQUESTS,
+    HTTP_SECONDS,
+    NOTE_CACHE,
+    PREFETCH,
+    WARM_PENDING,
+    render_prometheus,
+)
+from core import note_store
+from core.auth import (
+    USER_STORE,
+    TokenExpired,
+    TokenInvalid,
+    authenticate,
+    hash_password,
+    issue_token,
+    verify_admin_token,
+    verify_token,
+)
+from core.downloader import DownloadError, DownloadTooLarge, InvalidPackage, download_file
+from core.profiling import (
+    ProfilingExecutor,
+    check_admin_token,
+    finish_profile,
+    list_profiles,
+    merge_profiles,
+    profile_reason,
+    read_profile,
+    start_profile,
+)
+from core.pdf_export import (
+    PdfRendererUnavailable,
+    build_deck_html,
+    build_note_html,
+    render_pdf,
+    shutdown_pdf_pool,
+)
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR = Path(os.getenv("PPT_AGENT_UPLOAD_DIR", str(BASE_DIR / "uploads")))
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 FRONTEND_DIR = BASE_DIR / "frontend"
 
 
-app = FastAPI(title="PPT Agent Backend", version="0.1.0")
+# PPT 生命周期：
+# - PPT_AGENT_DECK_TTL_HOURS: 超过该时长未访问的 PPT 会被淘汰，0 表示不启用
+# - PPT_AGENT_MAX_DECKS:      最多保留的 PPT 数，超出时按 LRU 淘汰，0 表示不限
+# - PPT_AGENT_EVICT_INTERVAL: 后台淘汰检查的间隔秒数
+DECK_TTL_HOURS_ENV = "PPT_AGENT_DECK_TTL_HOURS"
+MAX_DECKS_ENV = "PPT_AGENT_MAX_DECKS"
+EVICT_INTERVAL_ENV = "PPT_AGENT_EVICT_INTERVAL"
+
+# 解析、向量检索与 LLM 调用等阻塞操作通过 asyncio.to_thread 在线程池中执行。
+# - PPT_AGENT_BLOCKING_WORKERS: 该线程池大小，即同时进行的 /expand 等阻塞请求上限；
+#   默认值（CPU 数 + 4）在小容器上只有 5 左右，LLM 调用以等待为主，因此默认放宽到 32
+BLOCKING_WORKERS_ENV = "PPT_AGENT_BLOCKING_WORKERS"
+
+# 重量级依赖（chromadb、嵌入模型、langchain_openai、python-pptx）均在首次使用时才加载。
+# - PPT_AGENT_PRELOAD: 默认 1，服务启动后立即在后台预加载，完成前 /ready 返回 503；
+#   设为 0 时由第一次 /ready 请求触发
+PRELOAD_ENV = "PPT_AGENT_PRELOAD"
+
+
+_preload_task: Optional[asyncio.Future] = None
+
+
+def _preload_dependencies() -> Dict[str, bool]:
+    """加载并检查各项重量级依赖，返回 检查项 -> 是否可用。"""
+
+    checks: Dict[str, bool] = {}
+    steps = (
+        ("vector_store", lambda: get_client().heartbeat()),
+        ("embedding", lambda: embed_texts(["warmup"])),
+        ("llm_client", preload_llm_client),
+        ("ppt_parser", lambda: __import__("pptx")),
+    )
+    for name, step in steps:
+        try:
+            step()
+            checks[name] = True
+        except Exception:
+            checks[name] = False
+    return checks
+
+
+def _start_preload() -> asyncio.Future:
+    global _preload_task
+    if _preload_task is None:
+        _preload_task = asyncio.ensure_future(asyncio.to_thread(_preload_dependencies))
+    return _preload_task
+
+
+async def _lifecycle_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(evict_inactive_decks)
+        except Exception:
+            # 淘汰失败不影响主服务，下一轮重试
+            pass
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # 线程池任务会计入发起请求的采样剖析（见 core.profiling）
+    asyncio.get_running_loop().set_default_executor(
+        ProfilingExecutor(
+            max_workers=max(1, int(os.getenv(BLOCKING_WORKERS_ENV, "32"))),
+            thread_name_prefix="blocking",
+        )
+    )
+    if os.getenv(PRELOAD_ENV, "1").strip().lower() not in {"0", "false", "no", "off"}:
+        _start_preload()
+    interval = float(os.getenv(EVICT_INTERVAL_ENV, "600"))
+    task: Optional[asyncio.Task] = None
+    if interval > 0 and (_deck_ttl_seconds() > 0 or _max_decks() > 0):
+        task = asyncio.create_task(_lifecycle_loop(interval))
+    yield
+    if task is not None:
+        task.cancel()
+    shutdown_pdf_pool()
+
+
+app = FastAPI(title="PPT Agent Backend", version="0.1.0", lifespan=lifespan)
 app.mount("/ui", StaticFiles(directory=str(FRONTEND_DIR), html=True), name="ui")
 
 
-# 简单的内存存储：ppt_id -> List[Slide]
-PPT_SLIDES: Dict[str, List[Slide]] = {}
+def _route_label(request: Request) -> str:
+    """返回请求匹配到的路由模板（如 /decks/{ppt_id}），避免 ppt_id 造成指标标签膨胀。"""
+
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "unmatched"
 
-USERS: Dict[str, str] = {}
-TOKENS: Dict[str, str] = {}
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """记录每个接口的请求数、耗时与并发数；管理员令牌或随机采样命中时对该请求做采样剖析。"""
+
+    start = time.perf_counter()
+    label = _route_label(request)
+    HTTP_INFLIGHT.inc(route=label)
+    reason = profile_reason(request.headers)
+    profile = start_profile(request.method, label, reason) if reason is not None else None
+    status = 500
+    response = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        if profile is not None:
+            info = finish_profile(profile, status)
+            if response is not None and info is not None and info.reason == "admin":
+                response.headers["X-Profile-Id"] = info.id
+        HTTP_INFLIGHT.dec(route=label)
+        HTTP_SECONDS.observe(time.perf_counter() - start, route=label)
+        HTTP_REQUESTS.inc(method=request.method, route=label, status=status)
+
+
+# 简单的内存存储：ppt_id -> SlideDeck（按列紧凑存储，用法同 List[Slide]）
+PPT_SLIDES: Dict[str, SlideDeck] = {}
+# ppt_id -> 上传者用户名
+DECK_OWNERS: Dict[str, str] = {}
+DECK_ACTIVITY = DeckActivity()
+# ppt_id -> 预先序列化好的 /slides 响应（上传时生成，PPT 内容不变则一直复用）
+SLIDES_PAYLOADS: Dict[str, "SlidesPayload"] = {}
+# 上传写入（内存、向量库、笔记重映射）按 ppt_id 互斥，不同 PPT 的上传互不阻塞；
+# 只要还有上传持有或等待某个锁，它就留在表中，全部结束后自动移除
+_STORE_DECK_LOCKS: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_STORE_DECK_LOCKS_GUARD = threading.Lock()
+# 保存生成结果前的“PPT 仍存在且该页内容未变”检查与保存本身，和删除 PPT、
+# 重新上传时替换内容并重映射笔记互斥，避免写回孤立或过期的笔记
+_NOTE_SAVE_LOCK = threading.Lock()
+
+# 预热模式：上传后在后台低优先级地为整份 PPT 生成笔记并落盘。
+# - PPT_AGENT_WARM_NOTES: 设为 1/true 时默认开启，单次上传也可通过 warm 参数覆盖
+# - PPT_AGENT_WARM_WORKERS: 后台生成线程数，默认 1，避免挤占交互式 /expand
+WARM_NOTES_ENV = "PPT_AGENT_WARM_NOTES"
+WARM_WORKERS_ENV = "PPT_AGENT_WARM_WORKERS"
+
+_WARM_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(1, int(os.getenv(WARM_WORKERS_ENV, "1"))),
+    thread_name_prefix="warm-notes",
+)
+# 正在后台生成中的笔记：(ppt_id, slide_index, 页面内容哈希) -> Future。
+# 键中带内容哈希：重新上传改动某页后，旧内容的生成（无法取消时）不会被当作新内容的结果
+_NoteKey = Tuple[str, int, str]
+NOTE_FUTURES: Dict[_NoteKey, Future] = {}
+
+# 预取：展开第 N 页时，在同一后台线程池中低优先级地生成之后几页与检索近邻页的笔记，
+# 下一次点击大多可直接命中已完成的结果。
+# - PPT_AGENT_PREFETCH_AHEAD:      预取之后的页数，默认 2
+# - PPT_AGENT_PREFETCH_NEIGHBOURS: 预取与当前页最相似的页数，默认 1；两项均为 0 时关闭预取
+# - PPT_AGENT_PREFETCH_BUDGET:     每个用户同时排队/生成中的预取上限，默认 4
+PREFETCH_AHEAD_ENV = "PPT_AGENT_PREFETCH_AHEAD"
+PREFETCH_NEIGHBOURS_ENV = "PPT_AGENT_PREFETCH_NEIGHBOURS"
+PREFETCH_BUDGET_ENV = "PPT_AGENT_PREFETCH_BUDGET"
+
+# 用户名 -> 该用户发起且尚未完成的预取（键同 NOTE_FUTURES）
+PREFETCH_KEYS: Dict[str, Set[_NoteKey]] = {}
+# 用户名 -> 最近一次调度的序号，用于丢弃过期的近邻预取
+_PREFETCH_GENERATION: Dict[str, int] = {}
+_PREFETCH_LOCK = threading.Lock()
 
 
 class SlideOut(BaseModel):
@@ -52,6 +268,9 @@ class UploadResponse(BaseModel):
     ppt_id: str
     filename: str
     num_slides: int
+    # 仅在重新上传已有 PPT 时有值：新增/修改的页与被删除的页
+    changed_slides: List[int] = []
+    removed_slides: List[int] = []
 
 
 class SearchHit(BaseModel):
@@ -86,10 +305,492 @@ class AuthResponse(BaseModel):
 
 class UploadUrlRequest(BaseModel):
     url: str
+    warm: Optional[bool] = None
+    ppt_id: Optional[str] = None
+    course: Optional[str] = None
+
+
+class DeleteDeckResponse(BaseModel):
+    ppt_id: str
+    deleted_vectors: int
+
+
+class DeckNote(BaseModel):
+    slide_index: int
+    title: str
+    expanded_markdown: str
+
+
+# 超过该大小的 /slides 响应额外预先生成 gzip 版本
+SLIDES_GZIP_MIN_BYTES = 1024
 
 
-def _hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode("utf-8")).hexdigest()
+@dataclass(frozen=True)
+class SlidesPayload:
+    """整份 PPT 的 /slides 响应体（JSON 字节）及其 gzip 版本与强 ETag。
+
+    starts[i] 为第 i 页 JSON 片段在 body 中的起始位置（最后一项为“下一片段”的起始位置），
+    第 i..j 页即 body[starts[i]:starts[j] - 1]，分页请求直接切片，无需重新序列化。
+    """
+
+    body: bytes
+    gzip_body: Optional[bytes]
+    etag: str
+    starts: array
+
+
+def build_slides_payload(slides: Sequence[Slide]) -> SlidesPayload:
+    fragments = [
+        json.dumps(
+            {"index": s.index, "title": s.title, "bullets": list(s.bullets), "notes": s.notes},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        for s in slides
+    ]
+    starts = array("I")
+    pos = 1
+    for frag in fragments:
+        starts.append(pos)
+        pos += len(frag) + 1
+    starts.append(pos)
+
+    body = b"[" + b",".join(fragments) + b"]"
+    gzip_body = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= SLIDES_GZIP_MIN_BYTES else None
+    return SlidesPayload(
+        body=body,
+        gzip_body=gzip_body,
+        etag=hashlib.sha256(body).hexdigest()[:32],
+        starts=starts,
+    )
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 采用弱比较：忽略 W/ 前缀，支持逗号分隔的多个值与 *。"""
+
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _warm_enabled(flag: Optional[bool]) -> bool:
+    if flag is not None:
+        return flag
+    return os.getenv(WARM_NOTES_ENV, "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _save_note_if_current(ppt_id: str, slide: Slide, expanded: str, use_wikipedia: bool = True) -> bool:
+    """保存生成结果；PPT 已删除或该页内容已被重新上传改变时丢弃，返回是否保存。
+
+    Future.cancel() 只能取消尚未开始的任务，已在生成中的笔记靠这里避免写回过期内容。
+    """
+
+    return bool(_save_notes_if_current(ppt_id, [(slide, expanded)], use_wikipedia=use_wikipedia))
+
+
+def _save_notes_if_current(
+    ppt_id: str, results: Sequence[Tuple[Slide, str]], use_wikipedia: bool = True
+) -> List[int]:
+    """批量版 _save_note_if_current：一组页面只写一次盘，返回实际保存的页面索引。"""
+
+    with _NOTE_SAVE_LOCK:
+        deck = PPT_SLIDES.get(ppt_id)
+        if deck is None:
+            return []
+        fresh: Dict[int, str] = {}
+        for slide, expanded in results:
+            current = deck.get_by_index(slide.index)
+            if is_placeholder_output(expanded) or current is None:
+                continue
+            if slide_content_hash(current) == slide_content_hash(slide):
+                fresh[slide.index] = expanded
+        note_store.save_notes(ppt_id, fresh, use_wikipedia=use_wikipedia)
+        return sorted(fresh)
+
+
+def _generate_note(ppt_id: str, slide: Slide, use_wikipedia: bool = True) -> str:
+    """生成单页笔记并写入 note_store；已有缓存时直接返回。"""
+
+    cached = note_store.get_note(ppt_id, slide.index, use_wikipedia=use_wikipedia)
+    if cached is not None:
+        return cached
+
+    cfg = AgentConfig(use_wikipedia=use_wikipedia, top_k_slides=5, top_k_wiki=3)
+    expanded = expand_slide_with_tools(slide, config=cfg, ppt_id=ppt_id)
+    _save_note_if_current(ppt_id, slide, expanded, use_wikipedia=use_wikipedia)
+    return expanded
+
+
+def _note_key(ppt_id: str, slide: Slide) -> _NoteKey:
+    return (ppt_id, slide.index, slide_content_hash(slide))
+
+
+def _warm_done(key: _NoteKey) -> None:
+    NOTE_FUTURES.pop(key, None)
+    WARM_PENDING.dec()
+
+
+def _generate_notes(ppt_id: str, slides: Sequence[Slide], use_wikipedia: bool = True) -> Dict[int, str]:
+    """为一组相邻的小页面生成笔记（打包进一次 LLM 调用）并写入 note_store，返回 {页面索引: 笔记}。"""
+
+    notes: Dict[int, str] = {}
+    pending: List[Slide] = []
+    for slide in slides:
+        cached = note_store.get_note(ppt_id, slide.index, use_wikipedia=use_wikipedia)
+        if cached is not None:
+            notes[slide.index] = cached
+        else:
+            pending.append(slide)
+
+    cfg = AgentConfig(use_wikipedia=use_wikipedia, top_k_slides=5, top_k_wiki=3)
+    by_index = {slide.index: slide for slide in pending}
+    generated = expand_slides_batched(pending, config=cfg, ppt_id=ppt_id)
+    _save_notes_if_current(
+        ppt_id, [(by_index[index], expanded) for index, expanded in generated.items()], use_wikipedia=use_wikipedia
+    )
+    notes.update(generated)
+    return notes
+
+
+def _warm_note_group(ppt_id: str, slides: Sequence[Slide], slide_futures: Dict[int, Future]) -> Dict[int, str]:
+    # 排队期间被单独取消的页面（如重新上传时内容已变）不再生成，避免写回过期笔记
+    live = [slide for slide in slides if not slide_futures[slide.index].cancelled()]
+    return _generate_notes(ppt_id, live)
+
+
+def _resolve_slide_futures(group_future: Future, slide_futures: Dict[int, Future]) -> None:
+    """打包生成完成后，把结果分发到各页在 NOTE_FUTURES 中的 Future。"""
+
+    for index, fut in slide_futures.items():
+        if fut.done():
+            continue
+        try:
+            if group_future.cancelled():
+                fut.cancel()
+            elif group_future.exception() is not None:
+                fut.set_exception(group_future.exception())
+            else:
+                fut.set_result(group_future.result()[index])
+        except InvalidStateError:
+            # 该页已被单独取消
+            pass
+
+
+def _cancel_group_if_unused(group_future: Future, slide_futures: Dict[int, Future]) -> None:
+    # 组内各页都被取消（删除 PPT、重新上传改动了这些页）时才取消整组的生成
+    if all(fut.cancelled() for fut in slide_futures.values()):
+        group_future.cancel()
+
+
+def schedule_deck_warmup(ppt_id: str, slides: Sequence[Slide]) -> int:
+    """将整份 PPT 中尚无笔记的页面提交到后台线程池，返回新提交的页数。
+
+    相邻的小页面按组提交，一组只调用一次 LLM；每页仍在 NOTE_FUTURES 中有各自的 Future，
+    /expand 等待与取消的方式与逐页生成相同。
+    """
+
+    existing = note_store.load_deck_notes(ppt_id, use_wikipedia=True)
+    todo = [
+        slide for slide in slides if slide.index not in existing and _note_key(ppt_id, slide) not in NOTE_FUTURES
+    ]
+    for group in group_small_slides(todo):
+        if len(group) == 1:
+            key = _note_key(ppt_id, group[0])
+            fut = _WARM_EXECUTOR.submit(_generate_note, ppt_id, group[0])
+            NOTE_FUTURES[key] = fut
+            WARM_PENDING.inc()
+            fut.add_done_callback(lambda _f, k=key: _warm_done(k))
+            continue
+
+        slide_futures: Dict[int, Future] = {slide.index: Future() for slide in group}
+        for slide in group:
+            key, fut = _note_key(ppt_id, slide), slide_futures[slide.index]
+            NOTE_FUTURES[key] = fut
+            WARM_PENDING.inc()
+            fut.add_done_callback(lambda _f, k=key: _warm_done(k))
+        group_future = _WARM_EXECUTOR.submit(_warm_note_group, ppt_id, group, slide_futures)
+        group_future.add_done_callback(lambda f, sf=slide_futures: _resolve_slide_futures(f, sf))
+        for fut in slide_futures.values():
+            fut.add_done_callback(
+                lambda _f, gf=group_future, sf=slide_futures: _cancel_group_if_unused(gf, sf)
+            )
+    return len(todo)
+
+
+def _prefetch_done(username: str, key: _NoteKey) -> None:
+    _warm_done(key)
+    with _PREFETCH_LOCK:
+        keys = PREFETCH_KEYS.get(username)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                PREFETCH_KEYS.pop(username, None)
+
+
+def _submit_prefetch_locked(username: str, ppt_id: str, slide: Slide) -> bool:
+    key = _note_key(ppt_id, slide)
+    if key in NOTE_FUTURES or note_store.get_note(ppt_id, slide.index) is not None:
+        return False
+    keys = PREFETCH_KEYS.setdefault(username, set())
+    if len(keys) >= max(0, int(os.getenv(PREFETCH_BUDGET_ENV, "4"))):
+        PREFETCH.inc(result="over_budget")
+        return False
+    fut = _WARM_EXECUTOR.submit(_generate_note, ppt_id, slide)
+    NOTE_FUTURES[key] = fut
+    keys.add(key)
+    WARM_PENDING.inc()
+    PREFETCH.inc(result="scheduled")
+    fut.add_done_callback(lambda _f, u=username, k=key: _prefetch_done(u, k))
+    return True
+
+
+def cancel_prefetch(username: str, keep: Optional[Set[_NoteKey]] = None) -> int:
+    """取消该用户尚未开始的预取（keep 中的除外），返回取消的个数；已在生成中的不受影响。
+
+    同时作废尚未执行的近邻检索。
+    """
+
+    with _PREFETCH_LOCK:
+        _PREFETCH_GENERATION[username] = _PREFETCH_GENERATION.get(username, 0) + 1
+        stale = [NOTE_FUTURES.get(key) for key in PREFETCH_KEYS.get(username, ()) if not keep or key not in keep]
+    # cancel() 会同步执行完成回调（需要获取 _PREFETCH_LOCK），因此在锁外调用
+    cancelled = sum(1 for fut in stale if fut is not None and fut.cancel())
+    if cancelled:
+        PREFETCH.inc(cancelled, result="cancelled")
+    return cancelled
+
+
+def _prefetch_neighbours(
+    username: str, generation: int, ppt_id: str, slide: Slide, exclude: Set[int], limit: int
+) -> None:
+    """在后台检索与当前页最相似的页面并预取；期间用户已翻到别处时放弃。"""
+
+    if _PREFETCH_GENERATION.get(username) != generation or ppt_id not in PPT_SLIDES:
+        return
+    query_text = retrieval_query_text(slide)
+    if not query_text:
+        return
+    raw = query_similar_slides(query_text, n_results=limit + len(exclude), ppt_id=ppt_id)
+    indexes: List[int] = []
+    for meta in raw.get("metadatas", [[]])[0]:
+        idx = int(meta.get("slide_index", 0)) if isinstance(meta, dict) else 0
+        if idx and idx not in exclude and idx not in indexes:
+            indexes.append(idx)
+    slides = PPT_SLIDES.get(ppt_id)
+    if slides is None:
+        return
+    with _PREFETCH_LOCK:
+        if _PREFETCH_GENERATION.get(username) != generation:
+            return
+        for idx in indexes[:limit]:
+            neighbour = slides.get_by_index(idx)
+            if neighbour is not None:
+                _submit_prefetch_locked(username, ppt_id, neighbour)
+
+
+def schedule_prefetch(username: str, ppt_id: str, slides: SlideDeck, slide: Slide) -> int:
+    """展开某一页时调度预取，返回立即提交的页数（近邻页在后台检索后再提交）。
+
+    同一用户每次只保留最新一次展开对应的预取：此前排队中、不在新目标内的预取会被取消。
+    """
+
+    ahead = max(0, int(os.getenv(PREFETCH_AHEAD_ENV, "2")))
+    neighbours = max(0, int(os.getenv(PREFETCH_NEIGHBOURS_ENV, "1")))
+    if ahead == 0 and neighbours == 0:
+        return 0
+
+    targets = [s for s in (slides.get_by_index(slide.index + k) for k in range(1, ahead + 1)) if s is not None]
+    keep = {_note_key(ppt_id, s) for s in [*targets, slide]}
+    cancel_prefetch(username, keep=keep)
+
+    with _PREFETCH_LOCK:
+        generation = _PREFETCH_GENERATION[username]
+        submitted = sum(_submit_prefetch_locked(username, ppt_id, s) for s in targets)
+    if neighbours > 0:
+        # 近邻检索需要一次嵌入与向量查询，放到后台线程池中，排在之后几页的预取之后
+        _WARM_EXECUTOR.submit(
+            _prefetch_neighbours, username, generation, ppt_id, slide, {key[1] for key in keep}, neighbours
+        )
+    return submitted
+
+
+def _get_deck(ppt_id: str) -> SlideDeck:
+    slides = PPT_SLIDES.get(ppt_id)
+    if slides is None:
+        raise HTTPException(status_code=404, detail="ppt_id 未找到，请先上传 PPT")
+    DECK_ACTIVITY.touch(ppt_id)
+    return slides
+
+
+def _deck_ttl_seconds() -> float:
+    return float(os.getenv(DECK_TTL_HOURS_ENV, "0")) * 3600
+
+
+def _max_decks() -> int:
+    return int(os.getenv(MAX_DECKS_ENV, "0"))
+
+
+def delete_decks(ppt_ids: List[str]) -> int:
+    """删除若干 PPT 的全部数据（内存、上传文件、笔记、向量），返回删除的向量条数。"""
+
+    for ppt_id in ppt_ids:
+        with _NOTE_SAVE_LOCK:
+            PPT_SLIDES.pop(ppt_id, None)
+            note_store.delete_deck_notes(ppt_id)
+        SLIDES_PAYLOADS.pop(ppt_id, None)
+        DECK_OWNERS.pop(ppt_id, None)
+        DECK_ACTIVITY.forget(ppt_id)
+        for key, fut in list(NOTE_FUTURES.items()):
+            if key[0] == ppt_id:
+                fut.cancel()
+        (UPLOAD_DIR / f"{ppt_id}.pptx").unlink(missing_ok=True)
+    return delete_deck_vectors(ppt_ids)
+
+
+def evict_inactive_decks(now: Optional[float] = None) -> List[str]:
+    """按 TTL / LRU 配置淘汰不活跃的 PPT，返回被淘汰的 ppt_id。
+
+    同时清理 uploads/ 中已不在内存里（例如服务重启前上传）且超过 TTL 的文件。
+    """
+
+    ts = time.time() if now is None else now
+    ttl = _deck_ttl_seconds()
+    doomed = DECK_ACTIVITY.select_evictions(ttl_seconds=ttl, max_decks=_max_decks(), now=ts, live=PPT_SLIDES)
+
+    if ttl > 0:
+        for path in UPLOAD_DIR.glob("*.pptx"):
+            ppt_id = path.name.split(".", 1)[0]
+            if ppt_id in PPT_SLIDES or ppt_id in doomed:
+                continue
+            if ts - path.stat().st_mtime > ttl:
+                path.unlink(missing_ok=True)
+                doomed.append(ppt_id)
+
+    if doomed:
+        delete_decks(doomed)
+    return doomed
+
+
+def _hits_from_query(raw: Dict, top_k: int, ppt_ids: set) -> List[SearchHit]:
+    ids_batch = raw.get("ids", [[]])[0]
+    metas_batch = raw.get("metadatas", [[]])[0]
+    docs_batch = raw.get("documents", [[]])[0]
+    dists_batch = raw.get("distances", [[]])[0]
+
+    hits: List[SearchHit] = []
+    for sid, meta, doc, dist in zip(ids_batch, metas_batch, docs_batch, dists_batch):
+        if not isinstance(meta, dict):
+            continue
+        if meta.get("ppt_id") not in ppt_ids:
+            continue
+        hits.append(
+            SearchHit(
+                ppt_id=str(meta.get("ppt_id")),
+                slide_index=int(meta.get("slide_index", 0)),
+                title=str(meta.get("title", "")),
+                score=float(dist),
+                snippet=doc[:300],
+            )
+        )
+        if len(hits) >= top_k:
+            break
+
+    return hits
+
+
+def _resolve_upload_target(ppt_id: Optional[str], username: str) -> Tuple[str, Path]:
+    """返回 (ppt_id, 本次写入路径)。
+
+    指定已有 ppt_id 时只允许上传者本人覆盖；新文件先写入本次请求独有的临时文件，
+    解析成功后才替换原文件，避免新文件损坏导致旧版本一并丢失，也避免并发的重新上传互相覆盖。
+    """
+
+    if ppt_id:
+        _get_deck(ppt_id)
+        owner = DECK_OWNERS.get(ppt_id)
+        if owner and owner != username:
+            raise HTTPException(status_code=403, detail="只能重新上传自己上传的 PPT")
+        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=f"{ppt_id}.", suffix=".incoming.pptx")
+        os.close(fd)
+        return ppt_id, Path(tmp_name)
+
+    new_id = uuid4().hex
+    return new_id, UPLOAD_DIR / f"{new_id}.pptx"
+
+
+def _store_deck(
+    ppt_id: str,
+    src_path: Path,
+    slides: List[Slide],
+    filename: str,
+    warm: Optional[bool],
+    username: str,
+    course: Optional[str] = None,
+) -> UploadResponse:
+    """将解析结果写入内存与向量库；已有 PPT 只增量更新变化的页面。
+
+    在线程池中执行；同一 PPT 同一时刻只允许一个上传写入，避免两次重新上传交错。
+    """
+
+    with _STORE_DECK_LOCKS_GUARD:
+        lock = _STORE_DECK_LOCKS.setdefault(ppt_id, threading.Lock())
+    with lock:
+        return _store_deck_locked(ppt_id, src_path, slides, filename, warm, username, course)
+
+
+def _store_deck_locked(
+    ppt_id: str,
+    src_path: Path,
+    slides: List[Slide],
+    filename: str,
+    warm: Optional[bool],
+    username: str,
+    course: Optional[str],
+) -> UploadResponse:
+    DECK_OWNERS.setdefault(ppt_id, username)
+    DECK_ACTIVITY.touch(ppt_id)
+    resp = UploadResponse(ppt_id=ppt_id, filename=filename, num_slides=len(slides))
+    if ppt_id in PPT_SLIDES:
+        src_path.replace(UPLOAD_DIR / f"{ppt_id}.pptx")
+        diff = update_indexed_slides(slides, ppt_id=ppt_id)
+        # 替换内容与重映射笔记一起完成：之前保存的笔记都按旧页码，之后的按新页码
+        with _NOTE_SAVE_LOCK:
+            PPT_SLIDES[ppt_id] = SlideDeck(slides)
+            SLIDES_PAYLOADS[ppt_id] = build_slides_payload(slides)
+            note_store.remap_deck_notes(ppt_id, diff.carried)
+        current = {_note_key(ppt_id, s) for s in slides}
+        stale = [key for key in list(NOTE_FUTURES) if key[0] == ppt_id and key not in current]
+        for key in stale:
+            # 旧内容的后台生成尚未开始时直接取消；已在生成中的由 _save_note_if_current 丢弃
+            pending = NOTE_FUTURES.get(key)
+            if pending is not None:
+                pending.cancel()
+        # 这些页面原本就在后台生成，按新内容重新提交，/expand 等到的是新内容的笔记
+        stale_indexes = {key[1] for key in stale}
+        rescheduled = [s for s in slides if s.index in stale_indexes]
+        resp.changed_slides = sorted(diff.added + diff.updated)
+        resp.removed_slides = diff.removed
+    else:
+        PPT_SLIDES[ppt_id] = SlideDeck(slides)
+        SLIDES_PAYLOADS[ppt_id] = build_slides_payload(slides)
+        assign_deck_shard(ppt_id, user=username, course=course)
+        index_slides(slides, ppt_id=ppt_id)
+        rescheduled = []
+
+    if _warm_enabled(warm):
+        schedule_deck_warmup(ppt_id, slides)
+    elif rescheduled:
+        schedule_deck_warmup(ppt_id, rescheduled)
+    return resp
 
 
 def get_current_user(authorization: str | None = Header(default=None)) -> str:
@@ -98,10 +799,12 @@ def get_current_user(authorization: str | None = Header(default=None)) -> str:
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="登录信息无效")
     token = authorization[len("Bearer ") :].strip()
-    username = TOKENS.get(token)
-    if not username:
+    try:
+        return verify_token(token)
+    except TokenExpired:
         raise HTTPException(status_code=401, detail="登录已过期")
-    return username
+    except TokenInvalid:
+        raise HTTPException(status_code=401, detail="登录信息无效")
 
 
 @app.get("/")
@@ -120,10 +823,10 @@ async def register(req: AuthRequest) -> Dict[str, str]:
         raise HTTPException(status_code=400, detail="用户名长度需为 4-32")
     if len(password) < 6:
         raise HTTPException(status_code=400, detail="密码至少 6 位")
-    if username in USERS:
+    # scrypt 计算约 50ms，SQLite 写入同样是阻塞调用，都放到线程池中，避免阻塞事件循环
+    pwd_hash = await run_in_threadpool(hash_password, password)
+    if not await run_in_threadpool(USER_STORE.create_user, username, pwd_hash):
         raise HTTPException(status_code=400, detail="用户名已存在")
-
-    USERS[username] = _hash_password(password)
     return {"status": "ok"}
 
 
@@ -132,55 +835,95 @@ async def login(req: AuthRequest) -> AuthResponse:
     username = (req.username or "").strip()
     password = req.password or ""
 
-    pwd_hash = USERS.get(username)
-    if not pwd_hash:
-        raise HTTPException(status_code=400, detail="用户名或密码错误")
-    if pwd_hash != _hash_password(password):
+    if not await run_in_threadpool(authenticate, username, password):
         raise HTTPException(status_code=400, detail="用户名或密码错误")
 
-    token = secrets.token_hex(24)
-    TOKENS[token] = username
+    token = issue_token(username)
     return AuthResponse(username=username, token=token)
 
 
 @app.get("/health")
 async def health_check() -> Dict[str, str]:
-    """后端健康检查接口。"""
+    """后端健康检查接口（存活检查）：进程可响应即返回，不依赖向量库等重量级组件。"""
 
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """就绪检查：向量库、嵌入模型、LLM 客户端与 PPT 解析器加载完成后返回 200，之前返回 503。
+
+    某项检查失败时同样返回 503，并在下一次请求时重新检查。
+    """
+
+    global _preload_task
+    task = _start_preload()
+    if not task.done():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+
+    checks = task.result()
+    ready = all(checks.values())
+    if not ready:
+        _preload_task = None
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "unavailable", "checks": checks},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """以 Prometheus 文本格式导出各阶段耗时、缓存命中、并发数与 token 用量。"""
+
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/upload", response_model=UploadResponse)
 async def upload_ppt(
     file: UploadFile = File(...),
-    _: str = Depends(get_current_user),
+    warm: Optional[bool] = Query(None, description="是否在后台预生成整份笔记，默认取 PPT_AGENT_WARM_NOTES"),
+    ppt_id: Optional[str] = Query(None, description="重新上传已有 PPT 时指定，仅增量更新变化的页面"),
+    course: Optional[str] = Query(None, description="所属课程，分片模式为 course 时用于路由向量库"),
+    username: str = Depends(get_current_user),
 ) -> UploadResponse:
     """上传 PPT 文件，解析并写入向量库。
 
-    返回生成的 ppt_id 以及解析到的页数。
+    返回生成的 ppt_id 以及解析到的页数。开启预热模式时，
+    会在后台为每一页排队生成扩展笔记。指定 ppt_id 时视为同一份 PPT 的新版本，
+    只对内容变化的页面重新向量化，未变化页面的笔记会被保留。
     """
 
     if not file.filename.lower().endswith(".pptx"):
         raise HTTPException(status_code=400, detail="仅支持 .pptx 文件")
 
-    ppt_id = uuid4().hex
-    dest_path = UPLOAD_DIR / f"{ppt_id}.pptx"
+    ppt_id, dest_path = _resolve_upload_target(ppt_id, username)
 
     content = await file.read()
     dest_path.write_bytes(content)
 
-    # 解析 PPT 并写入向量库
-    slides = parse_ppt(dest_path)
-    PPT_SLIDES[ppt_id] = slides
-    index_ppt_file(dest_path, ppt_id=ppt_id)
-
-    return UploadResponse(ppt_id=ppt_id, filename=file.filename, num_slides=len(slides))
+    # 解析 PPT 并写入向量库（CPU / 磁盘密集，放到线程池中执行，不阻塞事件循环）
+    try:
+        slides = await asyncio.to_thread(parse_ppt, dest_path)
+    except Exception:
+        dest_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="文件无法解析为 PPTX")
+
+    return await asyncio.to_thread(
+        _store_deck,
+        ppt_id,
+        dest_path,
+        slides,
+        filename=file.filename,
+        warm=warm,
+        username=username,
+        course=course,
+    )
 
 
 @app.post("/upload_url", response_model=UploadResponse)
 async def upload_ppt_by_url(
     req: UploadUrlRequest,
-    _: str = Depends(get_current_user),
+    username: str = Depends(get_current_user),
 ) -> UploadResponse:
     url = (req.url or "").strip()
     if not url:
@@ -197,62 +940,93 @@ async def upload_ppt_by_url(
     if not url.lower().split("?")[0].endswith(".pptx"):
         raise HTTPException(status_code=400, detail="仅支持 .pptx 文件 URL")
 
-    ppt_id = uuid4().hex
-    dest_path = UPLOAD_DIR / f"{ppt_id}.pptx"
+    ppt_id, dest_path = _resolve_upload_target(req.ppt_id, username)
 
-    max_bytes = 50 * 1024 * 1024
-    total = 0
+    # 异步下载：支持 Range 时分段并行并可续传，下载过程中即校验 PPTX 结构
     try:
-        resp = requests.get(url, stream=True, timeout=20)
-        resp.raise_for_status()
-        head_checked = False
-        with dest_path.open("wb") as f:
-            for chunk in resp.iter_content(chunk_size=1024 * 1024):
-                if not chunk:
-                    continue
-                if not head_checked:
-                    head_checked = True
-                    if not chunk.startswith(b"PK"):
-                        raise HTTPException(status_code=400, detail="URL 不是可直接下载的 .pptx 文件，请使用文件直链（例如 GitHub raw 链接或在链接后追加 ?raw=1）")
-                total += len(chunk)
-                if total > max_bytes:
-                    raise HTTPException(status_code=400, detail="文件过大，最大 50MB")
-                f.write(chunk)
-    except HTTPException:
-        if dest_path.exists():
-            dest_path.unlink(missing_ok=True)
-        raise
-    except Exception:
-        if dest_path.exists():
-            dest_path.unlink(missing_ok=True)
+        await download_file(url, dest_path, UPLOAD_DIR / ".partial", max_bytes=50 * 1024 * 1024)
+    except DownloadError as exc:
+        # 重新上传时的临时文件已预先创建
+        dest_path.unlink(missing_ok=True)
+        if isinstance(exc, DownloadTooLarge):
+            raise HTTPException(status_code=400, detail="文件过大，最大 50MB")
+        if isinstance(exc, InvalidPackage):
+            raise HTTPException(status_code=400, detail="URL 不是可直接下载的 .pptx 文件，请使用文件直链（例如 GitHub raw 链接或在链接后追加 ?raw=1）")
         raise HTTPException(status_code=400, detail="URL 下载失败")
 
     try:
-        slides = parse_ppt(dest_path)
+        slides = await asyncio.to_thread(parse_ppt, dest_path)
     except Exception:
         if dest_path.exists():
             dest_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail="下载的内容无法解析为 PPTX，请确认 URL 为可直接下载的 .pptx 文件")
-    PPT_SLIDES[ppt_id] = slides
-    index_ppt_file(dest_path, ppt_id=ppt_id)
-    return UploadResponse(ppt_id=ppt_id, filename=dest_path.name, num_slides=len(slides))
+    return await asyncio.to_thread(
+        _store_deck,
+        ppt_id,
+        dest_path,
+        slides,
+        filename=f"{ppt_id}.pptx",
+        warm=req.warm,
+        username=username,
+        course=req.course,
+    )
 
 
 @app.get("/slides", response_model=List[SlideOut])
 async def list_slides(
+    request: Request,
     ppt_id: str = Query(..., description="上传返回的 PPT 标识"),
+    offset: int = Query(0, ge=0, description="分页：从第几页（0 起）开始"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="分页：最多返回的页数，不传则返回全部"),
     _: str = Depends(get_current_user),
-) -> List[SlideOut]:
-    """列出某个 PPT 的所有页面结构。"""
+) -> Response:
+    """列出某个 PPT 的所有页面结构。
 
-    slides = PPT_SLIDES.get(ppt_id)
-    if slides is None:
-        raise HTTPException(status_code=404, detail="ppt_id 未找到，请先上传 PPT")
+    响应体在上传时即已序列化（较大时附带 gzip 版本），带强 ETag；
+    客户端携带 If-None-Match 且内容未变时返回 304。传入 limit 时按页切片返回，
+    响应头 X-Total-Count 给出总页数。
+    """
 
-    return [
-        SlideOut(index=s.index, title=s.title, bullets=s.bullets, notes=s.notes)
-        for s in slides
-    ]
+    slides = _get_deck(ppt_id)
+    payload = SLIDES_PAYLOADS.get(ppt_id)
+    if payload is None:
+        payload = SLIDES_PAYLOADS[ppt_id] = build_slides_payload(slides)
+
+    total = len(payload.starts) - 1
+    headers = {
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Total-Count": str(total),
+    }
+    paged = limit is not None or offset > 0
+    if paged:
+        begin = min(offset, total)
+        end = min(total, begin + limit) if limit is not None else total
+        etag = f"{payload.etag}-{begin}-{end}"
+    else:
+        etag = payload.etag
+
+    use_gzip = (
+        not paged
+        and payload.gzip_body is not None
+        and "gzip" in request.headers.get("accept-encoding", "").lower()
+    )
+    headers["ETag"] = f'"{etag}-gzip"' if use_gzip else f'"{etag}"'
+    if _etag_matches(request.headers.get("if-none-match"), f'"{etag}"') or _etag_matches(
+        request.headers.get("if-none-match"), f'"{etag}-gzip"'
+    ):
+        return Response(status_code=304, headers=headers)
+
+    if paged:
+        if begin == end:
+            body = b"[]"
+        else:
+            body = b"[" + payload.body[payload.starts[begin] : payload.starts[end] - 1] + b"]"
+        return Response(content=body, media_type="application/json", headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=payload.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
 
 
 @app.get("/search", response_model=List[SearchHit])
@@ -266,32 +1040,26 @@ async def search_slides(
 
     if not q.strip():
         raise HTTPException(status_code=400, detail="查询语句不能为空")
+    _get_deck(ppt_id)
 
-    raw = query_similar_slides(q, n_results=top_k * 3)
-    ids_batch = raw.get("ids", [[]])[0]
-    metas_batch = raw.get("metadatas", [[]])[0]
-    docs_batch = raw.get("documents", [[]])[0]
-    dists_batch = raw.get("distances", [[]])[0]
+    raw = await asyncio.to_thread(query_similar_slides, q, n_results=top_k, ppt_id=ppt_id)
+    return _hits_from_query(raw, top_k=top_k, ppt_ids={ppt_id})
 
-    hits: List[SearchHit] = []
-    for sid, meta, doc, dist in zip(ids_batch, metas_batch, docs_batch, dists_batch):
-        if not isinstance(meta, dict):
-            continue
-        if meta.get("ppt_id") != ppt_id:
-            continue
-        hits.append(
-            SearchHit(
-                ppt_id=ppt_id,
-                slide_index=int(meta.get("slide_index", 0)),
-                title=str(meta.get("title", "")),
-                score=float(dist),
-                snippet=doc[:300],
-            )
-        )
-        if len(hits) >= top_k:
-            break
 
-    return hits
+@app.get("/search_all", response_model=List[SearchHit])
+async def search_all_slides(
+    q: str = Query(..., description="查询语句，如某个知识点关键词"),
+    top_k: int = Query(5, ge=1, le=20, description="返回的最大结果数"),
+    username: str = Depends(get_current_user),
+) -> List[SearchHit]:
+    """在当前用户上传的全部 PPT 中检索：对相关分片做 fan-out 查询后合并 top-k。"""
+
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="查询语句不能为空")
+
+    own_decks = [pid for pid, owner in DECK_OWNERS.items() if owner == username and pid in PPT_SLIDES]
+    raw = await asyncio.to_thread(query_across_shards, q, n_results=top_k, ppt_ids=own_decks)
+    return _hits_from_query(raw, top_k=top_k, ppt_ids=set(own_decks))
 
 
 @app.get("/expand", response_model=ExpandResponse)
@@ -299,21 +1067,48 @@ async def expand_slide(
     ppt_id: str = Query(..., description="目标 PPT 标识"),
     slide_index: int = Query(..., ge=1, description="要扩展的页面索引（从 1 开始）"),
     use_wikipedia: bool = Query(True, description="是否启用外部知识"),
-    _: str = Depends(get_current_user),
+    refresh: bool = Query(False, description="忽略已保存的笔记并重新生成"),
+    username: str = Depends(get_current_user),
 ) -> ExpandResponse:
-    """为指定 PPT 的某一页生成扩展讲解（调用 Agent + Checklayer）。"""
+    """为指定 PPT 的某一页生成扩展讲解（调用 Agent + Checklayer）。
 
-    slides = PPT_SLIDES.get(ppt_id)
-    if slides is None:
-        raise HTTPException(status_code=404, detail="ppt_id 未找到，请先上传 PPT")
+    优先返回已保存的笔记；若该页正在后台预热生成，则等待其完成。
+    同时在后台预取之后几页与相似页的笔记（见 schedule_prefetch）。
+    """
+
+    slides = _get_deck(ppt_id)
 
-    slide_map = {s.index: s for s in slides}
-    slide = slide_map.get(slide_index)
+    slide = slides.get_by_index(slide_index)
     if slide is None:
         raise HTTPException(status_code=404, detail="指定的 slide_index 不存在")
-
-    cfg = AgentConfig(use_wikipedia=use_wikipedia, top_k_slides=5, top_k_wiki=3)
-    expanded = expand_slide_with_tools(slide, config=cfg, ppt_id=ppt_id)
+    if use_wikipedia:
+        # 后台笔记均按 use_wikipedia=True 生成，关闭外部知识时预取的结果用不上
+        schedule_prefetch(username, ppt_id, slides, slide)
+
+    expanded: Optional[str] = None
+    if not refresh:
+        expanded = note_store.get_note(ppt_id, slide_index, use_wikipedia=use_wikipedia)
+        if expanded is not None:
+            NOTE_CACHE.inc(result="hit")
+        pending = NOTE_FUTURES.get(_note_key(ppt_id, slide))
+        if expanded is None and pending is not None and use_wikipedia:
+            NOTE_CACHE.inc(result="pending")
+            try:
+                expanded = await asyncio.wrap_future(pending)
+            except Exception:
+                expanded = None
+            except asyncio.CancelledError:
+                # 排队中的预取被取消时改为当场生成；请求本身被取消时照常抛出
+                if not pending.cancelled():
+                    raise
+                expanded = None
+
+    if expanded is None:
+        NOTE_CACHE.inc(result="miss")
+        cfg = AgentConfig(use_wikipedia=use_wikipedia, top_k_slides=5, top_k_wiki=3)
+        # LLM 调用耗时数秒，必须放到线程池中，否则会阻塞其他所有请求
+        expanded = await asyncio.to_thread(expand_slide_with_tools, slide, config=cfg, ppt_id=ppt_id)
+        _save_note_if_current(ppt_id, slide, expanded, use_wikipedia=use_wikipedia)
 
     return ExpandResponse(
         ppt_id=ppt_id,
@@ -323,6 +1118,123 @@ async def expand_slide(
     )
 
 
+@app.delete("/prefetch")
+async def stop_prefetch(username: str = Depends(get_current_user)) -> Dict[str, int]:
+    """取消当前用户排队中的预取（如离开页面时），已在生成中的页面会照常完成并保存。"""
+
+    return {"cancelled": cancel_prefetch(username)}
+
+
+@app.get("/notes", response_model=List[DeckNote])
+async def list_notes(
+    ppt_id: str = Query(..., description="目标 PPT 标识"),
+    _: str = Depends(get_current_user),
+) -> List[DeckNote]:
+    """一次性返回某个 PPT 已生成（含后台预热）的全部笔记。"""
+
+    slides = _get_deck(ppt_id)
+
+    titles = {s.index: s.title for s in slides}
+    return [
+        DeckNote(slide_index=idx, title=titles.get(idx, ""), expanded_markdown=md)
+        for idx, md in note_store.load_deck_notes(ppt_id).items()
+        if idx in titles
+    ]
+
+
+@app.delete("/decks/{ppt_id}", response_model=DeleteDeckResponse)
+async def delete_deck(
+    ppt_id: str,
+    username: str = Depends(get_current_user),
+) -> DeleteDeckResponse:
+    """删除一份 PPT：上传文件、解析结果、已生成笔记以及向量库中的全部切片。"""
+
+    if ppt_id not in PPT_SLIDES:
+        raise HTTPException(status_code=404, detail="ppt_id 未找到，请先上传 PPT")
+    owner = DECK_OWNERS.get(ppt_id)
+    if owner and owner != username:
+        raise HTTPException(status_code=403, detail="只能删除自己上传的 PPT")
+
+    deleted = await asyncio.to_thread(delete_decks, [ppt_id])
+    return DeleteDeckResponse(ppt_id=ppt_id, deleted_vectors=deleted)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """全局维护操作会影响所有用户的数据，仅对持有管理员令牌（PPT_AGENT_ADMIN_TOKEN）的请求开放。"""
+
+    if not verify_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="维护操作需要管理员令牌")
+
+
+@app.post("/maintenance/evict", dependencies=[Depends(require_admin)])
+async def run_eviction() -> Dict[str, List[str]]:
+    """立即按 TTL / LRU 配置执行一次淘汰。"""
+
+    evicted = await asyncio.to_thread(evict_inactive_decks)
+    return {"evicted": evicted}
+
+
+@app.post("/maintenance/compact", dependencies=[Depends(require_admin)])
+async def compact_store() -> Dict[str, int]:
+    """压缩向量库，回收已删除 PPT 占用的空间，返回压缩前后的磁盘占用。"""
+
+    return await asyncio.to_thread(compact_vector_store)
+
+
+def require_profile_admin(x_profile_token: Optional[str] = Header(default=None)) -> None:
+    """剖析结果仅对持有 PPT_AGENT_PROFILE_TOKEN 的管理员开放（令牌只从请求头读取）。"""
+
+    ok = check_admin_token(x_profile_token)
+    if ok is None:
+        raise HTTPException(status_code=404, detail="未启用请求剖析")
+    if not ok:
+        raise HTTPException(status_code=403, detail="剖析令牌无效")
+
+
+@app.get("/debug/profiles", dependencies=[Depends(require_profile_admin)], response_model=None)
+async def get_profiles(
+    route: Optional[str] = Query(default=None, description="只看某个路由模板，如 /expand"),
+    merge: bool = Query(default=False, description="把这些剖析累加成一份 folded stacks"),
+) -> Dict[str, List[Dict]] | PlainTextResponse:
+    """列出本进程保存的剖析结果；merge=true 时返回累加后的 folded stacks，可直接绘制火焰图。"""
+
+    if merge:
+        return PlainTextResponse(merge_profiles(route))
+    return {"profiles": list_profiles(route)}
+
+
+@app.get("/debug/profiles/{profile_id}", dependencies=[Depends(require_profile_admin)])
+async def get_profile(profile_id: str) -> PlainTextResponse:
+    """返回单次剖析的 folded stacks（flamegraph.pl / speedscope / inferno 均可读取）。"""
+
+    text = read_profile(profile_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在或已被清理")
+    return PlainTextResponse(text)
+
+
+_PDF_UNAVAILABLE_DETAIL = (
+    "当前环境未完整安装 WeasyPrint 所需的系统依赖，"
+    "可在 Docker / 服务器环境中启用 PDF 导出，"
+    "本地调试时请先忽略该功能。"
+)
+
+
+async def _pdf_response(document: str, filename: str) -> Response:
+    try:
+        pdf_bytes = await render_pdf(document)
+    except PdfRendererUnavailable:
+        raise HTTPException(status_code=500, detail=_PDF_UNAVAILABLE_DETAIL)
+
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename=\"{filename}\"",
+        },
+    )
+
+
 @app.post("/export_note_pdf")
 async def export_note_pdf(payload: NoteExportRequest) -> Response:
     """根据前端传入的 Markdown 文本导出为 PDF 文件。
@@ -331,50 +1243,28 @@ async def export_note_pdf(payload: NoteExportRequest) -> Response:
     - 将当前笔记的 markdown 文本放入 `markdown` 字段
     - 可选提供 `filename` 字段自定义下载文件名
     返回值为 application/pdf 的二进制流，带 Content-Disposition 便于浏览器直接下载。
+    渲染在独立进程池中执行，相同内容的重复导出直接返回缓存结果。
     """
 
-    if HTML is None:
-        raise HTTPException(
-            status_code=500,
-            detail=(
-                "当前环境未完整安装 WeasyPrint 所需的系统依赖，"
-                "可在 Docker / 服务器环境中启用 PDF 导出，"
-                "本地调试时请先忽略该功能。"
-            ),
-        )
-
     if not payload.markdown.strip():
         raise HTTPException(status_code=400, detail="markdown 内容不能为空")
 
-    html_body = markdown.markdown(payload.markdown, output_format="html5")
-    full_html = f"""<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-  <meta charset="utf-8" />
-  <title>Note Export</title>
-  <style>
-    body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, 'Noto Sans', sans-serif; line-height: 1.6; padding: 24px; }}
-    h1, h2, h3, h4, h5, h6 {{ margin-top: 1.2em; margin-bottom: 0.6em; }}
-    p {{ margin: 0.4em 0; }}
-    code, pre {{ font-family: SFMono-Regular, Menlo, Monaco, Consolas, 'Liberation Mono', 'Courier New', monospace; background: #f5f5f5; }}
-    pre {{ padding: 12px; overflow-x: auto; }}
-    ul, ol {{ margin-left: 1.5em; }}
-  </style>
-</head>
-<body>
-{html_body}
-</body>
-</html>
-"""
-
-    pdf_bytes = HTML(string=full_html, base_url=str(BASE_DIR)).write_pdf()
-
-    filename = payload.filename or "note.pdf"
+    return await _pdf_response(build_note_html(payload.markdown), payload.filename or "note.pdf")
 
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=\"{filename}\"",
-        },
-    )
+
+@app.get("/export_deck_pdf")
+async def export_deck_pdf(
+    ppt_id: str = Query(..., description="目标 PPT 标识"),
+    _: str = Depends(get_current_user),
+) -> Response:
+    """将某个 PPT 已保存的全部笔记按页码顺序导出为一个 PDF，无需前端回传笔记内容。"""
+
+    slides = _get_deck(ppt_id)
+
+    notes = note_store.load_deck_notes(ppt_id)
+    sections = [(s.index, s.title, notes[s.index]) for s in slides if s.index in notes]
+    if not sections:
+        raise HTTPException(status_code=404, detail="该 PPT 尚无已生成的笔记，请先生成扩展讲解")
+
+    document = build_deck_html(sections, title=f"PPT 笔记 {ppt_id}")
+    return await _pdf_response(document, f"notes-{ppt_id}.pdf")
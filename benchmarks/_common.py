@@ -0,0 +1,98 @@
+"""基准测试公共工具：计时、统计汇总、结果输出与跨提交对比。"""
+
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """将一组耗时样本（毫秒）汇总为 mean / p50 / p95 / p99 / min / max。"""
+
+    if not samples_ms:
+        return {"n": 0}
+    ordered = sorted(samples_ms)
+
+    def pct(q: float) -> float:
+        idx = min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))
+        return ordered[idx]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(pct(0.95), 3),
+        "p99_ms": round(pct(0.99), 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def measure(func: Callable[[], Any], rounds: int, warmup: int = 1) -> Dict[str, float]:
+    """重复执行 func 并返回耗时统计；warmup 轮不计入结果。"""
+
+    for _ in range(warmup):
+        func()
+    samples: List[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def run_metadata() -> Dict[str, Any]:
+    """记录本次运行的环境信息，便于跨提交、跨机器对比时判断可比性。"""
+
+    commit = ""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        ).stdout.strip()
+    except Exception:
+        pass
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
+
+
+def write_result(result: Dict[str, Any], output: Optional[Path]) -> None:
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if output is not None:
+        output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+def compare_results(old: Dict[str, Any], new: Dict[str, Any], metric: str = "p50_ms") -> List[str]:
+    """按 case 名称对比两次结果，返回可读的对比行（new / old 比值 > 1 表示变慢）。"""
+
+    old_cases = {c["case"]: c for c in old.get("cases", [])}
+    lines: List[str] = []
+    for case in new.get("cases", []):
+        before = old_cases.get(case["case"])
+        if not before or not before.get(metric) or metric not in case:
+            lines.append(f"{case['case']}: (new) {case.get(metric)}")
+            continue
+        ratio = case[metric] / before[metric]
+        flag = "  <-- slower" if ratio > 1.10 else ("  <-- faster" if ratio < 0.90 else "")
+        lines.append(
+            f"{case['case']}: {before[metric]} -> {case[metric]} {metric} (x{ratio:.2f}){flag}"
+        )
+    return lines
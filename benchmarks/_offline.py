@@ -0,0 +1,194 @@
+"""基准测试与单元测试共用的离线替身。
+
+- 嵌入：Chroma 默认嵌入模型首次使用时需要联网下载；基准测试只关心存储与检索本身的开销，
+  因此统一改用基于字符二元组哈希的小型嵌入函数，并把向量库指向临时目录；
+- LLM：`offline_llm` 替换 `call_llm`，按给定延迟返回固定格式的 Markdown，多页打包的 prompt 按分隔标记逐页返回；
+- 外部知识：`offline_external_sources` 替换 external_knowledge 中的 HTTP 请求，
+  按 URL 返回 arXiv Atom / Wikipedia JSON / 百度百科 HTML 的样例响应；
+- 合成 PPT：`build_synthetic_pptx` 生成指定页数的 .pptx 文件。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+import types
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from pptx import Presentation
+
+from core import external_knowledge, llm_agent, vector_store
+
+
+class HashEmbeddingFunction(EmbeddingFunction[Documents]):
+    """按字符二元组哈希到固定维度的词袋向量，足以区分不同文本。"""
+
+    dim = 64
+
+    def __init__(self) -> None:
+        pass
+
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors: List[np.ndarray] = []
+        for text in input:
+            vec = np.zeros(self.dim, dtype=np.float32)
+            for i in range(max(len(text) - 1, 1)):
+                gram = text[i : i + 2].encode("utf-8")
+                vec[int(hashlib.md5(gram).hexdigest(), 16) % self.dim] += 1.0
+            norm = float(np.linalg.norm(vec)) or 1.0
+            vectors.append(vec / norm)
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "offline-hash"
+
+    def get_config(self) -> dict:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: dict) -> "HashEmbeddingFunction":
+        return HashEmbeddingFunction()
+
+
+def use_offline_store(path: str | Path) -> None:
+    """将 vector_store 指向 path 下的持久化目录，并使用离线嵌入函数。"""
+
+    vector_store.configure_vector_store(path=path, embedding_function=HashEmbeddingFunction())
+
+
+TOPICS = ["梯度下降", "卷积神经网络", "激活函数", "损失函数", "反向传播", "正则化", "优化器", "注意力机制"]
+
+
+def build_synthetic_pptx(path: str | Path, num_slides: int, bullets_per_slide: int = 5) -> Path:
+    """生成一份“标题 + 若干要点”的合成 PPT，内容确定，便于跨提交复现。"""
+
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(1, num_slides + 1):
+        topic = TOPICS[i % len(TOPICS)]
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"第 {i} 节：{topic}"
+        body = slide.placeholders[1].text_frame
+        body.text = f"{topic} 的定义与直观理解（第 {i} 页）"
+        for j in range(1, bullets_per_slide):
+            body.add_paragraph().text = f"{topic} 要点 {j}：公式、推导与示例说明 {i}-{j}"
+
+    out = Path(path)
+    prs.save(str(out))
+    return out
+
+
+def _fake_markdown(prompt: str) -> str:
+    batch = re.search(r"本次需要输出的页面索引依次为：([\d、]+)。", prompt)
+    if batch is not None:
+        return "\n\n".join(
+            llm_agent.BATCH_MARKER.format(index=index) + "\n" + _fake_markdown("")
+            for index in batch.group(1).split("、")
+        )
+    return (
+        "# 背景说明\n占位背景。\n\n# 知识点详细解释\n" + "解释内容。" * 40 +
+        "\n\n# 示例\n```python\nprint('demo')\n```\n\n# 延伸阅读建议\n- 教材相关章节\n\n"
+        f"# AI 自评\n4/5（prompt {len(prompt)} 字符）\n\n# Checklayer\n通过。"
+    )
+
+
+@contextmanager
+def offline_llm(latency_s: float = 0.0) -> Iterator[List[str]]:
+    """替换 llm_agent.call_llm；产出列表记录每次收到的 prompt，便于统计调用次数与输入长度。"""
+
+    prompts: List[str] = []
+    original = llm_agent.call_llm
+
+    def fake_call_llm(prompt: str, api_key: Optional[str] = None) -> str:
+        prompts.append(prompt)
+        if latency_s > 0:
+            time.sleep(latency_s)
+        return _fake_markdown(prompt)
+
+    llm_agent.call_llm = fake_call_llm
+    try:
+        yield prompts
+    finally:
+        llm_agent.call_llm = original
+
+
+class _FakeResponse:
+    def __init__(self, text: str, status_code: int = 200) -> None:
+        self.text = text
+        self.status_code = status_code
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+def fake_arxiv_feed(query: str, max_results: int) -> str:
+    entries = "".join(
+        "<entry><title>Offline Paper {i}</title>"
+        "<summary>An offline abstract about {q} used for benchmarking. {pad}</summary></entry>".format(
+            i=i, q=query, pad="Lorem ipsum. " * 20
+        )
+        for i in range(max_results)
+    )
+    return f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'
+
+
+def fake_wikipedia_json(query: str, max_results: int) -> str:
+    items = [
+        {"title": f"条目 {i}", "snippet": f'<span class="searchmatch">{query}</span> 的离线摘要'}
+        for i in range(max_results)
+    ]
+    return json.dumps({"query": {"search": items}}, ensure_ascii=False)
+
+
+def fake_baike_html(word: str) -> str:
+    return (
+        f"<html><head><title>{word}_百度百科</title>"
+        '<meta name="description" content="离线百科摘要，用于基准测试。" /></head>'
+        "<body><script>var x = 1;</script><p>正文</p></body></html>"
+    )
+
+
+def fake_external_response(url: str, params: Optional[Dict[str, Any]] = None) -> _FakeResponse:
+    """按 URL 返回与真实来源格式一致的样例响应。"""
+
+    params = params or {}
+    if url.startswith(external_knowledge.ARXIV_API_URL):
+        return _FakeResponse(
+            fake_arxiv_feed(str(params.get("search_query", "")), int(params.get("max_results", 3)))
+        )
+    if url.startswith(external_knowledge.WIKIPEDIA_API_URL):
+        return _FakeResponse(
+            fake_wikipedia_json(str(params.get("srsearch", "")), int(params.get("srlimit", 3)))
+        )
+    return _FakeResponse(fake_baike_html("离线条目"))
+
+
+@contextmanager
+def offline_external_sources(latency_s: float = 0.0) -> Iterator[List[str]]:
+    """替换 external_knowledge 使用的 requests；产出列表记录被请求的 URL。"""
+
+    urls: List[str] = []
+    original = external_knowledge.requests
+
+    def fake_get(url: str, params: Optional[Dict[str, Any]] = None, **_: Any) -> _FakeResponse:
+        urls.append(url)
+        if latency_s > 0:
+            time.sleep(latency_s)
+        return fake_external_response(url, params)
+
+    external_knowledge.requests = types.SimpleNamespace(get=fake_get)
+    try:
+        yield urls
+    finally:
+        external_knowledge.requests = original
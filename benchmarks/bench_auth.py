@@ -0,0 +1,127 @@
+"""认证开销基准：每个请求在鉴权上花费的时间。
+
+对比：
+- token_dict_lookup：旧实现（进程内 TOKENS 字典查找），作为下限参考；
+- verify_token：HMAC 签名 token 的校验（纯 CPU，无共享状态）；
+- issue_token：登录时签发 token；
+- user_lookup_cached / user_lookup_db：登录时读取用户记录（命中进程缓存 / 直接查 SQLite）；
+- http_slides：经 FastAPI 完整链路（含鉴权依赖）请求 /slides 的端到端耗时，
+  与 http_health（无鉴权）之差即为单个请求的鉴权开销。
+
+运行方式（在项目根目录下）：
+
+    python -m benchmarks.bench_auth --rounds 20 --ops 2000 --output auth.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import secrets
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from benchmarks._common import compare_results, run_metadata, summarize, write_result
+from core import auth
+
+
+def _per_op_us(func: Callable[[], Any], rounds: int, ops: int) -> Dict[str, float]:
+    """每轮连续执行 ops 次，返回单次操作耗时（微秒）的统计。"""
+
+    func()
+    samples: List[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(ops):
+            func()
+        samples.append((time.perf_counter() - start) / ops * 1e6)
+    stats = summarize(samples)
+    # summarize 按毫秒命名，这里数值单位为微秒
+    return {k.replace("_ms", "_us"): v for k, v in stats.items()}
+
+
+def bench_primitives(rounds: int, ops: int) -> List[Dict[str, Any]]:
+    tokens = {secrets.token_hex(24): f"user{i}" for i in range(1000)}
+    old_token = next(iter(tokens))
+    token = auth.issue_token("student0001")
+
+    store = auth.USER_STORE
+    store.create_user("student0001", "x" * 64)
+
+    def user_lookup_db() -> None:
+        store._cache.clear()
+        store.get_password_hash("student0001")
+
+    cases = [
+        ("token_dict_lookup", lambda: tokens.get(old_token)),
+        ("verify_token", lambda: auth.verify_token(token)),
+        ("issue_token", lambda: auth.issue_token("student0001")),
+        ("user_lookup_cached", lambda: store.get_password_hash("student0001")),
+    ]
+    results = [{"case": name, **_per_op_us(func, rounds, ops)} for name, func in cases]
+    results.append({"case": "user_lookup_db", **_per_op_us(user_lookup_db, rounds, max(1, ops // 20))})
+    return results
+
+
+def bench_http(rounds: int, ops: int) -> List[Dict[str, Any]]:
+    from fastapi.testclient import TestClient
+
+    from backend import api
+    from core.ppt_parser import Slide, SlideDeck
+
+    api.PPT_SLIDES["bench-deck"] = SlideDeck([Slide(index=1, title="示例", bullets=["要点"])])
+    client = TestClient(api.app)
+    client.post("/auth/register", json={"username": "bench-user", "password": "bench-pass"})
+    token = client.post(
+        "/auth/login", json={"username": "bench-user", "password": "bench-pass"}
+    ).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def slides() -> None:
+        client.get("/slides", params={"ppt_id": "bench-deck"}, headers=headers)
+
+    def health() -> None:
+        client.get("/health")
+
+    n = max(1, ops // 20)
+    return [
+        {"case": "http_health", **_per_op_us(health, rounds, n)},
+        {"case": "http_slides", **_per_op_us(slides, rounds, n)},
+    ]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="ppt-agent-auth-") as tmp:
+        auth.configure_auth(secret=secrets.token_hex(32), auth_dir=Path(tmp))
+        cases = bench_primitives(args.rounds, args.ops)
+        if not args.skip_http:
+            cases.extend(bench_http(args.rounds, args.ops))
+    return {
+        "benchmark": "auth",
+        "meta": run_metadata(),
+        "params": {"rounds": args.rounds, "ops": args.ops},
+        "cases": cases,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--ops", type=int, default=2000, help="每轮执行次数（HTTP 与数据库查询为其 1/20）")
+    parser.add_argument("--skip-http", action="store_true", help="只测鉴权原语，不启动 FastAPI")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run(args)
+    write_result(result, args.output)
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_results(old, result, metric="p50_us")), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
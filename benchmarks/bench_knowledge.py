@@ -0,0 +1,127 @@
+"""本地离线知识索引基准：导入速度、索引体积与单次检索耗时。
+
+用确定性的合成条目（随机术语组成的中文标题与摘要）构造不同规模的索引，测量：
+- import：add_documents + optimize 的总耗时与每秒导入条数，以及 SQLite 文件大小 index_mb；
+- search_hit：以课件标题风格的查询（“第 3 节：” + 某条目标题）检索，能命中；
+- search_miss：索引中不存在的主题，走完检索与覆盖率过滤后返回空；
+- search_common：1% 的条目都包含的高频主题词，最坏情况。
+
+对比参考：在线来源每次请求至少一个网络往返，不可达时要等满 10 秒超时。
+
+运行方式（在项目根目录下）：
+
+    python -m benchmarks.bench_knowledge --docs 10000 100000 --output knowledge.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from benchmarks._common import compare_results, run_metadata, summarize, write_result
+from benchmarks._offline import TOPICS
+from core.knowledge_index import KnowledgeDoc, KnowledgeIndex
+
+
+def _vocabulary(size: int, seed: int = 0) -> List[str]:
+    """确定性生成的“词表”：2~4 个常用汉字组成的词，模拟百科 / 摘要中的术语分布。"""
+
+    rng = random.Random(seed)
+    chars = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)]
+    return ["".join(rng.choice(chars) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def _docs(n: int, vocab: List[str]) -> Iterator[KnowledgeDoc]:
+    """每条 = 2 个术语组成的标题 + 30 个术语的摘要；另有 1% 的条目共享同一个课程主题（高频词）。"""
+
+    rng = random.Random(n)
+    for i in range(n):
+        title = "".join(rng.sample(vocab, 2))
+        words = rng.sample(vocab, 30)
+        if i % 100 == 0:
+            words.append(TOPICS[0])
+        summary = "，".join(words) + f"。entry {i}"
+        yield KnowledgeDoc("wikipedia", f"doc-{i}", title, summary)
+
+
+def _search_us(index: KnowledgeIndex, queries: List[str], rounds: int) -> Dict[str, float]:
+    index.search(queries[0])
+    samples: List[float] = []
+    for r in range(rounds):
+        start = time.perf_counter()
+        for q in queries:
+            index.search(q, max_results=3)
+        samples.append((time.perf_counter() - start) / len(queries) * 1e6)
+    stats = summarize(samples)
+    # summarize 按毫秒命名，这里数值单位为微秒
+    return {k.replace("_ms", "_us"): v for k, v in stats.items()}
+
+
+def bench_size(n: int, rounds: int, tmp_dir: Path) -> List[Dict[str, Any]]:
+    path = tmp_dir / f"knowledge-{n}.sqlite3"
+    index = KnowledgeIndex(path)
+    vocab = _vocabulary(20000)
+    docs = list(_docs(n, vocab))
+
+    start = time.perf_counter()
+    index.add_documents(docs)
+    index.optimize()
+    seconds = time.perf_counter() - start
+
+    # 课件标题风格的查询：“第 i 节：” + 某条目的标题
+    hit_queries = [f"第 {i} 节：{doc.title}" for i, doc in enumerate(docs[:: max(1, n // 20)], start=1)]
+    miss_queries = ["量子纠缠与贝尔不等式", "区块链共识协议", "蛋白质折叠预测"]
+    cases = [
+        {
+            "case": f"import[docs={n}]",
+            "docs": n,
+            "seconds": round(seconds, 2),
+            "docs_per_sec": round(n / seconds),
+            "index_mb": round(path.stat().st_size / 1024 / 1024, 2),
+        },
+        {"case": f"search_hit[docs={n}]", **_search_us(index, hit_queries, rounds)},
+        {"case": f"search_miss[docs={n}]", **_search_us(index, miss_queries, rounds)},
+        # 高频主题：1% 的条目都包含，需要对全部匹配结果做 bm25 排序，是最坏情况
+        {"case": f"search_common[docs={n}]", **_search_us(index, [TOPICS[0]], rounds)},
+    ]
+    index.close()
+    return cases
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="ppt-agent-knowledge-") as tmp:
+        for n in args.docs:
+            print(f"[knowledge] {n} docs ...", file=sys.stderr)
+            cases.extend(bench_size(n, args.rounds, Path(tmp)))
+    return {
+        "benchmark": "knowledge",
+        "meta": run_metadata(),
+        "params": {"docs": args.docs, "rounds": args.rounds},
+        "cases": cases,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, nargs="+", default=[10000, 100000], help="索引条目数")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run(args)
+    write_result(result, args.output)
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_results(old, result, metric="p50_us")), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
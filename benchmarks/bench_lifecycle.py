@@ -0,0 +1,116 @@
+"""PPT 生命周期基准：删除大量 PPT 后的检索延迟与压缩效果。
+
+流程：
+1. 在临时目录的向量库中写入 N 份合成 PPT；
+2. 记录检索延迟与磁盘占用（基线）；
+3. 批量删除其中大部分 PPT，再次测量（删除后，HNSW 中残留标记删除的节点）；
+4. 执行 compact_vector_store，再次测量（压缩后）。
+
+运行方式（在项目根目录下）：
+
+    python -m benchmarks.bench_lifecycle --decks 1000 --delete-ratio 0.9
+
+结果以 JSON 打印到标准输出，可通过 --output 写入文件以便跨提交对比。
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks._common import run_metadata, summarize, write_result
+from benchmarks._offline import use_offline_store
+from core import vector_store
+from core.ppt_parser import Slide
+
+
+QUERIES = ["梯度下降", "卷积神经网络", "激活函数", "损失函数", "反向传播"]
+
+
+def synthetic_deck(deck_no: int, num_slides: int) -> List[Slide]:
+    topics = ["梯度下降", "卷积", "激活函数", "损失函数", "反向传播", "正则化", "优化器"]
+    slides: List[Slide] = []
+    for i in range(1, num_slides + 1):
+        topic = topics[(deck_no + i) % len(topics)]
+        slides.append(
+            Slide(
+                index=i,
+                title=f"第 {deck_no} 讲 {topic} ({i})",
+                bullets=[f"{topic} 要点 {j}：示例说明 {deck_no}-{i}-{j}" for j in range(4)],
+            )
+        )
+    return slides
+
+
+def measure_queries(rounds: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for r in range(rounds):
+        start = time.perf_counter()
+        vector_store.query_similar_slides(QUERIES[r % len(QUERIES)], n_results=15)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def run(decks: int, slides_per_deck: int, delete_ratio: float, rounds: int) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory() as tmp:
+        use_offline_store(Path(tmp) / "chroma")
+
+        ppt_ids = [f"deck{n:05d}" for n in range(decks)]
+        for n, ppt_id in enumerate(ppt_ids):
+            vector_store.index_slides(synthetic_deck(n, slides_per_deck), ppt_id=ppt_id)
+
+        baseline = measure_queries(rounds)
+        baseline["disk_bytes"] = vector_store._dir_size(vector_store.CHROMA_DIR)
+
+        doomed = ppt_ids[: int(decks * delete_ratio)]
+        start = time.perf_counter()
+        deleted = vector_store.delete_deck_vectors(doomed)
+        delete_seconds = time.perf_counter() - start
+
+        after_delete = measure_queries(rounds)
+        after_delete["disk_bytes"] = vector_store._dir_size(vector_store.CHROMA_DIR)
+
+        start = time.perf_counter()
+        compaction = vector_store.compact_vector_store()
+        compact_seconds = time.perf_counter() - start
+
+        after_compact = measure_queries(rounds)
+        after_compact["disk_bytes"] = vector_store._dir_size(vector_store.CHROMA_DIR)
+
+    return {
+        "benchmark": "lifecycle",
+        "meta": run_metadata(),
+        "params": {
+            "decks": decks,
+            "slides_per_deck": slides_per_deck,
+            "delete_ratio": delete_ratio,
+            "rounds": rounds,
+        },
+        "deleted_vectors": deleted,
+        "delete_seconds": round(delete_seconds, 3),
+        "compact_seconds": round(compact_seconds, 3),
+        "compaction": compaction,
+        "baseline": baseline,
+        "after_delete": after_delete,
+        "after_compact": after_compact,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--decks", type=int, default=500)
+    parser.add_argument("--slides-per-deck", type=int, default=20)
+    parser.add_argument("--delete-ratio", type=float, default=0.9)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run(args.decks, args.slides_per_deck, args.delete_ratio, args.rounds)
+    write_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
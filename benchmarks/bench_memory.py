@@ -0,0 +1,177 @@
+"""常驻内存基准：后端在 PPT_SLIDES 中保存大量 PPT 时的内存占用。
+
+对比三种表示（每种都按“解析一份、存入字典”的方式逐份构造，模拟线上驻留）：
+- legacy_list：旧版 Slide（普通 dataclass，逐实例 __dict__，bullets 为列表）；
+- slots_list：当前 Slide（slots + frozen，bullets 为元组）组成的列表；
+- slide_deck：当前后端使用的按列存储 SlideDeck（文本去重后拼接、偏移量索引）。
+
+内存由 tracemalloc 统计（只含 Python 对象分配），同时给出文本本身的 UTF-8 字节数作为下限参考，
+以及遍历整份 PPT、按页码取单页的访问耗时。
+
+运行方式（在项目根目录下）：
+
+    python -m benchmarks.bench_memory --decks 1000 10000 --output memory.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from benchmarks._common import compare_results, run_metadata, summarize, write_result
+from benchmarks._offline import TOPICS
+from core.ppt_parser import Slide, SlideDeck
+
+
+@dataclass
+class LegacySlide:
+    """改造前的 Slide 定义，仅用于对比。"""
+
+    index: int
+    title: str
+    bullets: List[str]
+    notes: Optional[str] = None
+
+
+FOOTER = "云计算与大数据课程组 · 仅供课堂学习使用"
+
+
+def _deck_texts(deck_no: int, num_slides: int, bullets: int) -> List[List[str]]:
+    """生成一份 PPT 的文本：每页标题 + 若干要点，页脚在每页重复（与真实课件一致）。"""
+
+    pages: List[List[str]] = []
+    for i in range(1, num_slides + 1):
+        topic = TOPICS[(deck_no + i) % len(TOPICS)]
+        texts = [f"第 {deck_no} 讲 第 {i} 节：{topic}"]
+        texts += [f"{topic} 要点 {j}：定义、公式推导与示例说明（{deck_no}-{i}-{j}）" for j in range(bullets)]
+        texts.append("".join(FOOTER))  # 每页独立的字符串对象，模拟解析结果
+        pages.append(texts)
+    return pages
+
+
+def _build_legacy(deck_no: int, num_slides: int, bullets: int) -> Any:
+    return [
+        LegacySlide(index=i, title=texts[0], bullets=texts[1:])
+        for i, texts in enumerate(_deck_texts(deck_no, num_slides, bullets), start=1)
+    ]
+
+
+def _build_slots(deck_no: int, num_slides: int, bullets: int) -> Any:
+    return [
+        Slide(index=i, title=texts[0], bullets=texts[1:])
+        for i, texts in enumerate(_deck_texts(deck_no, num_slides, bullets), start=1)
+    ]
+
+
+def _build_deck(deck_no: int, num_slides: int, bullets: int) -> Any:
+    return SlideDeck(_build_slots(deck_no, num_slides, bullets))
+
+
+VARIANTS: Dict[str, Callable[[int, int, int], Any]] = {
+    "legacy_list": _build_legacy,
+    "slots_list": _build_slots,
+    "slide_deck": _build_deck,
+}
+
+
+def _text_bytes(decks: int, num_slides: int, bullets: int) -> int:
+    return sum(
+        len(t.encode("utf-8"))
+        for d in range(decks)
+        for page in _deck_texts(d, num_slides, bullets)
+        for t in page
+    )
+
+
+def _access_stats(store: Dict[str, Sequence[Any]], rounds: int) -> Dict[str, Dict[str, float]]:
+    keys = list(store)[:200]
+
+    def iterate() -> None:
+        for key in keys:
+            for slide in store[key]:
+                slide.title
+
+    def lookup() -> None:
+        for key in keys:
+            deck = store[key]
+            getter = getattr(deck, "get_by_index", None)
+            if getter is not None:
+                getter(len(deck) // 2)
+            else:
+                {s.index: s for s in deck}.get(len(deck) // 2)
+
+    out: Dict[str, Dict[str, float]] = {}
+    for name, func in (("iterate_200_decks", iterate), ("lookup_200_slides", lookup)):
+        samples: List[float] = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        out[name] = summarize(samples)
+    return out
+
+
+def bench_variant(name: str, decks: int, num_slides: int, bullets: int, rounds: int) -> Dict[str, Any]:
+    build = VARIANTS[name]
+    gc.collect()
+    tracemalloc.start()
+    store = {f"deck-{d}": build(d, num_slides, bullets) for d in range(decks)}
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {
+        "case": f"{name}[decks={decks}]",
+        "variant": name,
+        "decks": decks,
+        "resident_mb": round(current / 1024 / 1024, 2),
+        "bytes_per_slide": round(current / (decks * num_slides), 1),
+    }
+    for op, stats in _access_stats(store, rounds).items():
+        result[f"{op}_p50_ms"] = stats["p50_ms"]
+    del store
+    gc.collect()
+    return result
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases: List[Dict[str, Any]] = []
+    for decks in args.decks:
+        text_mb = _text_bytes(decks, args.slides, args.bullets) / 1024 / 1024
+        cases.append({"case": f"text_utf8[decks={decks}]", "decks": decks, "resident_mb": round(text_mb, 2)})
+        for name in VARIANTS:
+            print(f"[memory] {name} × {decks} decks ...", file=sys.stderr)
+            cases.append(bench_variant(name, decks, args.slides, args.bullets, args.rounds))
+    return {
+        "benchmark": "memory",
+        "meta": run_metadata(),
+        "params": {"decks": args.decks, "slides": args.slides, "bullets": args.bullets},
+        "cases": cases,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--decks", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--slides", type=int, default=30, help="每份 PPT 的页数")
+    parser.add_argument("--bullets", type=int, default=5, help="每页要点数")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run(args)
+    write_result(result, args.output)
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_results(old, result, metric="resident_mb")), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
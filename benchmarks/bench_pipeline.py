@@ -0,0 +1,232 @@
+"""离线基准：解析 → 入库 → 检索 → 构造 Prompt → 扩展 的全链路耗时。
+
+覆盖的函数：
+- ppt_parser.parse_ppt
+- vector_store.index_slides / query_similar_slides
+- llm_agent.build_slide_context_from_retrieval（整页 / 要点 chunk 两种粒度的上下文长度与耗时）
+- llm_agent.build_prompt_for_slide_expansion / expand_slide_with_tools
+- llm_agent.expand_slides_batched（整份生成时把小页面打包进一次调用，与逐页调用对比调用次数与输入长度）
+
+输入包括若干合成 PPT（页数可配置）以及仓库自带的 examples/sample.pptx 与 nn_basics.pptx。
+LLM 与外部知识源均替换为本地替身（见 benchmarks/_offline.py），全程无需联网。
+
+运行方式（在项目根目录下）：
+
+    python -m benchmarks.bench_pipeline --sizes 20 100 500 --output bench.json
+    python -m benchmarks.bench_pipeline --compare bench.json   # 与上次结果对比
+
+结果为 JSON，cases 中每一项的 case 名称在不同提交间保持稳定，可直接逐项对比。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from benchmarks._common import ROOT_DIR, compare_results, measure, run_metadata, write_result
+from benchmarks._offline import (
+    build_synthetic_pptx,
+    offline_external_sources,
+    offline_llm,
+    use_offline_store,
+)
+from core import llm_agent, vector_store
+from core.llm_agent import AgentConfig
+from core.ppt_parser import Slide, parse_ppt
+
+
+BUNDLED_DECKS = {
+    "sample": ROOT_DIR / "examples" / "sample.pptx",
+    "nn_basics": ROOT_DIR / "nn_basics.pptx",
+}
+
+
+def _case(name: str, deck: str, stats: Dict[str, Any], **extra: Any) -> Dict[str, Any]:
+    return {"case": f"{name}[{deck}]", "deck": deck, **stats, **extra}
+
+
+def bench_deck(
+    deck: str,
+    path: Path,
+    rounds: int,
+    expand_slides: int,
+    llm_latency_s: float,
+    external_latency_s: float,
+) -> List[Dict[str, Any]]:
+    cases: List[Dict[str, Any]] = []
+
+    slides: List[Slide] = parse_ppt(path)
+    cases.append(_case("parse_ppt", deck, measure(lambda: parse_ppt(path), rounds), slides=len(slides)))
+
+    counter = {"n": 0}
+
+    def index_once() -> None:
+        counter["n"] += 1
+        vector_store.index_slides(slides, ppt_id=f"{deck}-{counter['n']}")
+
+    cases.append(_case("index_slides", deck, measure(index_once, rounds, warmup=0)))
+
+    ppt_id = f"{deck}-1"
+    queries = [s.title for s in slides] or [deck]
+    q_iter = {"i": 0}
+
+    def query_once() -> None:
+        q = queries[q_iter["i"] % len(queries)]
+        q_iter["i"] += 1
+        vector_store.query_similar_slides(q, n_results=5, ppt_id=ppt_id)
+
+    cases.append(_case("query_similar_slides", deck, measure(query_once, rounds * 5)))
+
+    targets = slides[: max(1, expand_slides)]
+    for granularity in ("slide", "chunk"):
+        c_iter = {"i": 0}
+
+        def context_once() -> None:
+            slide = targets[c_iter["i"] % len(targets)]
+            c_iter["i"] += 1
+            llm_agent.build_slide_context_from_retrieval(slide, top_k=5, ppt_id=ppt_id, granularity=granularity)
+
+        context_chars = [
+            len(llm_agent.build_slide_context_from_retrieval(s, top_k=5, ppt_id=ppt_id, granularity=granularity))
+            for s in targets
+        ]
+        cases.append(
+            _case(
+                f"retrieval_context_{granularity}",
+                deck,
+                measure(context_once, rounds * 5),
+                mean_context_chars=round(statistics.fmean(context_chars), 1),
+            )
+        )
+
+    contexts: List[Tuple[Slide, str]] = [
+        (s, llm_agent.build_slide_context_from_retrieval(s, top_k=5, ppt_id=ppt_id))
+        for s in slides[: max(1, expand_slides)]
+    ]
+    snippets = ["【arXiv: Offline Paper】" + "Lorem ipsum. " * 30] * 3
+    p_iter = {"i": 0}
+
+    def prompt_once() -> None:
+        slide, ctx = contexts[p_iter["i"] % len(contexts)]
+        p_iter["i"] += 1
+        llm_agent.build_prompt_for_slide_expansion(slide, ctx, snippets)
+
+    prompt_chars = [
+        len(llm_agent.build_prompt_for_slide_expansion(s, ctx, snippets)) for s, ctx in contexts
+    ]
+    cases.append(
+        _case(
+            "build_prompt_for_slide_expansion",
+            deck,
+            measure(prompt_once, rounds * 20),
+            mean_prompt_chars=round(statistics.fmean(prompt_chars), 1),
+        )
+    )
+
+    cfg = AgentConfig(use_wikipedia=True, top_k_slides=5, top_k_wiki=3)
+    e_iter = {"i": 0}
+    with offline_llm(latency_s=llm_latency_s) as prompts, offline_external_sources(
+        latency_s=external_latency_s
+    ) as urls:
+
+        def expand_once() -> None:
+            slide = targets[e_iter["i"] % len(targets)]
+            e_iter["i"] += 1
+            llm_agent.expand_slide_with_tools(slide, config=cfg, ppt_id=ppt_id)
+
+        stats = measure(expand_once, len(targets), warmup=0)
+        cases.append(
+            _case(
+                "expand_slide_with_tools",
+                deck,
+                stats,
+                llm_calls=len(prompts),
+                llm_input_chars=sum(len(p) for p in prompts),
+                llm_input_tokens_est=sum(llm_agent.estimate_tokens(p) for p in prompts),
+                external_requests=len(urls),
+            )
+        )
+
+        del prompts[:]
+        stats = measure(lambda: llm_agent.expand_slides_batched(targets, config=cfg, ppt_id=ppt_id), 1, warmup=0)
+        cases.append(
+            _case(
+                "expand_slides_batched",
+                deck,
+                stats,
+                slides=len(targets),
+                llm_calls=len(prompts),
+                llm_input_chars=sum(len(p) for p in prompts),
+                llm_input_tokens_est=sum(llm_agent.estimate_tokens(p) for p in prompts),
+            )
+        )
+
+    return cases
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        use_offline_store(tmp_dir / "chroma")
+
+        decks: List[Tuple[str, Path]] = []
+        for size in args.sizes:
+            decks.append((f"synthetic-{size}", build_synthetic_pptx(tmp_dir / f"synthetic-{size}.pptx", size)))
+        if not args.skip_bundled:
+            decks.extend((name, path) for name, path in BUNDLED_DECKS.items() if path.exists())
+
+        for deck, path in decks:
+            print(f"[info] benchmarking {deck} ...", file=sys.stderr)
+            cases.extend(
+                bench_deck(
+                    deck,
+                    path,
+                    rounds=args.rounds,
+                    expand_slides=args.expand_slides,
+                    llm_latency_s=args.llm_latency_ms / 1000,
+                    external_latency_s=args.external_latency_ms / 1000,
+                )
+            )
+
+    return {
+        "benchmark": "pipeline",
+        "meta": run_metadata(),
+        "params": {
+            "sizes": args.sizes,
+            "rounds": args.rounds,
+            "expand_slides": args.expand_slides,
+            "llm_latency_ms": args.llm_latency_ms,
+            "external_latency_ms": args.external_latency_ms,
+            "bundled": not args.skip_bundled,
+        },
+        "cases": cases,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="离线全链路基准")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[20, 100], help="合成 PPT 的页数列表")
+    parser.add_argument("--rounds", type=int, default=5, help="parse / index 的重复次数")
+    parser.add_argument("--expand-slides", type=int, default=10, help="每份 PPT 参与扩展测试的页数")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="LLM 替身的模拟延迟")
+    parser.add_argument("--external-latency-ms", type=float, default=0.0, help="外部知识替身的模拟延迟")
+    parser.add_argument("--skip-bundled", action="store_true", help="不测试仓库自带的示例 PPT")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None, help="与之前保存的结果 JSON 对比")
+    args = parser.parse_args()
+
+    result = run(args)
+    write_result(result, args.output)
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_results(old, result)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
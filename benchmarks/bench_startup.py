@@ -0,0 +1,158 @@
+"""冷启动基准：导入耗时与服务从启动到可用的时间。
+
+每个 case 都在全新的 Python 子进程中测量（磁盘缓存是热的，解释器与模块缓存是冷的）：
+- import[模块]：`import backend.api` 及各核心模块的导入耗时；
+- startup_health：导入后端 + 第一次 /health 返回的总耗时（容器存活检查最早可通过的时间）；
+- startup_ready：导入后端 + /ready 首次返回 200 的总耗时（依赖预加载完成）。
+另外记录 `python -X importtime` 中累计耗时最高的若干模块，便于发现新的重量级导入。
+
+startup_* 使用离线哈希嵌入与临时目录，不联网、不写入项目目录。
+
+运行方式（在项目根目录下）：
+
+    python -m benchmarks.bench_startup --rounds 5 --output startup.json
+    python -m benchmarks.bench_startup --rounds 5 --compare startup.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks._common import ROOT_DIR, compare_results, run_metadata, summarize, write_result
+
+
+MODULES = ["backend.api", "core.vector_store", "core.llm_agent", "core.ppt_parser", "core.pdf_export"]
+
+_IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+"""
+
+# 在子进程中启动应用（含 lifespan 预加载），分别记录 /health 与 /ready 可用的时间
+_STARTUP_SNIPPET = """
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import backend.api as api
+from core import vector_store
+
+class _HashEmbedding:
+    def __call__(self, input):
+        return [[float(len(t) % 7), 1.0, 0.5] for t in input]
+
+vector_store.configure_vector_store(embedding_function=_HashEmbedding())
+with TestClient(api.app) as client:
+    assert client.get("/health").status_code == 200
+    health_ms = (time.perf_counter() - start) * 1000
+    status = 503
+    while status != 200 and time.perf_counter() - start < 120:
+        resp = client.get("/ready")
+        status = resp.status_code
+        if resp.json().get("status") == "unavailable":
+            break
+        time.sleep(0.01)
+    ready_ms = (time.perf_counter() - start) * 1000
+print(health_ms, ready_ms, status)
+"""
+
+
+def _run_python(code: str, env: Dict[str, str]) -> str:
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_DIR,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr[-2000:])
+    return out.stdout.strip().splitlines()[-1]
+
+
+def top_imports(module: str, env: Dict[str, str], limit: int) -> List[Dict[str, Any]]:
+    """解析 -X importtime 输出，返回累计耗时最高的顶层依赖。"""
+
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    rows: List[Dict[str, Any]] = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append({"module": name.strip(), "depth": depth, "cumulative_ms": round(int(cumulative_us) / 1000, 1)})
+    # 只看第一层（由目标模块直接触发）的依赖
+    shallow = [r for r in rows if r["depth"] <= 1]
+    return sorted(shallow, key=lambda r: r["cumulative_ms"], reverse=True)[:limit]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="ppt-agent-startup-") as tmp:
+        env = {
+            "PPT_AGENT_CHROMA_DIR": str(Path(tmp) / "chroma"),
+            "PPT_AGENT_NOTES_DIR": str(Path(tmp) / "notes"),
+            "PPT_AGENT_UPLOAD_DIR": str(Path(tmp) / "uploads"),
+            "PPT_AGENT_AUTH_DIR": str(Path(tmp) / "auth"),
+        }
+
+        for module in MODULES:
+            samples = [float(_run_python(_IMPORT_SNIPPET.format(module=module), env)) for _ in range(args.rounds)]
+            cases.append({"case": f"import[{module}]", **summarize(samples)})
+            print(f"[startup] import {module}: {cases[-1]['p50_ms']} ms", file=sys.stderr)
+
+        health: List[float] = []
+        ready: List[float] = []
+        statuses: List[int] = []
+        for _ in range(args.rounds):
+            h, r, status = _run_python(_STARTUP_SNIPPET, env).split()
+            health.append(float(h))
+            ready.append(float(r))
+            statuses.append(int(status))
+        cases.append({"case": "startup_health", **summarize(health)})
+        cases.append({"case": "startup_ready", **summarize(ready), "ready_status": statuses[-1]})
+
+        imports = top_imports("backend.api", env, args.top)
+
+    return {
+        "benchmark": "startup",
+        "meta": run_metadata(),
+        "params": {"rounds": args.rounds},
+        "cases": cases,
+        "top_imports": imports,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="每个 case 启动的子进程数")
+    parser.add_argument("--top", type=int, default=10, help="记录的重量级导入数量")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = run(args)
+    write_result(result, args.output)
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_results(old, result)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
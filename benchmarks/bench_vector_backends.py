@@ -0,0 +1,189 @@
+"""向量后端基准：Chroma 与 NumPy（float32 / float16）的单份 PPT 检索延迟与内存。
+
+每个后端在全新的 Python 子进程中测量，互不影响常驻内存：
+1. 在临时目录中写入 decks 份 PPT，每份 slides 页，向量为 dim 维的随机单位向量
+   （默认 384 维，与 Chroma 默认嵌入模型一致），按 index_slides 的方式逐份写入；
+2. deck_query：按 ppt_id 过滤、取 top-k 的 collection.query，即 /expand 检索上下文与
+   单份 PPT /search 的路径，不含查询文本的嵌入耗时；
+3. deck_query_nin：再排除若干页（chunk 检索排除当前页的写法）；
+4. global_query：不按 PPT 过滤，在全部 PPT 中检索。
+
+每个 case 记录：
+- 延迟 p50 / p95；
+- alloc_kb_per_query：单次查询的 Python 堆分配峰值（tracemalloc，看不到 Chroma Rust 层的分配）；
+- rss_mb_after：写入并完成全部查询后的进程常驻内存；
+- disk_mb：持久化目录大小；index_seconds：写入耗时。
+
+运行方式（在项目根目录下）：
+
+    python -m benchmarks.bench_vector_backends --decks 200 --slides 100 --output vector_backends.json
+    python -m benchmarks.bench_vector_backends --compare vector_backends.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks._common import ROOT_DIR, compare_results, run_metadata, summarize, write_result
+
+
+BACKENDS = ["chroma", "numpy-float32", "numpy-float16"]
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def _unit_vectors(rng: np.random.Generator, n: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _measure(func: Callable[[int], Any], rounds: int) -> Dict[str, float]:
+    func(0)
+    samples: List[float] = []
+    for r in range(rounds):
+        start = time.perf_counter()
+        func(r)
+        samples.append((time.perf_counter() - start) * 1000)
+    stats = summarize(samples)
+
+    tracemalloc.start()
+    peaks: List[int] = []
+    for r in range(min(rounds, 20)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func(r)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    stats["alloc_kb_per_query"] = round(float(np.median(peaks)) / 1024, 1)
+    return stats
+
+
+def run_backend(backend: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """在当前进程中测量单个后端（由 main 在子进程中调用）。"""
+
+    from core import vector_store
+
+    if backend.startswith("numpy-"):
+        os.environ["PPT_AGENT_NUMPY_DTYPE"] = backend.split("-", 1)[1]
+    rng = np.random.default_rng(0)
+    rss_before = _rss_mb()
+
+    with tempfile.TemporaryDirectory(prefix="ppt-agent-vectors-") as tmp:
+        vector_store.configure_vector_store(path=tmp, backend=backend.split("-", 1)[0])
+        collection = vector_store.get_slides_collection(vector_store.DEFAULT_COLLECTION)
+        ppt_ids = [f"deck{n:05d}" for n in range(args.decks)]
+
+        start = time.perf_counter()
+        for ppt_id in ppt_ids:
+            collection.add(
+                ids=[f"{ppt_id}-{i}" for i in range(1, args.slides + 1)],
+                embeddings=_unit_vectors(rng, args.slides, args.dim),
+                documents=[f"{ppt_id} 第 {i} 页的内容" for i in range(1, args.slides + 1)],
+                metadatas=[
+                    {"ppt_id": ppt_id, "slide_index": i, "title": f"第 {i} 页", "content_hash": ""}
+                    for i in range(1, args.slides + 1)
+                ],
+            )
+        index_seconds = time.perf_counter() - start
+
+        queries = _unit_vectors(rng, 64, args.dim)
+        picks = rng.integers(0, args.decks, size=64)
+
+        def deck_query(r: int) -> Any:
+            return collection.query(
+                query_embeddings=[queries[r % 64]], n_results=args.top_k, where={"ppt_id": ppt_ids[picks[r % 64]]}
+            )
+
+        def deck_query_nin(r: int) -> Any:
+            where = {"$and": [{"ppt_id": ppt_ids[picks[r % 64]]}, {"slide_index": {"$nin": [1, 2, 3]}}]}
+            return collection.query(query_embeddings=[queries[r % 64]], n_results=args.top_k, where=where)
+
+        def global_query(r: int) -> Any:
+            return collection.query(query_embeddings=[queries[r % 64]], n_results=args.top_k)
+
+        params = f"decks={args.decks},slides={args.slides},dim={args.dim}"
+        cases: List[Dict[str, Any]] = []
+        for name, func, rounds in (
+            ("deck_query", deck_query, args.rounds),
+            ("deck_query_nin", deck_query_nin, args.rounds),
+            ("global_query", global_query, max(5, args.rounds // 10)),
+        ):
+            cases.append({"case": f"{name}[{backend},{params}]", **_measure(func, rounds)})
+
+        extra = {
+            "index_seconds": round(index_seconds, 2),
+            "disk_mb": round(vector_store._dir_size(Path(tmp)) / 1024 / 1024, 1),
+            "rss_mb_after": _rss_mb(),
+            "rss_mb_growth": round(_rss_mb() - rss_before, 1),
+        }
+        for case in cases:
+            case.update(extra)
+        vector_store.configure_vector_store(path=vector_store.CHROMA_DIR)
+    return cases
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases: List[Dict[str, Any]] = []
+    for backend in args.backends:
+        print(f"[vector_backends] {backend} ...", file=sys.stderr)
+        cmd = [
+            sys.executable, "-m", "benchmarks.bench_vector_backends", "--only", backend,
+            "--decks", str(args.decks), "--slides", str(args.slides), "--dim", str(args.dim),
+            "--top-k", str(args.top_k), "--rounds", str(args.rounds),
+        ]
+        out = subprocess.run(cmd, cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        cases.extend(json.loads(out.stdout))
+    return {
+        "benchmark": "vector_backends",
+        "meta": run_metadata(),
+        "params": {
+            "decks": args.decks, "slides": args.slides, "dim": args.dim, "top_k": args.top_k, "rounds": args.rounds,
+        },
+        "cases": cases,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--decks", type=int, default=200, help="PPT 份数")
+    parser.add_argument("--slides", type=int, default=100, help="每份 PPT 的页数")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--only", choices=BACKENDS, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    if args.only is not None:
+        print(json.dumps(run_backend(args.only, args), ensure_ascii=False))
+        return
+
+    result = run(args)
+    write_result(result, args.output)
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_results(old, result)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
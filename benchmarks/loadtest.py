@@ -0,0 +1,416 @@
+"""端到端压测：真实启动后端（uvicorn），LLM 与外部知识源由本地替身服务提供。
+
+流程：
+1. 启动 benchmarks.stub_services（OpenAI 兼容的流式 LLM + arXiv / Wikipedia / 百科替身），
+   首 token 延迟、输出速率与外部知识延迟均可配置；
+2. 以 benchmarks.loadtest_app 启动后端（离线嵌入、临时向量库 / 笔记 / 上传目录），
+   通过环境变量把 LLM 与知识源地址指向替身；
+3. 预先上传若干合成 PPT，然后按给定比例混合回放 upload / slides / search / expand，
+   每个虚拟用户（学生）是一个闭环线程，可设置思考时间；
+4. 对每个并发档位输出各接口的吞吐 (req/s)、错误数与 p50 / p95 / p99，
+   并附上后端 /metrics 中各阶段的平均耗时，便于定位瓶颈。
+
+全程只访问 127.0.0.1，无需联网。运行方式（在项目根目录下）：
+
+    python -m benchmarks.loadtest --users 5 20 50 --duration 30 --output load.json
+    python -m benchmarks.loadtest --users 5 20 50 --compare load.json --metric p95_ms
+
+如需压测已部署的实例（例如 docker 容器），用 --app-url 指定地址，并让该实例使用
+启动时打印的替身环境变量。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from benchmarks._common import ROOT_DIR, compare_results, run_metadata, summarize, write_result
+from benchmarks._offline import TOPICS, build_synthetic_pptx
+from benchmarks.stub_services import service_env
+
+
+DEFAULT_MIX = "slides=40,search=30,expand=25,upload=5"
+ENDPOINTS = ("upload", "slides", "search", "expand")
+PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析 `slides=40,search=30,...` 形式的请求比例。"""
+
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"未知接口：{name}（可选 {', '.join(ENDPOINTS)}）")
+        mix[name] = float(weight or 0)
+    if not any(w > 0 for w in mix.values()):
+        raise ValueError("请求比例不能全部为 0")
+    return mix
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, timeout: float = 60.0, proc: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"进程提前退出：{' '.join(proc.args)}")
+        try:
+            if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"等待 {url} 就绪超时")
+
+
+@contextmanager
+def _serve(args: List[str], env: Dict[str, str], url: str) -> Iterator[None]:
+    proc = subprocess.Popen(
+        [sys.executable, *args],
+        cwd=ROOT_DIR,
+        env={**os.environ, **env},
+    )
+    try:
+        _wait_ready(url, proc=proc)
+        yield
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+@dataclass
+class Recorder:
+    """线程安全地收集每个接口的耗时样本与错误数。"""
+
+    samples: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, endpoint: str, elapsed_ms: float, ok: bool) -> None:
+        with self.lock:
+            if ok:
+                self.samples[endpoint].append(elapsed_ms)
+            else:
+                self.errors[endpoint] += 1
+
+
+class LoadClient:
+    """单个虚拟用户：独立的 HTTP 会话与登录 token。"""
+
+    def __init__(self, base_url: str, username: str, timeout: float) -> None:
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        password = "loadtest-pass"
+        self.session.post(
+            f"{base_url}/auth/register",
+            json={"username": username, "password": password},
+            timeout=timeout,
+        )
+        resp = self.session.post(
+            f"{base_url}/auth/login",
+            json={"username": username, "password": password},
+            timeout=timeout,
+        )
+        resp.raise_for_status()
+        self.session.headers["Authorization"] = f"Bearer {resp.json()['token']}"
+
+    def upload(self, content: bytes, filename: str) -> requests.Response:
+        return self.session.post(
+            f"{self.base_url}/upload",
+            params={"warm": "false"},
+            files={"file": (filename, content, PPTX_MIME)},
+            timeout=self.timeout,
+        )
+
+    def get(self, path: str, **params: Any) -> requests.Response:
+        return self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+
+
+def _timed(recorder: Recorder, endpoint: str, func) -> Optional[requests.Response]:
+    start = time.perf_counter()
+    try:
+        resp = func()
+        ok = resp.status_code < 400
+    except requests.RequestException:
+        resp, ok = None, False
+    recorder.record(endpoint, (time.perf_counter() - start) * 1000, ok)
+    return resp
+
+
+def _virtual_user(
+    client: LoadClient,
+    decks: List[Tuple[str, int]],
+    deck_bytes: bytes,
+    mix: Dict[str, float],
+    args: argparse.Namespace,
+    deadline: float,
+    recorder: Recorder,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    while time.time() < deadline:
+        op = rng.choices(names, weights)[0]
+        ppt_id, num_slides = rng.choice(decks)
+        if op == "upload":
+            _timed(recorder, op, lambda: client.upload(deck_bytes, "loadtest.pptx"))
+        elif op == "slides":
+            _timed(recorder, op, lambda: client.get("/slides", ppt_id=ppt_id))
+        elif op == "search":
+            query = rng.choice(TOPICS)
+            _timed(recorder, op, lambda: client.get("/search", ppt_id=ppt_id, q=query, top_k=5))
+        else:
+            params = {
+                "ppt_id": ppt_id,
+                "slide_index": rng.randint(1, num_slides),
+                "refresh": str(rng.random() < args.expand_refresh).lower(),
+            }
+            _timed(recorder, op, lambda: client.get("/expand", **params))
+        if args.think_ms > 0:
+            time.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+
+_STAGE_RE = re.compile(r'^ppt_agent_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+def scrape_stage_means(base_url: str) -> Dict[str, float]:
+    """从 /metrics 读取各阶段的平均耗时（毫秒），用于定位瓶颈。"""
+
+    try:
+        text = requests.get(f"{base_url}/metrics", timeout=10).text
+    except requests.RequestException:
+        return {}
+    sums: Dict[str, float] = {}
+    counts: Dict[str, float] = {}
+    for line in text.splitlines():
+        match = _STAGE_RE.match(line)
+        if not match:
+            continue
+        kind, stage, value = match.groups()
+        (sums if kind == "sum" else counts)[stage] = float(value)
+    return {
+        stage: round(sums.get(stage, 0.0) / count * 1000, 3)
+        for stage, count in sorted(counts.items())
+        if count
+    }
+
+
+def run_stage(
+    base_url: str,
+    users: int,
+    decks: List[Tuple[str, int]],
+    deck_bytes: bytes,
+    mix: Dict[str, float],
+    args: argparse.Namespace,
+) -> List[Dict[str, Any]]:
+    """以 users 个并发虚拟用户持续施压 args.duration 秒，返回各接口统计。"""
+
+    clients = [LoadClient(base_url, f"student{users:03d}{i:04d}", args.timeout) for i in range(users)]
+    recorder = Recorder()
+    deadline = time.time() + args.duration
+    threads = [
+        threading.Thread(
+            target=_virtual_user,
+            args=(client, decks, deck_bytes, mix, args, deadline, recorder, args.seed + i),
+            daemon=True,
+        )
+        for i, client in enumerate(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    cases: List[Dict[str, Any]] = []
+    total = 0
+    for endpoint in ENDPOINTS:
+        samples = recorder.samples.get(endpoint, [])
+        errors = recorder.errors.get(endpoint, 0)
+        if not samples and not errors:
+            continue
+        total += len(samples)
+        cases.append(
+            {
+                "case": f"{endpoint}[u={users}]",
+                "endpoint": endpoint,
+                "users": users,
+                "errors": errors,
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                **summarize(samples),
+            }
+        )
+    cases.append(
+        {
+            "case": f"all[u={users}]",
+            "endpoint": "all",
+            "users": users,
+            "errors": sum(recorder.errors.values()),
+            "throughput_rps": round(total / elapsed, 2),
+        }
+    )
+    return cases
+
+
+def _setup_decks(client: LoadClient, tmp: Path, count: int, num_slides: int) -> Tuple[List[Tuple[str, int]], List[float]]:
+    decks: List[Tuple[str, int]] = []
+    upload_ms: List[float] = []
+    for i in range(count):
+        path = build_synthetic_pptx(tmp / f"deck-{i}.pptx", num_slides)
+        start = time.perf_counter()
+        resp = client.upload(path.read_bytes(), path.name)
+        upload_ms.append((time.perf_counter() - start) * 1000)
+        resp.raise_for_status()
+        body = resp.json()
+        decks.append((body["ppt_id"], body["num_slides"]))
+    return decks, upload_ms
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    cases: List[Dict[str, Any]] = []
+    stage_means: Dict[str, float] = {}
+
+    with tempfile.TemporaryDirectory(prefix="ppt-agent-load-") as tmp_str:
+        tmp = Path(tmp_str)
+        stub_port = _free_port()
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        stub_args = [
+            "-m", "benchmarks.stub_services",
+            "--port", str(stub_port),
+            "--llm-ttft-ms", str(args.llm_ttft_ms),
+            "--llm-tokens-per-sec", str(args.llm_tokens_per_sec),
+            "--llm-output-tokens", str(args.llm_output_tokens),
+            "--external-latency-ms", str(args.external_latency_ms),
+        ]
+        app_env = {
+            **service_env(stub_url),
+            "PPT_AGENT_NOTES_DIR": str(tmp / "notes"),
+            "PPT_AGENT_UPLOAD_DIR": str(tmp / "uploads"),
+            "PPT_AGENT_AUTH_DIR": str(tmp / "auth"),
+            "PPT_AGENT_LOADTEST_CHROMA_DIR": str(tmp / "chroma"),
+            "PPT_AGENT_LOADTEST_EMBEDDING": args.embedding,
+            "PPT_AGENT_WARM_NOTES": "0",
+        }
+
+        with _serve(stub_args, {}, stub_url):
+            if args.app_url:
+                base_url = args.app_url.rstrip("/")
+                print("压测外部实例，请确保其使用以下替身配置：", file=sys.stderr)
+                for key, value in service_env(stub_url).items():
+                    print(f"  {key}={value}", file=sys.stderr)
+                app_ctx = _noop()
+            else:
+                app_port = _free_port()
+                base_url = f"http://127.0.0.1:{app_port}"
+                app_ctx = _serve(
+                    [
+                        "-m", "uvicorn", "benchmarks.loadtest_app:app",
+                        "--host", "127.0.0.1",
+                        "--port", str(app_port),
+                        "--log-level", "warning",
+                    ],
+                    app_env,
+                    base_url,
+                )
+
+            with app_ctx:
+                owner = LoadClient(base_url, "teacher0001", args.timeout)
+                decks, upload_ms = _setup_decks(owner, tmp, args.decks, args.slides)
+                cases.append({"case": "setup_upload", "endpoint": "upload", **summarize(upload_ms)})
+                deck_bytes = build_synthetic_pptx(tmp / "reupload.pptx", args.upload_slides).read_bytes()
+
+                for users in args.users:
+                    print(f"[loadtest] {users} 个并发用户，持续 {args.duration}s ...", file=sys.stderr)
+                    cases.extend(run_stage(base_url, users, decks, deck_bytes, mix, args))
+                stage_means = scrape_stage_means(base_url)
+
+    return {
+        "benchmark": "loadtest",
+        "meta": run_metadata(),
+        "params": {
+            "users": args.users,
+            "duration_s": args.duration,
+            "mix": mix,
+            "decks": args.decks,
+            "slides": args.slides,
+            "expand_refresh": args.expand_refresh,
+            "think_ms": args.think_ms,
+            "llm_ttft_ms": args.llm_ttft_ms,
+            "llm_tokens_per_sec": args.llm_tokens_per_sec,
+            "llm_output_tokens": args.llm_output_tokens,
+            "external_latency_ms": args.external_latency_ms,
+            "embedding": args.embedding,
+        },
+        "cases": cases,
+        "stage_mean_ms": stage_means,
+    }
+
+
+@contextmanager
+def _noop() -> Iterator[None]:
+    yield
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[5, 20], help="并发虚拟用户数，可给出多个档位")
+    parser.add_argument("--duration", type=float, default=20.0, help="每个档位的持续时间（秒）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="请求比例，如 slides=40,search=30,expand=25,upload=5")
+    parser.add_argument("--decks", type=int, default=4, help="预先上传的 PPT 数量")
+    parser.add_argument("--slides", type=int, default=20, help="每份预上传 PPT 的页数")
+    parser.add_argument("--upload-slides", type=int, default=10, help="压测中 upload 请求所用 PPT 的页数")
+    parser.add_argument("--expand-refresh", type=float, default=0.5, help="expand 请求忽略已存笔记、重新生成的比例")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="虚拟用户两次请求之间的平均思考时间")
+    parser.add_argument("--llm-ttft-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--llm-output-tokens", type=int, default=200)
+    parser.add_argument("--external-latency-ms", type=float, default=100.0)
+    parser.add_argument("--embedding", choices=["hash", "default"], default="hash")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单个请求的超时时间（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app-url", default="", help="压测已运行的后端而不是自动启动")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None, help="与之前保存的结果逐项对比")
+    parser.add_argument("--metric", default="p95_ms", help="--compare 时对比的指标")
+    args = parser.parse_args()
+
+    result = run(args)
+    write_result(result, args.output)
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_results(old, result, metric=args.metric)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""压测时由 uvicorn 加载的后端入口：在导入 backend.api 前切换到离线嵌入与临时向量库。
+
+    uvicorn benchmarks.loadtest_app:app
+
+- PPT_AGENT_LOADTEST_CHROMA_DIR：向量库目录（由 benchmarks.loadtest 创建的临时目录）；
+- PPT_AGENT_LOADTEST_EMBEDDING：`hash`（默认，离线哈希嵌入）或 `default`（Chroma 默认模型，
+  需本地已缓存模型文件）。
+
+其余配置（LLM / 外部知识源地址、笔记与上传目录）均通过后端原有的环境变量注入。
+"""
+
+from __future__ import annotations
+
+import os
+
+from benchmarks._offline import use_offline_store
+from core import vector_store
+
+_chroma_dir = os.getenv("PPT_AGENT_LOADTEST_CHROMA_DIR")
+if os.getenv("PPT_AGENT_LOADTEST_EMBEDDING", "hash") == "hash":
+    use_offline_store(_chroma_dir or vector_store.CHROMA_DIR)
+elif _chroma_dir:
+    vector_store.configure_vector_store(path=_chroma_dir)
+
+from backend.api import app  # noqa: E402
+
+__all__ = ["app"]
@@ -0,0 +1,184 @@
+"""压测用的本地替身服务：OpenAI 兼容的 LLM 接口 + arXiv / Wikipedia / 百度百科。
+
+- LLM：`POST /v1/chat/completions`，支持 stream=true（SSE 逐 token 输出）与普通响应，
+  首 token 延迟与输出速率可配置，流式结束时按 stream_options.include_usage 返回用量；
+- 知识源：`GET /arxiv/api/query`、`GET /wikipedia/w/api.php`、`GET /baike/search/word`，
+  响应格式与真实来源一致（复用 benchmarks/_offline.py 中的样例），延迟可配置。
+
+后端通过环境变量指向本服务（见 `service_env`），无需修改业务代码。全部使用 asyncio.sleep
+模拟延迟，单进程即可支撑上百个并发连接。
+
+单独运行：
+
+    python -m benchmarks.stub_services --port 8900 --llm-ttft-ms 300 --llm-tokens-per-sec 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict
+
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+
+from benchmarks._offline import fake_arxiv_feed, fake_baike_html, fake_wikipedia_json
+
+
+@dataclass
+class StubConfig:
+    """替身服务的延迟参数（单位：秒 / token 每秒）。"""
+
+    llm_ttft_s: float = 0.3
+    llm_tokens_per_sec: float = 50.0
+    llm_output_tokens: int = 200
+    external_latency_s: float = 0.1
+
+
+# 每个“token”对应的文本片段，长度接近中文模型的平均 token
+_TOKEN_TEXT = "知识点 "
+
+
+def _estimate_prompt_tokens(body: Dict[str, Any]) -> int:
+    chars = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+    return max(1, chars // 2)
+
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish: Any = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="PPT Agent Load-Test Stubs")
+    interval = 1.0 / config.llm_tokens_per_sec if config.llm_tokens_per_sec > 0 else 0.0
+
+    @app.get("/health")
+    async def health() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Response:
+        body = await request.json()
+        model = body.get("model", "stub-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        n_tokens = int(body.get("max_tokens") or config.llm_output_tokens)
+        n_tokens = min(n_tokens, config.llm_output_tokens)
+        usage = {
+            "prompt_tokens": _estimate_prompt_tokens(body),
+            "completion_tokens": n_tokens,
+            "total_tokens": _estimate_prompt_tokens(body) + n_tokens,
+        }
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.llm_ttft_s + interval * n_tokens)
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": _TOKEN_TEXT * n_tokens},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events() -> AsyncIterator[str]:
+            await asyncio.sleep(config.llm_ttft_s)
+            yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+            for _ in range(n_tokens):
+                yield _chunk(completion_id, model, {"content": _TOKEN_TEXT})
+                if interval:
+                    await asyncio.sleep(interval)
+            yield _chunk(completion_id, model, {}, finish="stop")
+            if include_usage:
+                tail = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(tail)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/arxiv/api/query")
+    async def arxiv_query(
+        search_query: str = Query(""),
+        max_results: int = Query(3),
+    ) -> Response:
+        await asyncio.sleep(config.external_latency_s)
+        return Response(fake_arxiv_feed(search_query, max_results), media_type="application/atom+xml")
+
+    @app.get("/wikipedia/w/api.php")
+    async def wikipedia_api(
+        srsearch: str = Query(""),
+        srlimit: int = Query(3),
+    ) -> Response:
+        await asyncio.sleep(config.external_latency_s)
+        return Response(fake_wikipedia_json(srsearch, srlimit), media_type="application/json")
+
+    @app.get("/baike/search/word")
+    async def baike_search(word: str = Query("")) -> HTMLResponse:
+        await asyncio.sleep(config.external_latency_s)
+        return HTMLResponse(fake_baike_html(word))
+
+    return app
+
+
+def service_env(base_url: str) -> Dict[str, str]:
+    """返回让后端改用替身服务所需的环境变量。"""
+
+    return {
+        "SILICONFLOW_API_KEY": "stub-key",
+        "SILICONFLOW_BASE_URL": f"{base_url}/v1",
+        "PPT_AGENT_ARXIV_API_URL": f"{base_url}/arxiv/api/query",
+        "PPT_AGENT_WIKIPEDIA_API_URL": f"{base_url}/wikipedia/w/api.php",
+        "PPT_AGENT_BAIKE_SEARCH_URL": f"{base_url}/baike/search/word?word={{word}}",
+    }
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--llm-ttft-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--llm-output-tokens", type=int, default=200)
+    parser.add_argument("--external-latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        llm_ttft_s=args.llm_ttft_ms / 1000,
+        llm_tokens_per_sec=args.llm_tokens_per_sec,
+        llm_output_tokens=args.llm_output_tokens,
+        external_latency_s=args.external_latency_ms / 1000,
+    )
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
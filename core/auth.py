@@ -0,0 +1,266 @@
+"""登录认证：HMAC 签名的无状态 token + 持久化用户表。
+
+token 格式为 `{用户名 base64url}.{过期时间戳}.{签名 base64url}`，签名为
+HMAC-SHA256(secret, "用户名.过期时间戳")。校验只需一次 HMAC 计算，不查询任何共享状态，
+因此多个 uvicorn worker / 多个节点只要使用同一个密钥即可互相识别对方签发的 token。
+
+用户信息保存在 SQLite 中，查询结果在进程内缓存（只缓存已存在的用户，
+其他 worker 新注册的用户在本进程首次查询时即可读到）。密码以 scrypt 加每个用户独立的随机盐
+保存，格式为 `scrypt${n}${r}${p}${盐 base64url}${哈希 base64url}`。
+
+配置（环境变量）：
+- PPT_AGENT_AUTH_SECRET:     签名密钥；多节点部署时必须显式配置且各节点一致。
+                             未配置时在 PPT_AGENT_AUTH_DIR 下生成并持久化一个随机密钥，
+                             同一主机上的多个 worker 共享该文件；
+- PPT_AGENT_AUTH_DIR:        用户库与自动生成密钥的存放目录，默认项目根目录下的 auth/；
+- PPT_AGENT_TOKEN_TTL_HOURS: token 有效期（小时），默认 24；
+- PPT_AGENT_ADMIN_TOKEN:     全局维护接口（淘汰、压缩向量库）的管理员令牌，未配置时这些接口不可用。
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+AUTH_SECRET_ENV = "PPT_AGENT_AUTH_SECRET"
+AUTH_DIR_ENV = "PPT_AGENT_AUTH_DIR"
+TOKEN_TTL_HOURS_ENV = "PPT_AGENT_TOKEN_TTL_HOURS"
+ADMIN_TOKEN_ENV = "PPT_AGENT_ADMIN_TOKEN"
+
+AUTH_DIR = Path(os.getenv(AUTH_DIR_ENV, str(Path(__file__).resolve().parent.parent / "auth")))
+
+_secret: Optional[bytes] = None
+_secret_lock = threading.Lock()
+
+
+class TokenError(Exception):
+    """token 校验失败。"""
+
+
+class TokenInvalid(TokenError):
+    """格式错误或签名不匹配。"""
+
+
+class TokenExpired(TokenError):
+    """签名有效但已过期。"""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _load_or_create_secret() -> bytes:
+    configured = os.getenv(AUTH_SECRET_ENV)
+    if configured:
+        return configured.encode("utf-8")
+
+    AUTH_DIR.mkdir(parents=True, exist_ok=True)
+    path = AUTH_DIR / "secret.key"
+    try:
+        # O_EXCL：多个 worker 同时启动时只有一个写入成功，其余读取同一份密钥
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            data = path.read_bytes().strip()
+            if data:
+                return data
+            time.sleep(0.01)
+        raise RuntimeError(f"密钥文件为空：{path}")
+    value = secrets.token_hex(32).encode("ascii")
+    with os.fdopen(fd, "wb") as f:
+        f.write(value)
+    return value
+
+
+def _get_secret() -> bytes:
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                _secret = _load_or_create_secret()
+    return _secret
+
+
+def configure_auth(secret: Optional[str] = None, auth_dir: Optional[str | Path] = None) -> None:
+    """切换密钥或存储目录（测试、基准使用）；同时清空用户缓存。"""
+
+    global _secret, AUTH_DIR
+    if auth_dir is not None:
+        AUTH_DIR = Path(auth_dir)
+    _secret = secret.encode("utf-8") if secret is not None else None
+    USER_STORE.reset()
+
+
+def _token_ttl_seconds() -> float:
+    return float(os.getenv(TOKEN_TTL_HOURS_ENV, "24")) * 3600
+
+
+def _sign(message: bytes) -> str:
+    return _b64encode(hmac.new(_get_secret(), message, hashlib.sha256).digest())
+
+
+def issue_token(username: str, now: Optional[float] = None) -> str:
+    """为用户签发一个带过期时间的 token。"""
+
+    expires = int((time.time() if now is None else now) + _token_ttl_seconds())
+    message = f"{_b64encode(username.encode('utf-8'))}.{expires}"
+    return f"{message}.{_sign(message.encode('ascii'))}"
+
+
+def verify_token(token: str, now: Optional[float] = None) -> str:
+    """校验 token 并返回用户名；失败时抛出 TokenInvalid / TokenExpired。"""
+
+    message, sep, signature = token.rpartition(".")
+    user_part, sep2, expires_part = message.partition(".")
+    if not sep or not sep2 or not expires_part.isdigit():
+        raise TokenInvalid("token 格式错误")
+    try:
+        message_bytes = message.encode("ascii")
+    except UnicodeEncodeError:
+        raise TokenInvalid("token 格式错误")
+    if not hmac.compare_digest(_sign(message_bytes), signature):
+        raise TokenInvalid("签名不匹配")
+    if int(expires_part) < (time.time() if now is None else now):
+        raise TokenExpired("token 已过期")
+    try:
+        return _b64decode(user_part).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        raise TokenInvalid("token 格式错误")
+
+
+def verify_admin_token(supplied: Optional[str]) -> bool:
+    """校验全局维护操作的管理员令牌；未配置 PPT_AGENT_ADMIN_TOKEN 时一律拒绝。"""
+
+    token = os.getenv(ADMIN_TOKEN_ENV)
+    if not token or not supplied:
+        return False
+    return hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+
+_SCRYPT_N = 2**14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+_SCRYPT_SALT_BYTES = 16
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * 1024 * 1024, dklen=32)
+
+
+def hash_password(password: str) -> str:
+    """生成带随机盐的 scrypt 密码哈希（约 50ms，调用方应放到线程池中执行）。"""
+
+    salt = secrets.token_bytes(_SCRYPT_SALT_BYTES)
+    digest = _scrypt(password, salt, _SCRYPT_N, _SCRYPT_R, _SCRYPT_P)
+    return f"scrypt${_SCRYPT_N}${_SCRYPT_R}${_SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """校验密码，按常数时间比较。"""
+
+    try:
+        _scheme, n, r, p, salt, digest = stored.split("$")
+        expected = _b64decode(digest)
+        actual = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, binascii.Error):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+class UserStore:
+    """SQLite 用户表 + 进程内只读缓存（username -> 密码哈希）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cache: Dict[str, str] = {}
+        self._initialized_path: Optional[Path] = None
+
+    @property
+    def path(self) -> Path:
+        return AUTH_DIR / "users.sqlite3"
+
+    def _connect(self) -> sqlite3.Connection:
+        path = self.path
+        fresh = self._initialized_path != path
+        if fresh:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10)
+        if fresh:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "username TEXT PRIMARY KEY, password_hash TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._initialized_path = path
+        return conn
+
+    def reset(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._initialized_path = None
+
+    def get_password_hash(self, username: str) -> Optional[str]:
+        cached = self._cache.get(username)
+        if cached is not None:
+            return cached
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT password_hash FROM users WHERE username = ?", (username,)
+                ).fetchone()
+            finally:
+                conn.close()
+            if row is None:
+                return None
+            self._cache[username] = row[0]
+            return row[0]
+
+    def create_user(self, username: str, password_hash: str) -> bool:
+        """新建用户；用户名已存在时返回 False。"""
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                    (username, password_hash, time.time()),
+                )
+                conn.commit()
+            except sqlite3.IntegrityError:
+                return False
+            finally:
+                conn.close()
+            self._cache[username] = password_hash
+            return True
+
+
+USER_STORE = UserStore()
+
+# 用户不存在时用于校验的占位哈希：参数与真实哈希相同，使两种情况的耗时一致
+_DUMMY_HASH = f"scrypt${_SCRYPT_N}${_SCRYPT_R}${_SCRYPT_P}${_b64encode(bytes(_SCRYPT_SALT_BYTES))}${_b64encode(bytes(32))}"
+
+
+def authenticate(username: str, password: str) -> bool:
+    """校验用户名与密码（查询 SQLite 并计算 scrypt，调用方应放到线程池中执行）。
+
+    用户不存在时同样对占位哈希计算一次 scrypt，响应时间不会暴露用户名是否已注册。
+    """
+
+    stored = USER_STORE.get_password_hash(username)
+    matched = verify_password(password, stored or _DUMMY_HASH)
+    return matched and stored is not None
@@ -0,0 +1,494 @@
+"""/upload_url 使用的异步下载：HTTP Range 分段并行、断点续传与提前校验 PPTX 结构。
+
+流程：
+1. 首个请求带 `Range: bytes=0-{分段大小-1}`，同时作为探测：
+   - 服务器返回 206 且给出总长度时，按分段并行下载剩余部分；
+   - 返回 200（不支持 Range）时退化为单连接顺序下载；
+   - 文件不超过一个分段时，首个请求即完成下载。
+2. 分段模式下先单独拉取文件末尾（≤ 64 KB），解析 ZIP 的中央目录，确认包含
+   `[Content_Types].xml` 与 `ppt/presentation.xml`，不是 PPTX 时立即取消其余分段；
+   顺序模式下收到前 4 个字节即检查 ZIP 本地文件头。
+3. 单个分段失败时从已收到的字节处重试（`Range` + `If-Range`），不会从头开始；
+   每个完成的分段记录在 `<分片目录>/<URL 哈希>.json`，同一 URL 再次下载时只补齐缺失的分段。
+   服务器端文件发生变化（ETag / Last-Modified / 长度不一致）时放弃旧进度重新下载。
+
+配置（环境变量）：
+- PPT_AGENT_DOWNLOAD_SEGMENT_MB: 分段大小，默认 4；
+- PPT_AGENT_DOWNLOAD_PARALLEL:   同时下载的分段数，默认 4。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Set, Tuple
+
+import httpx
+
+from core.metrics import STAGE_SECONDS
+
+
+SEGMENT_MB_ENV = "PPT_AGENT_DOWNLOAD_SEGMENT_MB"
+PARALLEL_ENV = "PPT_AGENT_DOWNLOAD_PARALLEL"
+
+USER_AGENT = "ppt-agent/0.1"
+
+# 中央目录结束记录（EOCD）22 字节 + 最长 64 KB 注释
+_TAIL_BYTES = 22 + 65535
+_REQUIRED_PARTS = ("[Content_Types].xml", "ppt/presentation.xml")
+# 超过该时长未再续传的残留分片会被清理
+_PARTIAL_TTL_SECONDS = 24 * 3600
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+# 同一 URL 共用一份残留分片，同时只允许一个下载写入；
+# 只要还有下载持有或等待某个锁，它就留在表中，全部结束后自动移除
+_partial_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class DownloadError(Exception):
+    """下载失败（网络错误、服务器返回错误状态等）。"""
+
+
+class DownloadTooLarge(DownloadError):
+    """文件超过允许的大小。"""
+
+
+class InvalidPackage(DownloadError):
+    """内容不是 PPTX（ZIP 结构不符或缺少必需部件）。"""
+
+
+class _SourceChanged(DownloadError):
+    """续传过程中服务器上的文件发生了变化。"""
+
+
+@dataclass
+class DownloadResult:
+    """下载统计：ranged 表示是否使用了分段下载，resumed_bytes 为沿用上次进度的字节数。"""
+
+    size: int
+    ranged: bool
+    segments: int
+    resumed_bytes: int
+    seconds: float
+
+
+def _segment_bytes() -> int:
+    return max(1, int(float(os.getenv(SEGMENT_MB_ENV, "4")) * 1024 * 1024))
+
+
+def _parallel() -> int:
+    return max(1, int(os.getenv(PARALLEL_ENV, "4")))
+
+
+# ---------------------------------------------------------------------------
+# ZIP 结构校验
+# ---------------------------------------------------------------------------
+
+
+def check_local_header(head: bytes) -> None:
+    """检查文件开头是否为 ZIP 本地文件头。"""
+
+    if not head.startswith(b"PK\x03\x04"):
+        raise InvalidPackage("不是 ZIP / PPTX 文件")
+
+
+def find_central_directory(tail: bytes, total: int) -> Optional[Tuple[int, int]]:
+    """从文件末尾的数据中找到 EOCD，返回中央目录的 (偏移, 长度)；ZIP64 等无法判断时返回 None。"""
+
+    pos = tail.rfind(b"PK\x05\x06")
+    if pos < 0 or len(tail) - pos < 22:
+        raise InvalidPackage("缺少 ZIP 中央目录")
+    _sig, _disk, _cd_disk, _n_disk, _n_total, cd_size, cd_offset, _comment = struct.unpack(
+        "<4sHHHHIIH", tail[pos : pos + 22]
+    )
+    if cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF:
+        return None
+    if cd_offset + cd_size > total:
+        raise InvalidPackage("ZIP 中央目录越界")
+    return cd_offset, cd_size
+
+
+def central_directory_names(data: bytes) -> List[str]:
+    """解析中央目录，返回其中的文件名列表。"""
+
+    names: List[str] = []
+    pos = 0
+    while pos + 46 <= len(data) and data[pos : pos + 4] == b"PK\x01\x02":
+        flags = struct.unpack_from("<H", data, pos + 8)[0]
+        name_len, extra_len, comment_len = struct.unpack_from("<HHH", data, pos + 28)
+        raw = data[pos + 46 : pos + 46 + name_len]
+        names.append(raw.decode("utf-8" if flags & 0x800 else "cp437", errors="replace"))
+        pos += 46 + name_len + extra_len + comment_len
+    return names
+
+
+def check_pptx_parts(names: List[str]) -> None:
+    missing = [part for part in _REQUIRED_PARTS if part not in names]
+    if missing:
+        raise InvalidPackage(f"缺少 PPTX 部件：{', '.join(missing)}")
+
+
+def validate_pptx_file(path: Path) -> None:
+    """对已下载完成的文件做同样的结构校验（读取文件头与中央目录，不解压）。"""
+
+    total = path.stat().st_size
+    with path.open("rb") as f:
+        check_local_header(f.read(4))
+        f.seek(max(0, total - _TAIL_BYTES))
+        location = find_central_directory(f.read(), total)
+        if location is None:
+            return
+        f.seek(location[0])
+        check_pptx_parts(central_directory_names(f.read(location[1])))
+
+
+# ---------------------------------------------------------------------------
+# 下载
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Remote:
+    total: int
+    etag: str
+    last_modified: str
+
+    @property
+    def validator(self) -> str:
+        # If-Range 只接受强 ETag 或 Last-Modified
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+
+class _Partial:
+    """残留分片与进度记录。"""
+
+    def __init__(self, partial_dir: Path, url: str) -> None:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        self.url = url
+        self.path = partial_dir / f"{key}.part"
+        self.meta_path = partial_dir / f"{key}.json"
+
+    def load(self, remote: _Remote) -> Set[int]:
+        """读取已完成的分段起点；与服务器当前版本不一致时丢弃。"""
+
+        try:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return set()
+        same = (
+            meta.get("url") == self.url
+            and meta.get("total") == remote.total
+            and meta.get("etag") == remote.etag
+            and meta.get("last_modified") == remote.last_modified
+            and self.path.exists()
+            and self.path.stat().st_size == remote.total
+        )
+        return {int(s) for s in meta.get("done", [])} if same else set()
+
+    def save(self, remote: _Remote, done: Set[int]) -> None:
+        tmp = self.meta_path.with_suffix(".json.tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "url": self.url,
+                    "total": remote.total,
+                    "etag": remote.etag,
+                    "last_modified": remote.last_modified,
+                    "done": sorted(done),
+                }
+            ),
+            encoding="utf-8",
+        )
+        tmp.replace(self.meta_path)
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self.meta_path.unlink(missing_ok=True)
+
+
+def _prune_partials(partial_dir: Path) -> None:
+    cutoff = time.time() - _PARTIAL_TTL_SECONDS
+    for path in partial_dir.glob("*.part"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                path.with_suffix(".json").unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def _retryable(exc: httpx.HTTPError) -> bool:
+    """连接类错误与 5xx 可以重试；4xx、重定向过多等其他错误重试也不会成功。"""
+
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def _remote_from(resp: httpx.Response, total: int) -> _Remote:
+    return _Remote(
+        total=total,
+        etag=resp.headers.get("etag", ""),
+        last_modified=resp.headers.get("last-modified", ""),
+    )
+
+
+async def _fetch_range(
+    client: httpx.AsyncClient,
+    url: str,
+    remote: _Remote,
+    start: int,
+    end: int,
+    sink: Callable[[int, bytes], None],
+    retries: int,
+    backoff_s: float,
+) -> None:
+    """请求 [start, end] 并把数据交给 sink(偏移, 数据)；连接中断时从已收到的位置续传。"""
+
+    pos = start
+    attempt = 0
+    while pos <= end:
+        headers = {"Range": f"bytes={pos}-{end}"}
+        if remote.validator:
+            headers["If-Range"] = remote.validator
+        try:
+            async with client.stream("GET", url, headers=headers) as resp:
+                if resp.status_code == 200:
+                    # If-Range 不匹配时服务器返回完整的新文件
+                    raise _SourceChanged("文件在下载过程中发生变化")
+                resp.raise_for_status()
+                m = _CONTENT_RANGE_RE.match(resp.headers.get("content-range", ""))
+                if resp.status_code != 206 or m is None or int(m.group(1)) != pos:
+                    raise DownloadError("服务器返回的 Content-Range 与请求不一致")
+                if m.group(3) != "*" and int(m.group(3)) != remote.total:
+                    raise _SourceChanged("文件在下载过程中发生变化")
+                # 不指定 chunk_size：收到多少写多少，连接中断时已收到的数据都不会丢
+                async for chunk in resp.aiter_bytes():
+                    chunk = chunk[: end - pos + 1]
+                    sink(pos, chunk)
+                    pos += len(chunk)
+                    if pos > end:
+                        break
+            if pos <= end:
+                raise httpx.ReadError("连接提前关闭")
+        except httpx.InvalidURL as exc:
+            raise DownloadError(f"URL 无效：{exc}") from exc
+        except httpx.HTTPError as exc:
+            if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code < 500:
+                raise DownloadError(f"服务器返回 {exc.response.status_code}") from exc
+            attempt += 1
+            if attempt > retries or not _retryable(exc):
+                raise DownloadError(f"分段下载失败：{exc}") from exc
+            await asyncio.sleep(backoff_s * 2 ** (attempt - 1))
+
+
+async def _fetch_bytes(
+    client: httpx.AsyncClient,
+    url: str,
+    remote: _Remote,
+    start: int,
+    end: int,
+    retries: int,
+    backoff_s: float,
+) -> bytes:
+    buf = bytearray(end - start + 1)
+
+    def sink(offset: int, data: bytes) -> None:
+        buf[offset - start : offset - start + len(data)] = data
+
+    await _fetch_range(client, url, remote, start, end, sink, retries, backoff_s)
+    return bytes(buf)
+
+
+async def _check_remote_package(
+    client: httpx.AsyncClient, url: str, remote: _Remote, retries: int, backoff_s: float
+) -> None:
+    """只下载文件末尾与中央目录，确认是 PPTX；与分段下载并行进行。"""
+
+    total = remote.total
+    tail_start = max(0, total - _TAIL_BYTES)
+    tail = await _fetch_bytes(client, url, remote, tail_start, total - 1, retries, backoff_s)
+    location = find_central_directory(tail, total)
+    if location is None:
+        return
+    cd_offset, cd_size = location
+    if cd_offset >= tail_start:
+        directory = tail[cd_offset - tail_start : cd_offset - tail_start + cd_size]
+    else:
+        directory = await _fetch_bytes(
+            client, url, remote, cd_offset, cd_offset + cd_size - 1, retries, backoff_s
+        )
+    check_pptx_parts(central_directory_names(directory))
+
+
+async def _gather_or_cancel(tasks: List["asyncio.Task[None]"]) -> None:
+    """等待全部任务；任一失败时取消其余任务并抛出该异常。"""
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _download_sequential(resp: httpx.Response, partial: _Partial, max_bytes: int) -> int:
+    """服务器不支持 Range：单连接顺序写入，收到文件头即校验。"""
+
+    length = resp.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise DownloadTooLarge("文件过大")
+    partial.discard()
+    size = 0
+    head = b""
+    with partial.path.open("wb") as f:
+        async for chunk in resp.aiter_bytes(64 * 1024):
+            if len(head) < 4:
+                head += chunk[: 4 - len(head)]
+                if len(head) >= 4:
+                    check_local_header(head)
+            size += len(chunk)
+            if size > max_bytes:
+                raise DownloadTooLarge("文件过大")
+            f.write(chunk)
+    return size
+
+
+async def _download(
+    client: httpx.AsyncClient,
+    url: str,
+    partial: _Partial,
+    max_bytes: int,
+    segment: int,
+    parallel: int,
+    retries: int,
+    backoff_s: float,
+) -> DownloadResult:
+    start_time = time.perf_counter()
+    # 有续传记录时只探测 1 个字节以取得长度与版本，否则首个请求直接取第一个分段
+    probe_end = 0 if partial.meta_path.exists() else segment - 1
+
+    async with client.stream("GET", url, headers={"Range": f"bytes=0-{probe_end}"}) as resp:
+        if resp.status_code == 200:
+            size = await _download_sequential(resp, partial, max_bytes)
+            return DownloadResult(size, False, 1, 0, time.perf_counter() - start_time)
+        resp.raise_for_status()
+        m = _CONTENT_RANGE_RE.match(resp.headers.get("content-range", ""))
+        if resp.status_code != 206 or m is None or m.group(3) == "*":
+            raise DownloadError("服务器未返回文件长度")
+        total = int(m.group(3))
+        if total > max_bytes:
+            raise DownloadTooLarge("文件过大")
+        remote = _remote_from(resp, total)
+
+        done = partial.load(remote)
+        resumed = sum(min(segment, total - s) for s in done)
+        if not done:
+            with partial.path.open("wb") as f:
+                f.truncate(total)
+
+        received = 0
+        head = b""
+        with partial.path.open("r+b") as f:
+            async for chunk in resp.aiter_bytes(64 * 1024):
+                if len(head) < 4 and probe_end > 0:
+                    head += chunk[: 4 - len(head)]
+                    if len(head) >= 4:
+                        check_local_header(head)
+                f.write(chunk[: max(0, probe_end + 1 - received)])
+                received += len(chunk)
+        if probe_end > 0 and received >= min(segment, total):
+            done.add(0)
+            partial.save(remote, done)
+
+    starts = list(range(0, total, segment))
+    pending = [s for s in starts if s not in done]
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def fetch_segment(start: int) -> None:
+        async with semaphore:
+            with partial.path.open("r+b") as f:
+
+                def sink(offset: int, data: bytes) -> None:
+                    f.seek(offset)
+                    f.write(data)
+
+                end = min(start + segment, total) - 1
+                await _fetch_range(client, url, remote, start, end, sink, retries, backoff_s)
+        done.add(start)
+        partial.save(remote, done)
+
+    tasks = []
+    if pending and len(starts) > 1:
+        # 先发出结构校验请求（只取末尾的中央目录），不是 PPTX 时尽早取消其余分段
+        tasks.append(asyncio.create_task(_check_remote_package(client, url, remote, retries, backoff_s)))
+    tasks += [asyncio.create_task(fetch_segment(s)) for s in pending]
+    await _gather_or_cancel(tasks)
+    return DownloadResult(total, True, len(starts), resumed, time.perf_counter() - start_time)
+
+
+async def download_file(
+    url: str,
+    dest: Path,
+    partial_dir: Path,
+    max_bytes: int,
+    segment_bytes: Optional[int] = None,
+    parallel: Optional[int] = None,
+    retries: int = 3,
+    backoff_s: float = 0.5,
+    timeout_s: float = 20.0,
+) -> DownloadResult:
+    """下载 url 到 dest。
+
+    失败时抛出 DownloadError（或其子类 DownloadTooLarge / InvalidPackage）。
+    dest 只在完整下载并通过结构校验后才出现；网络错误导致的失败会保留分片，供下次续传。
+    """
+
+    partial_dir.mkdir(parents=True, exist_ok=True)
+    _prune_partials(partial_dir)
+    partial = _Partial(partial_dir, url)
+    segment = segment_bytes or _segment_bytes()
+    lock = _partial_locks.setdefault(partial.path.name, asyncio.Lock())
+
+    async with lock:
+        try:
+            async with httpx.AsyncClient(
+                timeout=timeout_s, follow_redirects=True, headers={"User-Agent": USER_AGENT}
+            ) as client:
+                for attempt in range(retries + 1):
+                    try:
+                        result = await _download(
+                            client, url, partial, max_bytes, segment, parallel or _parallel(), retries, backoff_s
+                        )
+                        break
+                    except _SourceChanged:
+                        partial.discard()
+                        if attempt >= retries:
+                            raise
+                    except httpx.InvalidURL as exc:
+                        raise DownloadError(f"URL 无效：{exc}") from exc
+                    except httpx.HTTPError as exc:
+                        if attempt >= retries or not _retryable(exc):
+                            raise DownloadError(f"下载失败：{exc}") from exc
+                        await asyncio.sleep(backoff_s * 2**attempt)
+            validate_pptx_file(partial.path)
+        except (InvalidPackage, DownloadTooLarge):
+            partial.discard()
+            raise
+        os.replace(partial.path, dest)
+        partial.meta_path.unlink(missing_ok=True)
+
+    STAGE_SECONDS.observe(result.seconds, stage="download")
+    return result
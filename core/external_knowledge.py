@@ -7,22 +7,53 @@
 - 百度百科：作为补充来源
 
 注意：这些来源均为在线请求；如网络不可达，本模块会返回空列表，保证主链路可运行。
+各来源地址可通过环境变量覆盖（镜像站点或本地压测替身）：
+PPT_AGENT_ARXIV_API_URL / PPT_AGENT_WIKIPEDIA_API_URL / PPT_AGENT_BAIKE_SEARCH_URL。
+
+统一入口 search_external_knowledge 会先查询本地离线知识索引（core/knowledge_index.py），
+命中时不再访问网络；设置 PPT_AGENT_KNOWLEDGE_ONLY=1 时只查本地索引，适合无外网的部署环境。
 """
 
 from __future__ import annotations
 
-from typing import List
+from typing import Callable, List
 from urllib.parse import quote
+import functools
+import os
 import re
+import time
 import xml.etree.ElementTree as ET
 
 import requests
 
+from core import knowledge_index
+from core.metrics import EXTERNAL_FETCH_SECONDS, EXTERNAL_RESULTS
+
 DEFAULT_EXTERNAL_SOURCE = "arxiv"
+KNOWLEDGE_ONLY_ENV = "PPT_AGENT_KNOWLEDGE_ONLY"
+
+WIKIPEDIA_API_URL = os.getenv("PPT_AGENT_WIKIPEDIA_API_URL", "https://zh.wikipedia.org/w/api.php")
+BAIDU_BAIKE_SEARCH_URL = os.getenv(
+    "PPT_AGENT_BAIKE_SEARCH_URL", "https://baike.baidu.com/search/word?word={word}"
+)
+ARXIV_API_URL = os.getenv("PPT_AGENT_ARXIV_API_URL", "http://export.arxiv.org/api/query")
+
+
+def _instrumented(source: str) -> Callable[[Callable[..., List[str]]], Callable[..., List[str]]]:
+    """记录单个外部来源的请求耗时与是否命中。"""
+
+    def decorator(func: Callable[..., List[str]]) -> Callable[..., List[str]]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> List[str]:
+            start = time.perf_counter()
+            results = func(*args, **kwargs)
+            EXTERNAL_FETCH_SECONDS.observe(time.perf_counter() - start, source=source)
+            EXTERNAL_RESULTS.inc(source=source, outcome="hit" if results else "empty")
+            return results
 
-WIKIPEDIA_API_URL = "https://zh.wikipedia.org/w/api.php"
-BAIDU_BAIKE_SEARCH_URL = "https://baike.baidu.com/search/word?word={word}"
-ARXIV_API_URL = "http://export.arxiv.org/api/query"
+        return wrapper
+
+    return decorator
 
 
 def _strip_html(text: str) -> str:
@@ -36,6 +67,14 @@ def _strip_html(text: str) -> str:
 
 
 
+@_instrumented("local")
+def search_local_knowledge(query: str, max_results: int = 5) -> List[str]:
+    """查询本地离线知识索引（arXiv / Wikipedia dump 导入），不发起网络请求。"""
+
+    return knowledge_index.search_local_knowledge(query, max_results=max_results)
+
+
+@_instrumented("wikipedia")
 def search_wikipedia(query: str, max_results: int = 5) -> List[str]:
     """使用 Wikipedia 的公开 API 搜索条目并返回简介片段列表。"""
 
@@ -78,6 +117,7 @@ def search_wikipedia(query: str, max_results: int = 5) -> List[str]:
     return results
 
 
+@_instrumented("arxiv")
 def search_arxiv(query: str, max_results: int = 5) -> List[str]:
     """从 arXiv API 搜索论文，返回标题+摘要片段。"""
 
@@ -118,6 +158,7 @@ def search_arxiv(query: str, max_results: int = 5) -> List[str]:
     return results
 
 
+@_instrumented("baidu_baike")
 def search_baidu_baike(query: str, max_results: int = 5) -> List[str]:
     """从百度百科抓取条目摘要片段。
 
@@ -165,7 +206,14 @@ def search_external_knowledge(
     max_results: int = 3,
     source: str = DEFAULT_EXTERNAL_SOURCE,
 ) -> List[str]:
-    """统一入口：按来源检索外部知识"""
+    """统一入口：按来源检索外部知识。
+
+    先查本地离线知识索引，命中即返回；未命中时再按 source 访问在线来源。
+    """
+
+    res = search_local_knowledge(query, max_results=max_results)
+    if res or os.getenv(KNOWLEDGE_ONLY_ENV, "").strip().lower() in {"1", "true", "yes", "on"}:
+        return res
 
     src = (source or DEFAULT_EXTERNAL_SOURCE).strip().lower()
     if src in {"baidu", "baidu_baike", "baike"}:
@@ -0,0 +1,363 @@
+"""本地离线知识库：arXiv 元数据 / Wikipedia 摘要 dump 的 SQLite FTS5 全文索引。
+
+实验室部署环境中 arXiv、Wikipedia、百度百科经常访问缓慢或不可达，每次 /expand 都要等满超时。
+本模块把这些来源的离线 dump 导入本地 SQLite，external_knowledge 优先查询本地索引，
+未命中时才访问网络。
+
+存储结构：
+- documents：原文（来源、来源内的唯一键、标题、摘要），(source, doc_key) 唯一，重复导入即更新；
+- documents_fts：contentless FTS5 表，rowid 与 documents.id 对应，只保存倒排索引。
+
+中文没有空格分词，unicode61 分词器会把整段汉字当作一个词。这里入库与查询都把连续汉字
+切成相邻二元组（"梯度下降" -> "梯度 度下 下降"）作为词项：每个二元组直接对应一条倒排链，
+比按单字切分后再做短语匹配少读很多数据。查询先要求全部二元组同时出现，没有结果时放宽为 OR，
+按 bm25 排序，并过滤掉覆盖查询词比例过低的结果。
+
+配置（环境变量）：
+- PPT_AGENT_KNOWLEDGE_DB: 索引文件路径，默认项目根目录下的 knowledge/knowledge.sqlite3。
+                          文件不存在时本地查询直接返回空列表，不会创建文件。
+
+导入方式见 scripts/import_knowledge.py。
+"""
+
+from __future__ import annotations
+
+import bz2
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+KNOWLEDGE_DB_ENV = "PPT_AGENT_KNOWLEDGE_DB"
+
+
+def _default_db_path() -> Path:
+    return Path(
+        os.getenv(
+            KNOWLEDGE_DB_ENV,
+            str(Path(__file__).resolve().parent.parent / "knowledge" / "knowledge.sqlite3"),
+        )
+    )
+
+
+KNOWLEDGE_DB = _default_db_path()
+
+# 命中结果至少要覆盖这么多比例的查询词，避免只共享“定义”“方法”之类常见二元组的结果混入
+MIN_COVERAGE = 0.5
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_CJK_CHAR_RE = re.compile(f"[{_CJK}]")
+_CJK_RUN_RE = re.compile(f"[{_CJK}]+")
+_TERM_RE = re.compile(f"[{_CJK}]+|[A-Za-z0-9]+")
+
+
+@dataclass(frozen=True)
+class KnowledgeDoc:
+    """一条待导入的知识条目。source 为 arxiv / wikipedia 等，doc_key 在来源内唯一。"""
+
+    source: str
+    doc_key: str
+    title: str
+    summary: str
+
+
+def _bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i : i + 2] for i in range(len(run) - 1)]
+
+
+def _segment(text: str) -> str:
+    """入库前的分词预处理：连续汉字替换为空格分隔的二元组，交给 unicode61 按空格切分。"""
+
+    return _CJK_RUN_RE.sub(lambda m: " " + " ".join(_bigrams(m.group(0))) + " ", text)
+
+
+def query_terms(query: str) -> List[str]:
+    """把查询拆成检索词：连续汉字取相邻二元组，英文 / 数字按词。
+
+    存在更长的词时丢弃单个汉字与纯数字（如标题中的“第 3 节”），它们区分度太低。
+    """
+
+    terms: List[str] = []
+    for run in _TERM_RE.findall(query):
+        if _CJK_CHAR_RE.match(run):
+            terms.extend(_bigrams(run))
+        else:
+            terms.append(run.lower())
+
+    strong = [t for t in terms if not (len(t) == 1 or t.isdigit())]
+    if strong:
+        terms = strong
+    return list(dict.fromkeys(terms))[:32]
+
+
+def _fts_query(terms: Sequence[str], operator: str = "OR") -> str:
+    # 检索词只含汉字与字母数字，加引号避免与 FTS5 关键字（AND / OR / NOT）冲突
+    return f" {operator} ".join(f'"{t}"' for t in terms)
+
+
+def format_snippet(source: str, title: str, summary: str) -> str:
+    """格式化为与在线来源一致的片段。"""
+
+    if source == "arxiv":
+        return f"【arXiv: {title}】{summary[:500]}"
+    return f"【{title}】{summary[:500]}"
+
+
+class KnowledgeIndex:
+    """SQLite FTS5 知识索引。查询使用每线程一个只读连接，导入使用独立的写连接。"""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _reader(self) -> Optional[sqlite3.Connection]:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        if not self.path.exists():
+            return None
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._local.conn = conn
+        return conn
+
+    def _writer(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, source TEXT NOT NULL, doc_key TEXT NOT NULL, "
+            "title TEXT NOT NULL, summary TEXT NOT NULL, UNIQUE (source, doc_key))"
+        )
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+            "title, summary, content='', tokenize='unicode61 remove_diacritics 2')"
+        )
+        return conn
+
+    def add_documents(self, docs: Iterable[KnowledgeDoc], batch_size: int = 5000) -> int:
+        """导入（或按 source + doc_key 更新）若干条目，返回处理的条数。"""
+
+        conn = self._writer()
+        total = 0
+        try:
+            for batch in _batched(docs, batch_size):
+                with conn:
+                    for doc in batch:
+                        self._upsert(conn, doc)
+                total += len(batch)
+        finally:
+            conn.close()
+        return total
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, doc: KnowledgeDoc) -> None:
+        row = conn.execute(
+            "SELECT id, title, summary FROM documents WHERE source = ? AND doc_key = ?",
+            (doc.source, doc.doc_key),
+        ).fetchone()
+        if row is not None:
+            doc_id, old_title, old_summary = row
+            # contentless 表删除时需要提供原先入索引的值
+            conn.execute(
+                "INSERT INTO documents_fts (documents_fts, rowid, title, summary) "
+                "VALUES ('delete', ?, ?, ?)",
+                (doc_id, _segment(old_title), _segment(old_summary)),
+            )
+            conn.execute(
+                "UPDATE documents SET title = ?, summary = ? WHERE id = ?",
+                (doc.title, doc.summary, doc_id),
+            )
+        else:
+            doc_id = conn.execute(
+                "INSERT INTO documents (source, doc_key, title, summary) VALUES (?, ?, ?, ?)",
+                (doc.source, doc.doc_key, doc.title, doc.summary),
+            ).lastrowid
+        conn.execute(
+            "INSERT INTO documents_fts (rowid, title, summary) VALUES (?, ?, ?)",
+            (doc_id, _segment(doc.title), _segment(doc.summary)),
+        )
+
+    def optimize(self) -> None:
+        """合并 FTS5 索引段，导入大批数据后执行一次可减小索引并加快查询。"""
+
+        conn = self._writer()
+        try:
+            with conn:
+                conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        finally:
+            conn.close()
+
+    def count(self) -> int:
+        conn = self._reader()
+        if conn is None:
+            return 0
+        try:
+            return int(conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0])
+        except sqlite3.Error:
+            return 0
+
+    def search(self, query: str, max_results: int = 3) -> List[Tuple[str, str, str]]:
+        """全文检索，返回 (source, title, summary) 列表；索引不存在或未命中时返回空列表。"""
+
+        terms = query_terms(query)
+        conn = self._reader()
+        if not terms or conn is None:
+            return []
+
+        # 先要求全部检索词同时出现：匹配集合小，bm25 排序开销低；没有任何结果时再放宽为 OR
+        hits: List[Tuple[str, str, str]] = []
+        seen: set[int] = set()
+        for operator in ("AND", "OR") if len(terms) > 1 else ("AND",):
+            try:
+                rows = conn.execute(
+                    "SELECT d.id, d.source, d.title, d.summary FROM documents_fts "
+                    "JOIN documents AS d ON d.id = documents_fts.rowid "
+                    "WHERE documents_fts MATCH ? ORDER BY bm25(documents_fts, 2.0, 1.0) LIMIT ?",
+                    (_fts_query(terms, operator), max_results * 5),
+                ).fetchall()
+            except sqlite3.Error:
+                return hits
+            for doc_id, source, title, summary in rows:
+                if doc_id in seen:
+                    continue
+                text = f"{title}\n{summary}".lower()
+                covered = sum(1 for t in terms if t in text)
+                if covered / len(terms) >= MIN_COVERAGE:
+                    seen.add(doc_id)
+                    hits.append((source, title, summary))
+                    if len(hits) >= max_results:
+                        return hits
+            if hits:
+                break
+        return hits
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _batched(items: Iterable[KnowledgeDoc], size: int) -> Iterator[List[KnowledgeDoc]]:
+    batch: List[KnowledgeDoc] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_index: Optional[KnowledgeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = KnowledgeIndex(KNOWLEDGE_DB)
+    return _index
+
+
+def configure_knowledge_index(path: str | Path | None = None) -> None:
+    """切换索引文件（测试、基准使用）；path 为空时恢复环境变量中的默认路径。"""
+
+    global _index, KNOWLEDGE_DB
+    KNOWLEDGE_DB = Path(path) if path is not None else _default_db_path()
+    with _index_lock:
+        _index = None
+
+
+def search_local_knowledge(query: str, max_results: int = 3) -> List[str]:
+    """在本地知识索引中检索，返回与在线来源格式一致的片段列表。"""
+
+    if not query.strip():
+        return []
+    return [format_snippet(*hit) for hit in get_knowledge_index().search(query, max_results)]
+
+
+# ---------------------------------------------------------------------------
+# dump 解析
+# ---------------------------------------------------------------------------
+
+
+def _open_text(path: str | Path) -> IO[str]:
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _open_binary(path: str | Path) -> IO[bytes]:
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def iter_arxiv_metadata(
+    path: str | Path, categories: Optional[Sequence[str]] = None
+) -> Iterator[KnowledgeDoc]:
+    """解析 arXiv 元数据快照（每行一个 JSON，含 id / title / abstract / categories）。
+
+    categories 为分类前缀列表（如 ["cs.", "stat.ML"]），只导入至少属于其中一个分类的论文。
+    """
+
+    with _open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if categories:
+                cats = str(item.get("categories", "")).split()
+                if not any(c.startswith(prefix) for c in cats for prefix in categories):
+                    continue
+            title = _clean(item.get("title", ""))
+            abstract = _clean(item.get("abstract", ""))
+            if item.get("id") and (title or abstract):
+                yield KnowledgeDoc("arxiv", str(item["id"]), title, abstract)
+
+
+def iter_wikipedia_abstracts(path: str | Path) -> Iterator[KnowledgeDoc]:
+    """解析 Wikipedia 摘要 dump（如 zhwiki-latest-abstract.xml.gz）：<doc><title/><url/><abstract/></doc>。"""
+
+    with _open_binary(path) as f:
+        root = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = elem
+            if event != "end" or elem.tag != "doc":
+                continue
+            title = _clean(elem.findtext("title") or "")
+            title = re.sub(r"^Wikipedia\s*[:：]\s*", "", title)
+            abstract = _clean(elem.findtext("abstract") or "")
+            url = _clean(elem.findtext("url") or "") or title
+            if title and abstract:
+                yield KnowledgeDoc("wikipedia", url, title, abstract)
+            # 清掉已处理的 <doc>，dump 有数 GB，不能整棵树留在内存里
+            root.clear()
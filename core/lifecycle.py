@@ -0,0 +1,72 @@
+"""PPT 生命周期管理：访问记录与过期淘汰策略。
+
+只负责“哪些 PPT 应当被淘汰”的判断，真正的删除（内存、上传文件、笔记、
+向量库）由后端统一编排。淘汰规则：
+- TTL：超过 ttl_seconds 未被访问的 PPT；
+- LRU：PPT 总数超过 max_decks 时，按最近访问时间从旧到新淘汰多出的部分。
+两项配置为 0 时表示不启用。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Collection, List, Optional
+
+
+class DeckActivity:
+    """按最近访问顺序记录 ppt_id -> 最后访问时间（线程安全）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+
+    def touch(self, ppt_id: str, now: Optional[float] = None) -> None:
+        ts = time.time() if now is None else now
+        with self._lock:
+            self._last_access[ppt_id] = ts
+            self._last_access.move_to_end(ppt_id)
+
+    def forget(self, ppt_id: str) -> None:
+        with self._lock:
+            self._last_access.pop(ppt_id, None)
+
+    def last_access(self, ppt_id: str) -> Optional[float]:
+        with self._lock:
+            return self._last_access.get(ppt_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._last_access)
+
+    def select_evictions(
+        self,
+        ttl_seconds: float = 0,
+        max_decks: int = 0,
+        now: Optional[float] = None,
+        live: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        """返回应当淘汰的 ppt_id 列表（最久未访问的在前），不修改内部状态。
+
+        给出 live 时只考虑其中实际存在的 PPT，其它访问记录既不淘汰也不计入 max_decks。
+        """
+
+        ts = time.time() if now is None else now
+        with self._lock:
+            ordered = list(self._last_access.items())
+        if live is not None:
+            ordered = [(pid, last) for pid, last in ordered if pid in live]
+
+        doomed: List[str] = []
+        if ttl_seconds > 0:
+            doomed = [pid for pid, last in ordered if ts - last > ttl_seconds]
+
+        if max_decks > 0:
+            doomed_set = set(doomed)
+            survivors = [pid for pid, _ in ordered if pid not in doomed_set]
+            overflow = len(survivors) - max_decks
+            if overflow > 0:
+                doomed.extend(survivors[:overflow])
+
+        return doomed
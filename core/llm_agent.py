@@ -4,15 +4,17 @@ LLM Agent 与工具链封装。
 
 from __future__ import annotations
 
+import functools
 import os
+import re
+import time
 from dataclasses import dataclass
-from typing import List, Optional
-
-from langchain_openai import ChatOpenAI
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from core.ppt_parser import Slide
-from core.vector_store import query_similar_slides
+from core.vector_store import query_similar_chunks, query_similar_slides
 from core.external_knowledge import search_external_knowledge
+from core.metrics import BATCH_SLIDES, LLM_CALLS, LLM_INFLIGHT, LLM_TOKENS, STAGE_SECONDS, timed
 
 
 # 为了避免在代码仓库中硬编码密钥，这里通过环境变量读取：
@@ -23,6 +25,21 @@ SILICONFLOW_API_KEY_ENV = "SILICONFLOW_API_KEY"
 SILICONFLOW_BASE_URL_ENV = "SILICONFLOW_BASE_URL"
 DEEPSEEK_MODEL_ENV = "DEEPSEEK_MODEL"
 
+# 未配置 Key 或调用失败时返回的降级内容以此开头，不应被当作有效笔记缓存
+PLACEHOLDER_PREFIX = "【占位输出】"
+
+# 整份 PPT 生成笔记（预热）时，把内容较少的相邻页面打包进一次 LLM 调用，共用指令与检索上下文：
+# - PPT_AGENT_BATCH_TOKEN_BUDGET:       单次打包调用的输入 token 预算（粗略估计），默认 6000；0 关闭打包
+# - PPT_AGENT_BATCH_MAX_SLIDES:         单次调用最多打包的页数，默认 4，同时限制了单次输出长度
+# - PPT_AGENT_BATCH_SMALL_SLIDE_TOKENS: 页面自身内容不超过该 token 数时才参与打包，默认 200
+BATCH_TOKEN_BUDGET_ENV = "PPT_AGENT_BATCH_TOKEN_BUDGET"
+BATCH_MAX_SLIDES_ENV = "PPT_AGENT_BATCH_MAX_SLIDES"
+BATCH_SMALL_SLIDE_TOKENS_ENV = "PPT_AGENT_BATCH_SMALL_SLIDE_TOKENS"
+# 打包输出中每页笔记之前单独一行的分隔标记
+BATCH_MARKER = "<<<SLIDE {index}>>>"
+_BATCH_MARKER_RE = re.compile(r"^[ \t]*<<<SLIDE[ \t]+(\d+)[ \t]*>>>[ \t]*$", re.MULTILINE)
+_CONTEXT_INDEX_RE = re.compile(r"^\[相关页 index=(\d+),")
+
 
 @dataclass
 class AgentConfig:
@@ -31,25 +48,54 @@ class AgentConfig:
     use_wikipedia: bool = True
     top_k_slides: int = 5
     top_k_wiki: int = 3
+    # chunk：按要点检索，Prompt 中只放相关页面里命中的要点；slide：整页检索并拼入整页内容
+    retrieval_granularity: str = "chunk"
+    chunks_per_slide: int = 3
 
 
-def build_slide_context_from_retrieval(
-    slide: Slide,
-    top_k: int,
-    ppt_id: str | None = None,
-) -> str:
-    """基于当前 slide 的标题做一次语义检索，返回可供拼接的文本上下文。"""
+def retrieval_query_text(slide: Slide) -> str:
+    """检索当前页相关内容时使用的查询文本：标题 + 前 8 条要点。"""
 
     parts: List[str] = []
     if slide.title:
         parts.append(slide.title)
     if slide.bullets:
         parts.extend(slide.bullets[:8])
-    query_text = "\n".join([p.strip() for p in parts if p and p.strip()])
+    return "\n".join([p.strip() for p in parts if p and p.strip()])
+
+
+def build_slide_context_from_retrieval(
+    slide: Slide,
+    top_k: int,
+    ppt_id: str | None = None,
+    granularity: str = "chunk",
+    chunks_per_slide: int = 3,
+) -> str:
+    """基于当前 slide 的标题与要点做一次语义检索，返回可供拼接的文本上下文。
+
+    granularity 为 chunk 时在要点级索引上检索，每个相关页只拼入命中的要点（不含当前页本身）；
+    chunk 索引未启用或该 PPT 尚无 chunk 时退回整页检索。
+    """
+
+    query_text = retrieval_query_text(slide)
     if not query_text.strip():
         return ""
 
-    results = query_similar_slides(query_text=query_text, n_results=top_k)
+    if granularity == "chunk":
+        hits = query_similar_chunks(
+            query_text,
+            n_slides=top_k,
+            ppt_id=ppt_id,
+            chunks_per_slide=chunks_per_slide,
+            exclude_slides=(slide.index,) if ppt_id else (),
+        )
+        if hits:
+            return "\n\n".join(
+                f"[相关页 index={hit.slide_index}, title={hit.title}]\n" + "\n".join(hit.chunks)
+                for hit in hits
+            )
+
+    results = query_similar_slides(query_text=query_text, n_results=top_k, ppt_id=ppt_id)
     metadatas = results.get("metadatas", [[]])[0]
     documents = results.get("documents", [[]])[0]
 
@@ -66,6 +112,44 @@ def build_slide_context_from_retrieval(
     return "\n\n".join(lines)
 
 
+# 单页与多页打包 Prompt 共用的约束、Checklayer 与输出要求
+_PROMPT_RULES = """重要约束：
+1. 只允许基于下方提供的「当前 PPT 页面」「PPT 内部相关页面（检索得到）」「外部知识片段」进行推理与改写；
+2. 若材料中找不到支撑某个结论/数字/定义，请明确写“材料不足/待查证/可能”，不要编造；
+3. 尽量在关键结论句末尾标注来源标签：[PPT] / [检索] / [arXiv: 论文标题]，例如：[arXiv: PyramidTNT]。
+
+在生成最终答案前，请显式执行一个两阶段的 Checklayer 过程：
+1. Self-consistency 检查：对你即将输出的要点、公式、示例代码进行自我审查，避免前后矛盾、逻辑不一致或同一段内容反复重复；
+2. 事实与上下文校验：对照下面给出的「PPT 内部相关页面」和「arXiv」，判断关键结论是否与上下文明显冲突，如发现冲突或高度不确定，请在答案中标注“可能/待查证”，并避免给出过于确定的错误结论。"""
+
+_PROMPT_SECTIONS = """1. 背景说明
+2. 知识点详细解释（可包含公式推导/关键步骤）
+3. 示例（代码或生活类比均可）
+4. 延伸阅读建议
+5. AI 自评（见下方要求）
+6. Checklayer
+
+要求：
+- 注意与原 PPT 标题和要点保持语义一致，不要偏题；
+- 如不确定某个细节，请标明“可能”而不是编造确定性结论；
+- 输出使用 Markdown 一级小标题分段；
+- 示例代码只给出一份，保持简洁，不要多次重复相同的训练和预测语句或完全相同的代码块；
+- 优先参考提供的检索结果和 Wikipedia 片段，避免明显违背这些上下文的“离谱内容”；
+- 在正文最后增加一个名为“# AI 自评”的小节，用 3 行以内内容，按 1-5 分（5 为最好）简单评价：
+  - 本次笔记的逻辑结构是否清晰（给出评分和一句理由，例如“4/5：结构清晰，但示例部分略短”）；
+  - 联想内容与原 PPT 内容的语义相关度（给出评分和一句理由，例如“5/5：所有扩展都围绕原主题展开，没有明显跑题”）。
+"""
+
+
+def _slide_block(slide: Slide) -> str:
+    bullets_block = "\n- ".join(slide.bullets) if slide.bullets else "无"
+    return f"""索引: {slide.index}
+标题: {slide.title}
+要点:
+- {bullets_block}
+备注: {slide.notes or '无'}"""
+
+
 def build_prompt_for_slide_expansion(
     slide: Slide,
     retrieved_context: str,
@@ -74,26 +158,14 @@ def build_prompt_for_slide_expansion(
     """构造用于 DeepSeek 等 LLM 的扩展提示词。"""
 
     wiki_block = "\n\n".join(wiki_snippets) if wiki_snippets else "无"
-    bullets_block = "\n- ".join(slide.bullets) if slide.bullets else "无"
 
     return f"""你是一个帮助学生考前复习的智能助教，需要根据 PPT 内的一页内容，
 结合相关页面与外部知识，生成结构化的扩展讲解笔记。
 
-重要约束：
-1. 只允许基于下方提供的「当前 PPT 页面」「PPT 内部相关页面（检索得到）」「外部知识片段」进行推理与改写；
-2. 若材料中找不到支撑某个结论/数字/定义，请明确写“材料不足/待查证/可能”，不要编造；
-3. 尽量在关键结论句末尾标注来源标签：[PPT] / [检索] / [arXiv: 论文标题]，例如：[arXiv: PyramidTNT]。
-
-在生成最终答案前，请显式执行一个两阶段的 Checklayer 过程：
-1. Self-consistency 检查：对你即将输出的要点、公式、示例代码进行自我审查，避免前后矛盾、逻辑不一致或同一段内容反复重复；
-2. 事实与上下文校验：对照下面给出的「PPT 内部相关页面」和「arXiv」，判断关键结论是否与上下文明显冲突，如发现冲突或高度不确定，请在答案中标注“可能/待查证”，并避免给出过于确定的错误结论。
+{_PROMPT_RULES}
 
 【当前 PPT 页面】
-索引: {slide.index}
-标题: {slide.title}
-要点:
-- {bullets_block}
-备注: {slide.notes or '无'}
+{_slide_block(slide)}
 
 【PPT 内部相关页面（检索得到）】
 {retrieved_context or '无相关页面'}
@@ -102,53 +174,155 @@ def build_prompt_for_slide_expansion(
 {wiki_block}
 
 请用简体中文输出本页的扩展讲解，包含以下几个部分：
-1. 背景说明
-2. 知识点详细解释（可包含公式推导/关键步骤）
-3. 示例（代码或生活类比均可）
-4. 延伸阅读建议
-5. AI 自评（见下方要求）
-6. Checklayer
+{_PROMPT_SECTIONS}"""
 
-要求：
-- 注意与原 PPT 标题和要点保持语义一致，不要偏题；
-- 如不确定某个细节，请标明“可能”而不是编造确定性结论；
-- 输出使用 Markdown 一级小标题分段；
-- 示例代码只给出一份，保持简洁，不要多次重复相同的训练和预测语句或完全相同的代码块；
-- 优先参考提供的检索结果和 Wikipedia 片段，避免明显违背这些上下文的“离谱内容”；
-- 在正文最后增加一个名为“# AI 自评”的小节，用 3 行以内内容，按 1-5 分（5 为最好）简单评价：
-  - 本次笔记的逻辑结构是否清晰（给出评分和一句理由，例如“4/5：结构清晰，但示例部分略短”）；
-  - 联想内容与原 PPT 内容的语义相关度（给出评分和一句理由，例如“5/5：所有扩展都围绕原主题展开，没有明显跑题”）。
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计文本的 token 数：中日韩字符与全角符号按 1 个，其余按 4 个字符 1 个。"""
+
+    wide = sum(1 for ch in text if "\u2e80" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af" or "\uff00" <= ch <= "\uffef")
+    return wide + (len(text) - wide + 3) // 4
+
+
+def merge_retrieved_contexts(slides: Sequence[Slide], contexts: Sequence[str]) -> str:
+    """合并多页的检索上下文：相同的相关页只保留一次，已作为当前页出现的相关页不再重复。"""
+
+    current = {slide.index for slide in slides}
+    seen: set = set()
+    blocks: List[str] = []
+    for context in contexts:
+        for block in context.split("\n\n") if context else ():
+            match = _CONTEXT_INDEX_RE.match(block)
+            if match is not None and int(match.group(1)) in current:
+                continue
+            if block.strip() and block not in seen:
+                seen.add(block)
+                blocks.append(block)
+    return "\n\n".join(blocks)
+
+
+def build_prompt_for_slide_batch(
+    slides: Sequence[Slide],
+    retrieved_context: str,
+    wiki_snippets: List[str],
+) -> str:
+    """构造一次调用为多页分别生成笔记的提示词；指令、检索上下文与外部知识各页共用一份。"""
+
+    wiki_block = "\n\n".join(wiki_snippets) if wiki_snippets else "无"
+    slides_block = "\n\n".join(_slide_block(slide) for slide in slides)
+    indices = "、".join(str(slide.index) for slide in slides)
+
+    return f"""你是一个帮助学生考前复习的智能助教，需要根据 PPT 内的若干页内容，
+结合相关页面与外部知识，为每一页分别生成结构化的扩展讲解笔记。
+
+{_PROMPT_RULES}
+
+【当前 PPT 页面】（共 {len(slides)} 页，请逐页分别讲解）
+{slides_block}
+
+【PPT 内部相关页面（检索得到，各页共用）】
+{retrieved_context or '无相关页面'}
+
+【外部知识片段（各页共用）】
+{wiki_block}
+
+请用简体中文为上面每一页分别输出扩展讲解，每一页都包含以下几个部分：
+{_PROMPT_SECTIONS}
+输出格式（必须严格遵守，程序会按分隔标记拆分各页笔记）：
+- 按页面顺序输出，每一页的笔记之前单独一行写分隔标记 {BATCH_MARKER.format(index="页面索引")}，例如 {BATCH_MARKER.format(index=slides[0].index)}；
+- 分隔标记之后是该页完整的 Markdown 笔记，各页笔记互相独立，不要写“同上”或引用其它页的笔记；
+- 本次需要输出的页面索引依次为：{indices}。
 """
 
 
+def parse_batch_response(text: str, indices: Sequence[int]) -> Dict[int, str]:
+    """按分隔标记拆分打包调用的输出，返回 {页面索引: 笔记}。
+
+    只保留请求中的页面；重复出现、内容为空或没有 Markdown 小标题的页面视为解析失败，不出现在结果中。
+    """
+
+    wanted = set(indices)
+    matches = list(_BATCH_MARKER_RE.finditer(text))
+    sections: Dict[int, List[str]] = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.setdefault(int(match.group(1)), []).append(text[match.end():end].strip())
+
+    parsed: Dict[int, str] = {}
+    for index, bodies in sections.items():
+        if index not in wanted or len(bodies) != 1:
+            continue
+        body = bodies[0]
+        if body.endswith("```") and body.count("```") % 2 == 1:
+            # 整段输出被包在代码块里时，最后一页会带上多余的结束围栏
+            body = body[:-3].rstrip()
+        if body and any(line.startswith("#") for line in body.splitlines()):
+            parsed[index] = body
+    return parsed
+
+
+def _llm_settings() -> tuple[str, str]:
+    base_url = os.getenv(
+        SILICONFLOW_BASE_URL_ENV, "https://api.siliconflow.cn/v1"
+    )
+    model = os.getenv(DEEPSEEK_MODEL_ENV, "deepseek-ai/DeepSeek-V3.2-Exp")
+    return base_url, model
+
+
+def preload_llm_client() -> None:
+    """预先导入 LLM 客户端依赖，已配置 Key 时顺带创建客户端；供服务启动后在后台调用。"""
+
+    import langchain_openai  # noqa: F401
+    from langchain_core.messages import HumanMessage, SystemMessage  # noqa: F401
+
+    key = os.getenv(SILICONFLOW_API_KEY_ENV)
+    if key:
+        _get_chat_model(key, *_llm_settings())
+
+
+@functools.lru_cache(maxsize=8)
+def _get_chat_model(api_key: str, base_url: str, model: str) -> Any:
+    """按配置缓存 ChatOpenAI 实例。
+
+    langchain_openai 导入较慢（约 1 秒），推迟到首次调用 LLM 时；
+    复用同一实例也复用了底层 HTTP 连接池，避免每次调用重新建连。
+    """
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        model=model,
+        max_retries=3,
+        temperature=0.2,
+        stream_usage=True,
+    )
+
+
 def call_llm(prompt: str, api_key: Optional[str] = None) -> str:
     """调用 LLM 的占位函数。
 
     - 预留 DeepSeek API Key 的位置：
       默认从环境变量 `SILICONFLOW_API_KEY` 读取，如未提供则仅返回占位说明。
     - 使用硅基流动的 OpenAI 兼容接口，通过 LangChain 的 ChatOpenAI 客户端调用 DeepSeek 模型。
+    - 以流式方式接收输出，记录首 token 延迟 (llm_ttft)、总耗时 (llm_total) 与 token 用量。
     """
     key = api_key or os.getenv(SILICONFLOW_API_KEY_ENV)
     if not key:
+        LLM_CALLS.inc(outcome="no_key")
         # 无 API Key 时，返回占位内容，保证示例链路可在本地跑通
         return (
-            "【占位输出】此处应为通过硅基流动调用 DeepSeek 模型后返回的扩展讲解内容。"
+            f"{PLACEHOLDER_PREFIX}此处应为通过硅基流动调用 DeepSeek 模型后返回的扩展讲解内容。"
             "请在部署环境中配置 SILICONFLOW_API_KEY，并按 README 中说明设置 Base URL 与模型名。"
         )
 
-    base_url = os.getenv(
-        SILICONFLOW_BASE_URL_ENV, "https://api.siliconflow.cn/v1"
-    )
-    model = os.getenv(DEEPSEEK_MODEL_ENV, "deepseek-ai/DeepSeek-V3.2-Exp")
+    base_url, model = _llm_settings()
 
+    start = time.perf_counter()
+    LLM_INFLIGHT.inc()
     try:
-        chat = ChatOpenAI(
-            api_key=key,
-            base_url=base_url,
-            model=model,
-            max_retries=3,
-            temperature=0.2,
-        )
+        chat = _get_chat_model(key, base_url, model)
 
         from langchain_core.messages import SystemMessage, HumanMessage
 
@@ -157,28 +331,47 @@ def call_llm(prompt: str, api_key: Optional[str] = None) -> str:
             HumanMessage(content=prompt),
         ]
 
-        response = chat.invoke(messages)
-        return response.content
+        response = None
+        for chunk in chat.stream(messages):
+            if response is None:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_ttft")
+                response = chunk
+            else:
+                response = response + chunk
+
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_total")
+        LLM_CALLS.inc(outcome="ok")
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage:
+            LLM_TOKENS.inc(usage.get("input_tokens", 0), kind="prompt")
+            LLM_TOKENS.inc(usage.get("output_tokens", 0), kind="completion")
+        return response.content if response is not None else ""
     except Exception as exc:
+        LLM_CALLS.inc(outcome="error")
         # 网络/HTTP/客户端错误时，降级为占位输出
         return (
-            "【占位输出】调用 DeepSeek LLM 过程中出现错误："
+            f"{PLACEHOLDER_PREFIX}调用 DeepSeek LLM 过程中出现错误："
             f"{exc}。请检查网络、API Key、Base URL 以及 LangChain 配置。"
         )
+    finally:
+        LLM_INFLIGHT.dec()
 
 
-def expand_slide_with_tools(
-    slide: Slide,
-    config: Optional[AgentConfig] = None,
-    ppt_id: str | None = None,
-) -> str:
-    """综合使用向量检索与 外部知识源，生成单页 PPT 的扩展讲解。
-    """
+def is_placeholder_output(text: str) -> bool:
+    """判断 LLM 输出是否为降级占位内容。"""
 
-    cfg = config or AgentConfig()
+    return text.startswith(PLACEHOLDER_PREFIX)
+
+
+def _slide_materials(slide: Slide, cfg: AgentConfig, ppt_id: str | None) -> Tuple[str, List[str]]:
+    """单页扩展所需的材料：PPT 内部检索上下文与外部知识片段。"""
 
     retrieved_context = build_slide_context_from_retrieval(
-        slide, top_k=cfg.top_k_slides, ppt_id=ppt_id
+        slide,
+        top_k=cfg.top_k_slides,
+        ppt_id=ppt_id,
+        granularity=cfg.retrieval_granularity,
+        chunks_per_slide=cfg.chunks_per_slide,
     )
 
     wiki_snippets: List[str] = []
@@ -187,6 +380,20 @@ def expand_slide_with_tools(
             slide.title,
             max_results=cfg.top_k_wiki,
         )
+    return retrieved_context, wiki_snippets
+
+
+@timed("expand")
+def expand_slide_with_tools(
+    slide: Slide,
+    config: Optional[AgentConfig] = None,
+    ppt_id: str | None = None,
+) -> str:
+    """综合使用向量检索与 外部知识源，生成单页 PPT 的扩展讲解。
+    """
+
+    cfg = config or AgentConfig()
+    retrieved_context, wiki_snippets = _slide_materials(slide, cfg, ppt_id)
 
     prompt = build_prompt_for_slide_expansion(
         slide=slide,
@@ -195,3 +402,97 @@ def expand_slide_with_tools(
     )
 
     return call_llm(prompt)
+
+
+def group_small_slides(slides: Sequence[Slide]) -> List[List[Slide]]:
+    """按页面顺序把相邻的小页面分组（每组不超过 PPT_AGENT_BATCH_MAX_SLIDES 页），内容较多的页面单独成组。"""
+
+    max_slides = int(os.getenv(BATCH_MAX_SLIDES_ENV, "4"))
+    small_tokens = int(os.getenv(BATCH_SMALL_SLIDE_TOKENS_ENV, "200"))
+    if max_slides <= 1 or int(os.getenv(BATCH_TOKEN_BUDGET_ENV, "6000")) <= 0:
+        return [[slide] for slide in slides]
+
+    groups: List[List[Slide]] = []
+    current: List[Slide] = []
+    for slide in slides:
+        if estimate_tokens(_slide_block(slide)) > small_tokens:
+            if current:
+                groups.append(current)
+                current = []
+            groups.append([slide])
+            continue
+        current.append(slide)
+        if len(current) >= max_slides:
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _pack_by_budget(
+    slides: Sequence[Slide],
+    materials: Dict[int, Tuple[str, List[str]]],
+) -> List[Tuple[List[Slide], str]]:
+    """在输入 token 预算内贪心打包，返回 [(页面, prompt)]；单页的 prompt 与逐页生成完全相同。"""
+
+    budget = int(os.getenv(BATCH_TOKEN_BUDGET_ENV, "6000"))
+
+    def prompt_for(batch: List[Slide]) -> str:
+        if len(batch) == 1:
+            context, snippets = materials[batch[0].index]
+            return build_prompt_for_slide_expansion(batch[0], context, snippets)
+        context = merge_retrieved_contexts(batch, [materials[s.index][0] for s in batch])
+        snippets = list(dict.fromkeys(snip for s in batch for snip in materials[s.index][1]))
+        return build_prompt_for_slide_batch(batch, context, snippets)
+
+    packed: List[Tuple[List[Slide], str]] = []
+    batch: List[Slide] = []
+    prompt = ""
+    for slide in slides:
+        candidate = prompt_for(batch + [slide])
+        if batch and estimate_tokens(candidate) > budget:
+            packed.append((batch, prompt))
+            batch, candidate = [slide], prompt_for([slide])
+        else:
+            batch = batch + [slide]
+        prompt = candidate
+    if batch:
+        packed.append((batch, prompt))
+    return packed
+
+
+@timed("expand_batch")
+def expand_slides_batched(
+    slides: Sequence[Slide],
+    config: Optional[AgentConfig] = None,
+    ppt_id: str | None = None,
+) -> Dict[int, str]:
+    """为多页生成扩展讲解，返回 {页面索引: 笔记}，用于整份 PPT 的后台生成。
+
+    相邻的小页面在 token 预算内打包进一次 LLM 调用，共用指令、检索上下文与外部知识，
+    再按分隔标记拆回各页；某页拆分失败时自动退回单页调用。调用本身降级为占位输出时，
+    整组页面都返回该占位内容，由调用方决定是否重试。
+    """
+
+    cfg = config or AgentConfig()
+    results: Dict[int, str] = {}
+    for group in group_small_slides(slides):
+        materials = {slide.index: _slide_materials(slide, cfg, ppt_id) for slide in group}
+        for batch, prompt in _pack_by_budget(group, materials):
+            output = call_llm(prompt)
+            if len(batch) == 1 or is_placeholder_output(output):
+                BATCH_SLIDES.inc(len(batch), result="single" if len(batch) == 1 else "placeholder")
+                results.update({slide.index: output for slide in batch})
+                continue
+
+            parsed = parse_batch_response(output, [slide.index for slide in batch])
+            BATCH_SLIDES.inc(len(parsed), result="packed")
+            for slide in batch:
+                if slide.index in parsed:
+                    results[slide.index] = parsed[slide.index]
+                    continue
+                BATCH_SLIDES.inc(result="fallback")
+                context, snippets = materials[slide.index]
+                results[slide.index] = call_llm(build_prompt_for_slide_expansion(slide, context, snippets))
+    return {slide.index: results[slide.index] for slide in slides}
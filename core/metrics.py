@@ -0,0 +1,310 @@
+"""轻量级 Prometheus 风格指标。
+
+不依赖 prometheus_client，只实现本项目用到的三类指标（Counter / Gauge / Histogram），
+并按 Prometheus 文本格式导出，供 `/metrics` 抓取。
+
+计时统一使用 time.perf_counter，每次记录只做一次加锁的数组累加，开销在微秒级。
+
+用法示例：
+
+    with STAGE_SECONDS.time(stage="retrieve"):
+        ...
+
+    @timed("parse")
+    def parse_ppt(...): ...
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_REGISTRY: List["_Metric"] = []
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器。"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值，如正在处理的请求数。"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    @contextmanager
+    def track_inprogress(self, **labels: Any) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(_Metric):
+    """按固定桶统计分布（单位：秒），导出 _bucket / _sum / _count。"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation)
+        self._buckets = tuple(sorted(buckets))
+        # label -> [各桶计数..., 总和, 总数]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        pos = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = [0.0] * (len(self._buckets) + 3)
+                self._values[key] = row
+            row[pos] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            row = self._values.get(_label_key(labels))
+            return int(row[-1]) if row else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines: List[str] = []
+        bounds = list(self._buckets) + [float("inf")]
+        for key, row in items:
+            cumulative = 0.0
+            for bound, n in zip(bounds, row[: len(bounds)]):
+                cumulative += n
+                le = _format_value(bound) if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(row[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(row[-1])}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+def render_prometheus() -> str:
+    """按 Prometheus 文本格式 (0.0.4) 导出全部指标。"""
+
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    """清空全部指标的取值，主要用于测试与基准。"""
+
+    for metric in _REGISTRY:
+        metric.clear()
+
+
+# ---------------------------------------------------------------------------
+# 项目内使用的指标
+# ---------------------------------------------------------------------------
+
+STAGE_SECONDS = Histogram(
+    "ppt_agent_stage_seconds",
+    "Latency of pipeline stages (parse, embed, index, retrieve, expand, llm_ttft, llm_total, pdf).",
+)
+EXTERNAL_FETCH_SECONDS = Histogram(
+    "ppt_agent_external_fetch_seconds",
+    "Latency of external knowledge fetches per source.",
+)
+EXTERNAL_RESULTS = Counter(
+    "ppt_agent_external_results_total",
+    "External knowledge lookups per source and outcome (hit, empty).",
+)
+NOTE_CACHE = Counter(
+    "ppt_agent_note_cache_total",
+    "Note lookups on /expand by result (hit, pending, miss).",
+)
+PDF_CACHE = Counter(
+    "ppt_agent_pdf_cache_total",
+    "PDF export cache lookups by result (hit, pending, miss).",
+)
+LLM_TOKENS = Counter(
+    "ppt_agent_llm_tokens_total",
+    "LLM tokens reported by the provider, by kind (prompt, completion).",
+)
+LLM_CALLS = Counter(
+    "ppt_agent_llm_calls_total",
+    "LLM calls by outcome (ok, error, no_key).",
+)
+LLM_INFLIGHT = Gauge(
+    "ppt_agent_llm_inflight",
+    "LLM calls currently in progress.",
+)
+PREFETCH = Counter(
+    "ppt_agent_prefetch_total",
+    "Neighbouring-slide prefetches by result (scheduled, cancelled, over_budget).",
+)
+BATCH_SLIDES = Counter(
+    "ppt_agent_batch_slides_total",
+    "Slides generated by whole-deck generation, by path (packed, fallback, single, placeholder).",
+)
+WARM_PENDING = Gauge(
+    "ppt_agent_warm_pending",
+    "Background note generations queued or running.",
+)
+HTTP_REQUESTS = Counter(
+    "ppt_agent_http_requests_total",
+    "HTTP requests by method, route and status code.",
+)
+HTTP_SECONDS = Histogram(
+    "ppt_agent_http_request_seconds",
+    "HTTP request latency by route.",
+)
+HTTP_INFLIGHT = Gauge(
+    "ppt_agent_http_inflight",
+    "HTTP requests currently in progress by route.",
+)
+PROFILE_REQUESTS = Counter(
+    "ppt_agent_profile_requests_total",
+    "Requests run under the sampling profiler, by reason (admin, sampled).",
+)
+
+
+def timed(stage: str) -> Callable[[_F], _F]:
+    """装饰器：把函数耗时记入 ppt_agent_stage_seconds{stage=...}。"""
+
+    def decorator(func: _F) -> _F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
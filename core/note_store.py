@@ -0,0 +1,146 @@
+"""扩展笔记的持久化存储。
+
+按 (ppt_id, slide_index, use_wikipedia) 保存 `expand_slide_with_tools` 生成的 Markdown，
+供 `/expand` 直接命中、`/notes` 一次性读取整份 PPT 的笔记。两种生成配置的笔记分别保存，互不覆盖。
+
+存储布局：每个 PPT 一个 JSON 文件 `notes/{ppt_id}.json`，
+内容形如 {"3": {"wikipedia": "...", "plain": "..."}}（plain 为不使用外部知识时的笔记）；
+进程内另有一份按 ppt_id 的内存缓存，避免重复读盘。每次写入都会重写整个文件，
+批量生成时用 save_notes 一次写入一组页面。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+NOTES_DIR_ENV = "PPT_AGENT_NOTES_DIR"
+
+NOTES_DIR = Path(
+    os.getenv(NOTES_DIR_ENV, str(Path(__file__).resolve().parent.parent / "notes"))
+)
+
+_lock = threading.Lock()
+# ppt_id -> slide_index -> 生成配置（wikipedia / plain）-> markdown
+_cache: Dict[str, Dict[int, Dict[str, str]]] = {}
+
+
+def _deck_path(ppt_id: str) -> Path:
+    return NOTES_DIR / f"{ppt_id}.json"
+
+
+def _variant(use_wikipedia: bool) -> str:
+    return "wikipedia" if use_wikipedia else "plain"
+
+
+def _parse_entry(value: Any) -> Dict[str, str]:
+    if not isinstance(value, dict):
+        return {}
+    return {k: v for k, v in value.items() if k in ("wikipedia", "plain") and isinstance(v, str)}
+
+
+def _load_locked(ppt_id: str) -> Dict[int, Dict[str, str]]:
+    notes = _cache.get(ppt_id)
+    if notes is not None:
+        return notes
+
+    notes = {}
+    path = _deck_path(ppt_id)
+    if path.exists():
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            notes = {int(k): entry for k, v in raw.items() if (entry := _parse_entry(v))}
+        except Exception:
+            # 文件损坏时视为无缓存，后续写入会覆盖
+            notes = {}
+    _cache[ppt_id] = notes
+    return notes
+
+
+def _flush_locked(ppt_id: str) -> None:
+    NOTES_DIR.mkdir(parents=True, exist_ok=True)
+    notes = _cache.get(ppt_id, {})
+    path = _deck_path(ppt_id)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(
+        json.dumps({str(k): v for k, v in sorted(notes.items())}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    tmp_path.replace(path)
+
+
+def get_note(ppt_id: str, slide_index: int, use_wikipedia: bool = True) -> Optional[str]:
+    """读取某一页按指定生成配置生成的笔记；不存在时返回 None。"""
+
+    with _lock:
+        entry = _load_locked(ppt_id).get(slide_index)
+        return entry.get(_variant(use_wikipedia)) if entry else None
+
+
+def save_note(ppt_id: str, slide_index: int, markdown: str, use_wikipedia: bool = True) -> None:
+    """保存某一页的笔记，并同步写盘。"""
+
+    save_notes(ppt_id, {slide_index: markdown}, use_wikipedia=use_wikipedia)
+
+
+def save_notes(ppt_id: str, notes: Dict[int, str], use_wikipedia: bool = True) -> None:
+    """保存同一生成配置下的多页笔记，只写一次盘。"""
+
+    if not notes:
+        return
+    variant = _variant(use_wikipedia)
+    with _lock:
+        deck = _load_locked(ppt_id)
+        for slide_index, markdown in notes.items():
+            deck.setdefault(slide_index, {})[variant] = markdown
+        _flush_locked(ppt_id)
+
+
+def load_deck_notes(ppt_id: str, use_wikipedia: Optional[bool] = None) -> Dict[int, str]:
+    """一次性读取整份 PPT 已生成的笔记：slide_index -> markdown。
+
+    use_wikipedia 为 None 时每页优先返回默认配置（使用外部知识）的笔记，没有时返回另一种；
+    指定时只返回该配置的笔记。
+    """
+
+    variants = ("wikipedia", "plain") if use_wikipedia is None else (_variant(use_wikipedia),)
+    with _lock:
+        notes = _load_locked(ppt_id)
+        deck: Dict[int, str] = {}
+        for idx, entry in sorted(notes.items()):
+            markdown = next((entry[v] for v in variants if v in entry), None)
+            if markdown is not None:
+                deck[idx] = markdown
+        return deck
+
+
+def remap_deck_notes(ppt_id: str, carried: Dict[int, int]) -> int:
+    """PPT 重新上传后按 新 index -> 旧 index 的映射沿用笔记。
+
+    映射之外的页面（新增或已修改）笔记全部丢弃，返回沿用的页数。
+    """
+
+    with _lock:
+        old_notes = _load_locked(ppt_id)
+        new_notes = {
+            new_idx: old_notes[old_idx]
+            for new_idx, old_idx in carried.items()
+            if old_idx in old_notes
+        }
+        if new_notes == old_notes:
+            return len(new_notes)
+        _cache[ppt_id] = new_notes
+        _flush_locked(ppt_id)
+        return len(new_notes)
+
+
+def delete_deck_notes(ppt_id: str) -> None:
+    """删除整份 PPT 的笔记（内存缓存与磁盘文件）。"""
+
+    with _lock:
+        _cache.pop(ppt_id, None)
+        _deck_path(ppt_id).unlink(missing_ok=True)
@@ -0,0 +1,434 @@
+"""进程内的 NumPy 向量后端：每份 PPT 的向量是一个连续矩阵，检索即一次矩阵-向量乘法。
+
+一份 PPT 至多几百页，在共享的 Chroma HNSW 索引中检索它时，SQLite 读写与结果序列化的开销
+远大于真正的向量计算。本后端按 (collection, ppt_id) 把向量存成一个 N×D 的 .npy 矩阵
+（float32，或 PPT_AGENT_NUMPY_DTYPE=float16 时减半），以 np.load(mmap_mode="r") 内存映射打开，
+检索时对矩阵做一次向量化点积；id、文档与 metadata 存在同名 .json 中。
+
+实现的是 vector_store 用到的 Chroma client / collection 接口子集（见 vector_store.VectorClient），
+上层的写入、增量更新、检索、删除、压缩与分片迁移代码无需区分后端：
+- 距离与 Chroma 默认的 l2 空间一致，为平方欧氏距离 |x|² - 2x·q + |q|²；
+- where 支持 vector_store 用到的写法：字段等值、$eq / $ne / $in / $nin 与 $and，
+  其中 ppt_id 条件用于直接定位 PPT 对应的矩阵文件，不扫描其他 PPT；
+- 写入时整体重写该 PPT 的文件（先写临时文件再 os.replace），单份 PPT 很小，代价可以忽略；
+- 已打开的矩阵按 LRU 缓存，每个 collection 最多 _MAX_OPEN_DECKS 份。
+
+存储布局：`<根目录>/<collection 名>/<sha1(ppt_id)>.npy|.json`。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+
+NUMPY_DTYPE_ENV = "PPT_AGENT_NUMPY_DTYPE"
+
+_DTYPES = {"float32": np.float32, "float16": np.float16}
+_MAX_OPEN_DECKS = 256
+_DEFAULT_INCLUDE = ("documents", "metadatas")
+
+
+def _storage_dtype() -> Any:
+    return _DTYPES.get(os.getenv(NUMPY_DTYPE_ENV, "float32").strip().lower(), np.float32)
+
+
+def _deck_key(ppt_id: str) -> str:
+    return hashlib.sha1(ppt_id.encode("utf-8")).hexdigest()[:24]
+
+
+# ---------------------------------------------------------------------------
+# where 条件
+# ---------------------------------------------------------------------------
+
+
+def _clauses(where: Optional[Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """把 where 展开为 (字段, 条件) 列表，各项之间为“且”的关系。"""
+
+    if not where:
+        return []
+    out: List[Tuple[str, Any]] = []
+    for key, cond in where.items():
+        if key == "$and":
+            for sub in cond:
+                out.extend(_clauses(sub))
+        elif key.startswith("$"):
+            raise ValueError(f"不支持的 where 运算符: {key}")
+        else:
+            out.append((key, cond))
+    return out
+
+
+def _match_value(value: Any, cond: Any) -> bool:
+    if not isinstance(cond, dict):
+        return value == cond
+    for op, arg in cond.items():
+        if op == "$eq":
+            ok = value == arg
+        elif op == "$ne":
+            ok = value != arg
+        elif op == "$in":
+            ok = value in arg
+        elif op == "$nin":
+            ok = value not in arg
+        else:
+            raise ValueError(f"不支持的 where 运算符: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def _split_where(where: Optional[Dict[str, Any]]) -> Tuple[Optional[Set[str]], List[Tuple[str, Any]]]:
+    """拆出 ppt_id 条件（用于定位 PPT 文件）与其余逐行判断的条件。
+
+    返回的 ppt_id 集合为 None 表示不限 PPT；ppt_id 的 $ne / $nin 留在逐行条件中。
+    """
+
+    ppt_ids: Optional[Set[str]] = None
+    rest: List[Tuple[str, Any]] = []
+    for key, cond in _clauses(where):
+        if key == "ppt_id" and not isinstance(cond, dict):
+            allowed = {cond}
+        elif key == "ppt_id" and set(cond) <= {"$eq", "$in"}:
+            allowed = {cond["$eq"]} if "$eq" in cond else set(cond["$in"])
+        else:
+            rest.append((key, cond))
+            continue
+        ppt_ids = allowed if ppt_ids is None else ppt_ids & allowed
+    return ppt_ids, rest
+
+
+# ---------------------------------------------------------------------------
+# 单份 PPT 的矩阵
+# ---------------------------------------------------------------------------
+
+
+class _Deck:
+    """某个 collection 中一份 PPT 的全部条目：向量矩阵（内存映射）+ id / 文档 / metadata。"""
+
+    def __init__(
+        self,
+        ppt_id: str,
+        ids: List[str],
+        documents: List[Optional[str]],
+        metadatas: List[Dict[str, Any]],
+        vectors: np.ndarray,
+    ) -> None:
+        self.ppt_id = ppt_id
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.positions = {sid: pos for pos, sid in enumerate(ids)}
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def norms(self) -> np.ndarray:
+        """各行的平方范数，首次检索时计算。"""
+
+        if self._norms is None:
+            v = np.asarray(self.vectors, dtype=np.float32)
+            self._norms = np.einsum("ij,ij->i", v, v)
+        return self._norms
+
+    def distances(self, query: np.ndarray, query_norm: float) -> np.ndarray:
+        # float16 没有 BLAS 实现，先转换为 float32 再做点积
+        vectors = self.vectors if self.vectors.dtype == np.float32 else np.asarray(self.vectors, dtype=np.float32)
+        return self.norms - 2.0 * (vectors @ query) + query_norm
+
+    def mask(self, clauses: List[Tuple[str, Any]]) -> Optional[np.ndarray]:
+        """逐行判断 where 条件，无条件时返回 None（全部保留）。"""
+
+        if not clauses:
+            return None
+        return np.fromiter(
+            (all(_match_value(meta.get(k), c) for k, c in clauses) for meta in self.metadatas),
+            dtype=bool,
+            count=len(self.metadatas),
+        )
+
+
+class NumpyCollection:
+    """与 Chroma Collection 接口一致的子集，条目按 metadata 中的 ppt_id 分文件存放。"""
+
+    def __init__(self, client: "NumpyVectorClient", name: str) -> None:
+        self._client = client
+        self.name = name
+        self._open: "OrderedDict[str, Optional[_Deck]]" = OrderedDict()
+
+    # -- 文件读写 --------------------------------------------------------
+
+    @property
+    def path(self) -> Path:
+        return self._client.path / self.name
+
+    def _deck_keys(self) -> List[str]:
+        if not self.path.exists():
+            return []
+        return sorted(p.stem for p in self.path.glob("*.json"))
+
+    def _load(self, key: str) -> Optional[_Deck]:
+        if key in self._open:
+            self._open.move_to_end(key)
+            return self._open[key]
+        meta_path = self.path / f"{key}.json"
+        deck: Optional[_Deck] = None
+        if meta_path.exists():
+            info = json.loads(meta_path.read_text(encoding="utf-8"))
+            vectors = np.load(self.path / f"{key}.npy", mmap_mode="r")
+            deck = _Deck(info["ppt_id"], info["ids"], info["documents"], info["metadatas"], vectors)
+        self._open[key] = deck
+        while len(self._open) > _MAX_OPEN_DECKS:
+            self._open.popitem(last=False)
+        return deck
+
+    def _save(self, key: str, deck: _Deck) -> None:
+        self._open.pop(key, None)
+        npy_path = self.path / f"{key}.npy"
+        meta_path = self.path / f"{key}.json"
+        if not len(deck):
+            meta_path.unlink(missing_ok=True)
+            npy_path.unlink(missing_ok=True)
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        # 两个文件都先写临时文件再原子替换；新建 PPT 时 .json 最后出现，出现即表示数据完整
+        tmp_npy = self.path / f"{key}.tmp.npy"
+        np.save(tmp_npy, np.ascontiguousarray(deck.vectors, dtype=_storage_dtype()))
+        os.replace(tmp_npy, npy_path)
+        tmp_meta = self.path / f"{key}.json.tmp"
+        payload = {"ppt_id": deck.ppt_id, "ids": deck.ids, "documents": deck.documents, "metadatas": deck.metadatas}
+        tmp_meta.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_meta, meta_path)
+
+    def _decks(self, ppt_ids: Optional[Set[str]]) -> Iterable[_Deck]:
+        keys = self._deck_keys() if ppt_ids is None else sorted(_deck_key(pid) for pid in ppt_ids)
+        for key in keys:
+            deck = self._load(key)
+            if deck is not None:
+                yield deck
+
+    # -- Chroma 接口子集 ---------------------------------------------------
+
+    def count(self) -> int:
+        with self._client.lock:
+            return sum(len(deck) for deck in self._decks(None))
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Any],
+        documents: Optional[Sequence[Optional[str]]] = None,
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        """写入新条目；与 Chroma 相同，已存在的 id 保持不变。"""
+
+        self._write(ids, embeddings, documents, metadatas, overwrite=False)
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Any],
+        documents: Optional[Sequence[Optional[str]]] = None,
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        self._write(ids, embeddings, documents, metadatas, overwrite=True)
+
+    def _write(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Any],
+        documents: Optional[Sequence[Optional[str]]],
+        metadatas: Optional[Sequence[Dict[str, Any]]],
+        overwrite: bool,
+    ) -> None:
+        if embeddings is None:
+            raise ValueError("NumPy 向量后端需要显式传入 embeddings")
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = [dict(m or {}) for m in metadatas] if metadatas is not None else [{} for _ in ids]
+
+        groups: Dict[str, List[int]] = {}
+        for row, meta in enumerate(metadatas):
+            groups.setdefault(str(meta.get("ppt_id", "")), []).append(row)
+
+        with self._client.lock:
+            for ppt_id, rows in groups.items():
+                key = _deck_key(ppt_id)
+                old = self._load(key)
+                if old is None:
+                    old = _Deck(ppt_id, [], [], [], np.zeros((0, vectors.shape[1]), dtype=np.float32))
+                new_ids, new_docs, new_metas = list(old.ids), list(old.documents), list(old.metadatas)
+                new_vectors = np.array(old.vectors, dtype=np.float32)
+                appended: List[int] = []
+                for row in rows:
+                    pos = old.positions.get(ids[row])
+                    if pos is None:
+                        appended.append(row)
+                    elif overwrite:
+                        new_docs[pos], new_metas[pos], new_vectors[pos] = documents[row], metadatas[row], vectors[row]
+                # 同一批中重复的 id 以最后一次为准
+                latest = {ids[row]: row for row in appended}
+                appended = [row for row in appended if latest[ids[row]] == row]
+                if appended:
+                    new_ids += [ids[row] for row in appended]
+                    new_docs += [documents[row] for row in appended]
+                    new_metas += [metadatas[row] for row in appended]
+                    new_vectors = np.vstack([new_vectors, vectors[appended]])
+                self._save(key, _Deck(ppt_id, new_ids, new_docs, new_metas, new_vectors))
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        if ids is None and where is None:
+            raise ValueError("delete 需要指定 ids 或 where")
+        ppt_ids, clauses = _split_where(where)
+        doomed = set(ids) if ids is not None else None
+        with self._client.lock:
+            for deck in list(self._decks(ppt_ids)):
+                keep = deck.mask(clauses)
+                keep = np.zeros(len(deck), dtype=bool) if keep is None else ~keep
+                if doomed is not None:
+                    keep |= np.fromiter((sid not in doomed for sid in deck.ids), dtype=bool, count=len(deck))
+                if keep.all():
+                    continue
+                rows = np.flatnonzero(keep)
+                self._save(
+                    _deck_key(deck.ppt_id),
+                    _Deck(
+                        deck.ppt_id,
+                        [deck.ids[r] for r in rows],
+                        [deck.documents[r] for r in rows],
+                        [deck.metadatas[r] for r in rows],
+                        np.asarray(deck.vectors[rows], dtype=np.float32),
+                    ),
+                )
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = _DEFAULT_INCLUDE,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        ppt_ids, clauses = _split_where(where)
+        wanted = set(ids) if ids is not None else None
+        out: Dict[str, List[Any]] = {"ids": []}
+        for field in include:
+            out[field] = []
+        skip = offset or 0
+        with self._client.lock:
+            for deck in self._decks(ppt_ids):
+                mask = deck.mask(clauses)
+                for pos, sid in enumerate(deck.ids):
+                    if (mask is not None and not mask[pos]) or (wanted is not None and sid not in wanted):
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    if limit is not None and len(out["ids"]) >= limit:
+                        return out
+                    out["ids"].append(sid)
+                    if "documents" in out:
+                        out["documents"].append(deck.documents[pos])
+                    if "metadatas" in out:
+                        out["metadatas"].append(deck.metadatas[pos])
+                    if "embeddings" in out:
+                        out["embeddings"].append(np.asarray(deck.vectors[pos], dtype=np.float32))
+        return out
+
+    def query(
+        self,
+        query_embeddings: Sequence[Any],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = (*_DEFAULT_INCLUDE, "distances"),
+    ) -> Dict[str, Any]:
+        """对每个查询向量返回最近的 n_results 条，结构同 Chroma query（每个字段外层按查询分组）。"""
+
+        ppt_ids, clauses = _split_where(where)
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        out: Dict[str, List[Any]] = {"ids": []}
+        for field in include:
+            out[field] = []
+        with self._client.lock:
+            decks = list(self._decks(ppt_ids))
+            for query in queries:
+                query_norm = float(query @ query)
+                candidates: List[Tuple[float, _Deck, int]] = []
+                for deck in decks:
+                    dist = deck.distances(query, query_norm)
+                    mask = deck.mask(clauses)
+                    rows = np.arange(len(deck)) if mask is None else np.flatnonzero(mask)
+                    if len(rows) > n_results:
+                        rows = rows[np.argpartition(dist[rows], n_results - 1)[:n_results]]
+                    candidates.extend((float(dist[r]), deck, int(r)) for r in rows)
+                candidates.sort(key=lambda item: item[0])
+                top = candidates[:n_results]
+                out["ids"].append([deck.ids[r] for _, deck, r in top])
+                if "documents" in out:
+                    out["documents"].append([deck.documents[r] for _, deck, r in top])
+                if "metadatas" in out:
+                    out["metadatas"].append([deck.metadatas[r] for _, deck, r in top])
+                if "distances" in out:
+                    out["distances"].append([d for d, _, _ in top])
+                if "embeddings" in out:
+                    out["embeddings"].append([np.asarray(deck.vectors[r], np.float32) for _, deck, r in top])
+        return out
+
+    def modify(self, name: Optional[str] = None, **_: Any) -> None:
+        if name is not None and name != self.name:
+            self._client._rename(self, name)
+
+
+class NumpyVectorClient:
+    """与 chromadb Client 接口一致的子集，每个 collection 对应根目录下的一个子目录。"""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self._collections: Dict[str, NumpyCollection] = {}
+
+    def heartbeat(self) -> int:
+        return time.time_ns()
+
+    def get_or_create_collection(self, name: str, embedding_function: Any = None, **_: Any) -> NumpyCollection:
+        with self.lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = NumpyCollection(self, name)
+            collection.path.mkdir(parents=True, exist_ok=True)
+            return collection
+
+    def list_collections(self) -> List[NumpyCollection]:
+        with self.lock:
+            return [self.get_or_create_collection(p.name) for p in sorted(self.path.iterdir()) if p.is_dir()]
+
+    def delete_collection(self, name: str) -> None:
+        with self.lock:
+            path = self.path / name
+            if not path.is_dir():
+                raise ValueError(f"Collection {name} does not exist.")
+            self._collections.pop(name, None)
+            shutil.rmtree(path)
+
+    def _rename(self, collection: NumpyCollection, name: str) -> None:
+        with self.lock:
+            if (self.path / name).exists():
+                raise ValueError(f"Collection {name} already exists.")
+            os.replace(collection.path, self.path / name)
+            self._collections.pop(collection.name, None)
+            collection.name = name
+            collection._open.clear()
+            self._collections[name] = collection
@@ -0,0 +1,237 @@
+"""笔记 PDF 导出：进程池渲染 + 按内容哈希的结果缓存。
+
+WeasyPrint 渲染是纯 CPU 操作，多页带代码块的笔记可能耗时数秒。为避免阻塞后端事件循环，
+渲染在独立的进程池中执行：
+- 每个工作进程启动时预先解析共享样式表、建立字体配置，并渲染一页空白文档完成字体加载，
+  后续请求不再重复这部分开销；
+- 渲染结果按 HTML 内容的 sha256 缓存（LRU，按总字节数限制），相同内容的重复导出直接命中；
+  同一内容正在渲染时，后到的请求等待同一个任务，不重复提交。
+
+配置（环境变量）：
+- PPT_AGENT_PDF_WORKERS:  渲染进程数，默认 2；
+- PPT_AGENT_PDF_CACHE_MB: PDF 缓存上限（MB），默认 64，0 表示不缓存。
+
+WeasyPrint 只在工作进程中导入；缺少系统依赖（pango 等）时渲染抛出 PdfRendererUnavailable。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import html
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from core.metrics import PDF_CACHE, STAGE_SECONDS
+
+
+PDF_WORKERS_ENV = "PPT_AGENT_PDF_WORKERS"
+PDF_CACHE_MB_ENV = "PPT_AGENT_PDF_CACHE_MB"
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+EXPORT_CSS = """
+body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, 'Noto Sans', sans-serif; line-height: 1.6; padding: 24px; }
+h1, h2, h3, h4, h5, h6 { margin-top: 1.2em; margin-bottom: 0.6em; }
+p { margin: 0.4em 0; }
+code, pre { font-family: SFMono-Regular, Menlo, Monaco, Consolas, 'Liberation Mono', 'Courier New', monospace; background: #f5f5f5; }
+pre { padding: 12px; overflow-x: auto; }
+ul, ol { margin-left: 1.5em; }
+section.slide-note { page-break-before: always; }
+section.slide-note:first-of-type { page-break-before: auto; }
+"""
+
+# 样式或渲染逻辑变化时修改版本号，使旧缓存失效
+_RENDER_VERSION = "1"
+
+
+class PdfRendererUnavailable(RuntimeError):
+    """当前环境无法使用 WeasyPrint（未安装或缺少系统依赖）。"""
+
+
+# ---------------------------------------------------------------------------
+# HTML 构造
+# ---------------------------------------------------------------------------
+
+
+def _wrap_html(title: str, body: str) -> str:
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+  <meta charset="utf-8" />
+  <title>{html.escape(title)}</title>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _markdown_to_html(markdown_text: str) -> str:
+    # 首次导出时才导入 markdown，不拖慢后端启动
+    import markdown
+
+    return markdown.markdown(markdown_text, output_format="html5")
+
+
+def build_note_html(markdown_text: str, title: str = "Note Export") -> str:
+    """将单份 Markdown 笔记转换为待渲染的 HTML（样式由工作进程统一注入）。"""
+
+    return _wrap_html(title, _markdown_to_html(markdown_text))
+
+
+def build_deck_html(notes: Iterable[Tuple[int, str, str]], title: str) -> str:
+    """将整份 PPT 的笔记 (slide_index, 标题, markdown) 合并为一个文档，每页笔记另起一页。"""
+
+    sections = []
+    for index, slide_title, note in notes:
+        heading = f"<h1>第 {index} 页：{html.escape(slide_title or '')}</h1>"
+        body = _markdown_to_html(note)
+        sections.append(f'<section class="slide-note">\n{heading}\n{body}\n</section>')
+    return _wrap_html(title, "\n".join(sections))
+
+
+# ---------------------------------------------------------------------------
+# 工作进程
+# ---------------------------------------------------------------------------
+
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker() -> None:
+    """工作进程初始化：导入 WeasyPrint、预解析样式表并预热字体。"""
+
+    try:
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+
+        font_config = FontConfiguration()
+        stylesheet = CSS(string=EXPORT_CSS, font_config=font_config)
+        HTML(string=_wrap_html("warmup", "<p>warmup</p>")).write_pdf(
+            stylesheets=[stylesheet], font_config=font_config
+        )
+        _worker_state.update(html_cls=HTML, stylesheet=stylesheet, font_config=font_config)
+    except Exception as exc:
+        _worker_state["error"] = f"{type(exc).__name__}: {exc}"
+
+
+def _render_in_worker(document: str) -> bytes:
+    if "html_cls" not in _worker_state:
+        if not _worker_state:
+            _init_worker()
+        if "error" in _worker_state:
+            raise PdfRendererUnavailable(_worker_state["error"])
+    return _worker_state["html_cls"](string=document, base_url=str(BASE_DIR)).write_pdf(
+        stylesheets=[_worker_state["stylesheet"]],
+        font_config=_worker_state["font_config"],
+    )
+
+
+# ---------------------------------------------------------------------------
+# 进程池与缓存
+# ---------------------------------------------------------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_cache_bytes = 0
+_inflight: Dict[str, Future] = {}
+_cache_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn：后端进程中已有多个线程，fork 可能复制到持有中的锁
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, int(os.getenv(PDF_WORKERS_ENV, "2"))),
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def shutdown_pdf_pool() -> None:
+    """关闭渲染进程池（应用退出时调用）。"""
+
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _cache_limit_bytes() -> int:
+    return int(float(os.getenv(PDF_CACHE_MB_ENV, "64")) * 1024 * 1024)
+
+
+def _cache_key(document: str) -> str:
+    return hashlib.sha256(f"{_RENDER_VERSION}\n{document}".encode("utf-8")).hexdigest()
+
+
+def _cache_put(key: str, pdf: bytes) -> None:
+    global _cache_bytes
+    limit = _cache_limit_bytes()
+    if len(pdf) > limit:
+        return
+    with _cache_lock:
+        if key in _cache:
+            return
+        _cache[key] = pdf
+        _cache_bytes += len(pdf)
+        while _cache_bytes > limit and _cache:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted)
+
+
+def clear_pdf_cache() -> None:
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def _finish(key: str, fut: Future) -> None:
+    with _cache_lock:
+        _inflight.pop(key, None)
+    if not fut.cancelled() and fut.exception() is None:
+        _cache_put(key, fut.result())
+
+
+def submit_render(document: str) -> Future:
+    """提交渲染任务并返回 Future；命中缓存或相同内容正在渲染时不重复提交。"""
+
+    key = _cache_key(document)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            PDF_CACHE.inc(result="hit")
+            done: Future = Future()
+            done.set_result(cached)
+            return done
+        pending = _inflight.get(key)
+        if pending is not None:
+            PDF_CACHE.inc(result="pending")
+            return pending
+        PDF_CACHE.inc(result="miss")
+        fut = _get_pool().submit(_render_in_worker, document)
+        _inflight[key] = fut
+    fut.add_done_callback(lambda f: _finish(key, f))
+    return fut
+
+
+async def render_pdf(document: str) -> bytes:
+    """异步渲染 HTML 为 PDF，不阻塞事件循环。"""
+
+    with STAGE_SECONDS.time(stage="pdf"):
+        # shield：客户端断开时不取消其他请求也在等待的同一渲染任务
+        return await asyncio.shield(asyncio.wrap_future(submit_render(document)))
@@ -1,21 +1,121 @@
 from __future__ import annotations
 
+from array import array
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, overload
 import json
 
-from pptx import Presentation
+from core.metrics import timed
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Slide:
+    """单页 PPT 的结构化内容。
+
+    使用 slots + frozen：没有逐实例的 __dict__，bullets 统一存为元组，
+    构造时传入列表也会被转换，调用方按序列方式读取即可。
+    """
+
     index: int
     title: str
-    bullets: List[str]
+    bullets: Tuple[str, ...]
     notes: str | None = None
 
+    def __post_init__(self) -> None:
+        if not isinstance(self.bullets, tuple):
+            object.__setattr__(self, "bullets", tuple(self.bullets))
+
 
+class SlideDeck(Sequence[Slide]):
+    """按列存储的一整份 PPT，供后端长期驻留内存使用。
+
+    所有文本（标题、要点、备注）去重后拼接为一个字符串，按偏移量切片取回；
+    每页只在几个紧凑数组中记录页码与所引用的文本编号。
+    按下标或迭代访问时临时构造 Slide，对调用方而言与 List[Slide] 用法一致。
+    """
+
+    __slots__ = ("_text", "_offsets", "_refs", "_starts", "_indexes", "_has_notes")
+
+    def __init__(self, slides: Iterable[Slide]) -> None:
+        ids: Dict[str, int] = {}
+        pieces: List[str] = []
+        offsets = array("I", [0])
+        refs = array("I")
+        starts = array("I", [0])
+        indexes = array("I")
+        has_notes = bytearray()
+        total = 0
+
+        for slide in slides:
+            strings = [slide.title, *slide.bullets]
+            if slide.notes is not None:
+                strings.append(slide.notes)
+            for text in strings:
+                sid = ids.get(text)
+                if sid is None:
+                    sid = ids[text] = len(pieces)
+                    pieces.append(text)
+                    total += len(text)
+                    offsets.append(total)
+                refs.append(sid)
+            starts.append(len(refs))
+            indexes.append(slide.index)
+            has_notes.append(slide.notes is not None)
+
+        self._text = "".join(pieces)
+        self._offsets = offsets
+        self._refs = refs
+        self._starts = starts
+        self._indexes = indexes
+        self._has_notes = bytes(has_notes)
+
+    def _string(self, sid: int) -> str:
+        return self._text[self._offsets[sid] : self._offsets[sid + 1]]
+
+    def _slide(self, pos: int) -> Slide:
+        strings = [self._string(sid) for sid in self._refs[self._starts[pos] : self._starts[pos + 1]]]
+        notes = strings.pop() if self._has_notes[pos] else None
+        return Slide(index=self._indexes[pos], title=strings[0], bullets=tuple(strings[1:]), notes=notes)
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    @overload
+    def __getitem__(self, pos: int) -> Slide: ...
+
+    @overload
+    def __getitem__(self, pos: slice) -> List[Slide]: ...
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self._slide(i) for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("slide position out of range")
+        return self._slide(pos)
+
+    def __iter__(self) -> Iterator[Slide]:
+        for pos in range(len(self)):
+            yield self._slide(pos)
+
+    def get_by_index(self, slide_index: int) -> Slide | None:
+        """按页码（Slide.index）取单页，只构造这一页。"""
+
+        pos = slide_index - 1
+        if not (0 <= pos < len(self) and self._indexes[pos] == slide_index):
+            try:
+                pos = self._indexes.index(slide_index)
+            except ValueError:
+                return None
+        return self._slide(pos)
+
+    def __repr__(self) -> str:
+        return f"SlideDeck({len(self)} slides)"
+
+
+@timed("parse")
 def parse_ppt(path: str | Path) -> List[Slide]:
     """使用 python-pptx 将 PPT 文件解析为 Slide 列表的最小可用实现。
 
@@ -29,6 +129,9 @@ def parse_ppt(path: str | Path) -> List[Slide]:
     注意：本函数假定输入文件为 .pptx 格式。
     """
 
+    # python-pptx 导入约 0.1 秒，只在真正解析时加载
+    from pptx import Presentation
+
     ppt_path = Path(path)
     if not ppt_path.exists():
         raise FileNotFoundError(f"PPT 文件不存在: {ppt_path}")
@@ -53,11 +156,11 @@ def parse_ppt(path: str | Path) -> List[Slide]:
 
         if texts:
             title = texts[0]
-            bullets = texts[1:] if len(texts) > 1 else []
+            bullets = tuple(texts[1:])
         else:
             # 空白页的兜底处理
             title = f"Slide {idx}"
-            bullets = []
+            bullets = ()
 
         notes: str | None = None
 
@@ -73,7 +176,7 @@ def parse_ppt(path: str | Path) -> List[Slide]:
     return slides
 
 
-def slides_to_json(slides: List[Slide]) -> str:
+def slides_to_json(slides: Sequence[Slide]) -> str:
     """将 Slide 列表序列化为 JSON 字符串。"""
 
     return json.dumps([asdict(s) for s in slides], ensure_ascii=False, indent=2)
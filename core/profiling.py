@@ -0,0 +1,332 @@
+"""按请求开启的采样剖析：定位 /expand 等接口具体慢在哪些 Python 函数上。
+
+/metrics 只能说明某个接口慢，不能说明慢在 python-pptx 遍历形状、_strip_html 的正则
+还是 Chroma 序列化。本模块在指定请求执行期间，由一个后台线程按固定间隔读取
+sys._current_frames()，把该请求所用线程的调用栈累计成 folded stacks 格式
+（每行 `根;...;叶 次数`），可直接交给 flamegraph.pl、speedscope、inferno 绘制火焰图。
+
+哪些线程属于该请求：
+- 请求进入时记下事件循环线程，只统计其非空闲（不在 select 中等待）的采样；
+  事件循环为所有请求共享，并发时这部分采样会混入其他请求的协程；
+- asyncio.to_thread 提交到默认线程池的任务：线程池替换为 ProfilingExecutor，
+  提交时从 contextvars 取出当前请求的剖析对象，任务执行期间把所在线程计入该请求。
+
+配置（环境变量）：
+- PPT_AGENT_PROFILE_TOKEN:          管理员令牌；请求带上 `X-Profile-Token: <令牌>` 头即剖析该请求，
+                                    未配置时不可用。令牌只从请求头读取，不接受查询参数，
+                                    以免出现在访问日志与代理日志中；
+- PPT_AGENT_PROFILE_SAMPLE_PERCENT: 持续随机剖析的请求百分比，默认 0（关闭）；
+- PPT_AGENT_PROFILE_INTERVAL_MS:    采样间隔毫秒数，默认 10；
+- PPT_AGENT_PROFILE_DIR:            剖析结果目录，默认项目根目录下的 profiles/；
+- PPT_AGENT_PROFILE_KEEP:           最多保留的剖析结果数，默认 200，超出时删除最旧的。
+
+未命中上述条件的请求只多两次环境变量读取，不启动采样线程。
+"""
+
+from __future__ import annotations
+
+import functools
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from uuid import uuid4
+
+from core.metrics import PROFILE_REQUESTS
+
+
+PROFILE_TOKEN_ENV = "PPT_AGENT_PROFILE_TOKEN"
+PROFILE_SAMPLE_PERCENT_ENV = "PPT_AGENT_PROFILE_SAMPLE_PERCENT"
+PROFILE_INTERVAL_MS_ENV = "PPT_AGENT_PROFILE_INTERVAL_MS"
+PROFILE_DIR_ENV = "PPT_AGENT_PROFILE_DIR"
+PROFILE_KEEP_ENV = "PPT_AGENT_PROFILE_KEEP"
+
+PROFILE_HEADER = "X-Profile-Token"
+
+_ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# 当前请求的剖析对象；asyncio 任务与 to_thread 都会复制 contextvars，因此在提交线程池任务时可见
+_ACTIVE: ContextVar[Optional["RequestProfile"]] = ContextVar("ppt_agent_profile", default=None)
+
+
+@dataclass
+class ProfileInfo:
+    """一次剖析结果的概要，folded stacks 内容保存在 path 指向的文件中。"""
+
+    id: str
+    method: str
+    route: str
+    status: int
+    reason: str  # admin：管理员令牌触发；sampled：按百分比随机触发
+    seconds: float
+    samples: int
+    created_at: float
+    path: str
+
+
+# 本进程的剖析结果：id -> ProfileInfo（按生成顺序，超出 PPT_AGENT_PROFILE_KEEP 时删除最旧的）
+PROFILES: "OrderedDict[str, ProfileInfo]" = OrderedDict()
+_PROFILES_LOCK = threading.Lock()
+
+
+def profile_dir() -> Path:
+    return Path(os.getenv(PROFILE_DIR_ENV, str(_ROOT_DIR / "profiles")))
+
+
+def _sample_percent() -> float:
+    try:
+        return float(os.getenv(PROFILE_SAMPLE_PERCENT_ENV, "0") or 0)
+    except ValueError:
+        return 0.0
+
+
+def _interval_s() -> float:
+    return max(1.0, float(os.getenv(PROFILE_INTERVAL_MS_ENV, "10"))) / 1000
+
+
+def check_admin_token(supplied: Optional[str]) -> Optional[bool]:
+    """校验管理员令牌：未配置返回 None，匹配返回 True，否则 False。"""
+
+    token = os.getenv(PROFILE_TOKEN_ENV)
+    if not token:
+        return None
+    return bool(supplied) and hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+
+def profile_reason(headers: Mapping[str, str]) -> Optional[str]:
+    """判断请求是否需要剖析，返回触发原因（admin / sampled），不需要时返回 None。"""
+
+    supplied = headers.get(PROFILE_HEADER)
+    if supplied and check_admin_token(supplied):
+        return "admin"
+    percent = _sample_percent()
+    if percent > 0 and random.random() * 100 < percent:
+        return "sampled"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# 调用栈采样
+# ---------------------------------------------------------------------------
+
+
+@functools.lru_cache(maxsize=8192)
+def _frame_label(code: CodeType) -> str:
+    """`函数名 (文件:首行号)`，项目内文件使用相对路径，第三方库只保留包内路径。"""
+
+    filename = code.co_filename
+    try:
+        filename = str(Path(filename).relative_to(_ROOT_DIR))
+    except ValueError:
+        parts = Path(filename).parts
+        if "site-packages" in parts:
+            filename = "/".join(parts[parts.index("site-packages") + 1 :])
+        else:
+            filename = Path(filename).name
+    # folded 格式以 ; 分隔栈帧、以最后一个空格分隔次数
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _fold(frame: Optional[FrameType]) -> str:
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def _is_idle(frame: FrameType) -> bool:
+    """事件循环线程在 selector 中等待 I/O 时视为空闲，不计入采样。"""
+
+    code = frame.f_code
+    return code.co_name in {"select", "poll"} and code.co_filename.endswith("selectors.py")
+
+
+class RequestProfile:
+    """单个请求的采样结果：folded stack -> 采样次数。"""
+
+    def __init__(self, method: str, route: str, reason: str) -> None:
+        self.method = method
+        self.route = route
+        self.reason = reason
+        self.loop_thread = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        # 线程池中正在为本请求执行任务的线程：ident -> 任务数
+        self._workers: Dict[int, int] = {}
+        self._token: Any = None
+
+    def attach(self, ident: int) -> None:
+        with self._lock:
+            self._workers[ident] = self._workers.get(ident, 0) + 1
+
+    def detach(self, ident: int) -> None:
+        with self._lock:
+            left = self._workers.get(ident, 0) - 1
+            if left > 0:
+                self._workers[ident] = left
+            else:
+                self._workers.pop(ident, None)
+
+    def threads(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            workers = list(self._workers)
+        return [(self.loop_thread, "event-loop")] + [(ident, "worker") for ident in workers]
+
+    def folded(self) -> str:
+        lines = [f"{stack} {count}" for stack, count in sorted(self.stacks.items())]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+_RUNNING: List[RequestProfile] = []
+_RUNNING_LOCK = threading.Lock()
+_sampler: Optional[threading.Thread] = None
+
+
+def _sample_once(profiles: Iterable[RequestProfile]) -> None:
+    frames = sys._current_frames()
+    folded: Dict[int, Optional[str]] = {}
+    for profile in profiles:
+        root = f"{profile.method} {profile.route}"
+        for ident, role in profile.threads():
+            if ident not in folded:
+                frame = frames.get(ident)
+                folded[ident] = None if frame is None or (role == "event-loop" and _is_idle(frame)) else _fold(frame)
+            stack = folded[ident]
+            if stack is not None:
+                profile.stacks[f"{root};{role};{stack}"] += 1
+
+
+def _sampler_loop(interval: float) -> None:
+    global _sampler
+    while True:
+        with _RUNNING_LOCK:
+            if not _RUNNING:
+                _sampler = None
+                return
+            profiles = list(_RUNNING)
+        _sample_once(profiles)
+        time.sleep(interval)
+
+
+def start_profile(method: str, route: str, reason: str) -> RequestProfile:
+    """开始剖析当前请求（须在处理请求的协程中调用，以便后续 to_thread 任务继承）。"""
+
+    global _sampler
+    profile = RequestProfile(method, route, reason)
+    profile._token = _ACTIVE.set(profile)
+    with _RUNNING_LOCK:
+        _RUNNING.append(profile)
+        if _sampler is None:
+            _sampler = threading.Thread(
+                target=_sampler_loop, args=(_interval_s(),), name="profile-sampler", daemon=True
+            )
+            _sampler.start()
+    return profile
+
+
+def _prune(keep: int) -> None:
+    while len(PROFILES) > keep:
+        _, old = PROFILES.popitem(last=False)
+        Path(old.path).unlink(missing_ok=True)
+
+
+def finish_profile(profile: RequestProfile, status: int) -> Optional[ProfileInfo]:
+    """结束剖析并保存结果；随机触发且没有采到样本的请求不保存，返回 None。"""
+
+    with _RUNNING_LOCK:
+        if profile in _RUNNING:
+            _RUNNING.remove(profile)
+    if profile._token is not None:
+        _ACTIVE.reset(profile._token)
+        profile._token = None
+    PROFILE_REQUESTS.inc(reason=profile.reason)
+
+    samples = sum(profile.stacks.values())
+    if profile.reason == "sampled" and samples == 0:
+        return None
+
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{int(time.time() * 1000)}-{uuid4().hex[:8]}"
+    path = directory / f"{profile_id}.folded"
+    path.write_text(profile.folded(), encoding="utf-8")
+    info = ProfileInfo(
+        id=profile_id,
+        method=profile.method,
+        route=profile.route,
+        status=status,
+        reason=profile.reason,
+        seconds=round(time.perf_counter() - profile.started, 4),
+        samples=samples,
+        created_at=time.time(),
+        path=str(path),
+    )
+    with _PROFILES_LOCK:
+        PROFILES[profile_id] = info
+        _prune(max(1, int(os.getenv(PROFILE_KEEP_ENV, "200"))))
+    return info
+
+
+def list_profiles(route: Optional[str] = None) -> List[Dict[str, Any]]:
+    with _PROFILES_LOCK:
+        infos = list(PROFILES.values())
+    return [asdict(info) for info in infos if route is None or info.route == route]
+
+
+def read_profile(profile_id: str) -> Optional[str]:
+    info = PROFILES.get(profile_id)
+    if info is None:
+        return None
+    try:
+        return Path(info.path).read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+def merge_profiles(route: Optional[str] = None) -> str:
+    """把多次剖析（如持续随机采样得到的结果）按调用栈累加成一份 folded stacks。"""
+
+    total: Counter = Counter()
+    for info in list_profiles(route):
+        text = read_profile(info["id"]) or ""
+        for line in text.splitlines():
+            stack, _, count = line.rpartition(" ")
+            if stack and count.isdigit():
+                total[stack] += int(count)
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(total.items()))
+
+
+# ---------------------------------------------------------------------------
+# 线程池
+# ---------------------------------------------------------------------------
+
+
+def _run_attached(profile: RequestProfile, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    ident = threading.get_ident()
+    profile.attach(ident)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profile.detach(ident)
+
+
+class ProfilingExecutor(ThreadPoolExecutor):
+    """提交任务时若当前请求正在剖析，则任务执行期间把所在线程计入该请求的采样。"""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        profile = _ACTIVE.get()
+        if profile is None:
+            return super().submit(fn, *args, **kwargs)
+        return super().submit(_run_attached, profile, fn, *args, **kwargs)
@@ -1,24 +1,388 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any
-
-import chromadb
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple, TypeVar
 
+from core.metrics import STAGE_SECONDS, timed
 from core.ppt_parser import Slide, parse_ppt
 
+logger = logging.getLogger(__name__)
+
+
+CHROMA_DIR_ENV = "PPT_AGENT_CHROMA_DIR"
+
+CHROMA_DIR = Path(os.getenv(CHROMA_DIR_ENV, str(Path(__file__).resolve().parent / "chroma_db")))
+
+# 向量存储后端：
+# - chroma（默认）：chromadb.PersistentClient，持久化到 CHROMA_DIR；
+# - numpy：core.numpy_store，每份 PPT 一个内存映射的向量矩阵，存放在 CHROMA_DIR/numpy/，
+#   单份 PPT 内检索（/expand 上下文、按 ppt_id 的 /search）只需一次矩阵-向量乘法。
+# 两者都实现下面 VectorClient / VectorCollection 描述的接口，本模块其余代码不区分后端。
+# 切换后端不会迁移已有数据，需要重新上传或重建索引。
+VECTOR_BACKEND_ENV = "PPT_AGENT_VECTOR_BACKEND"
+VECTOR_BACKENDS = ("chroma", "numpy")
+NUMPY_SUBDIR = "numpy"
+
+
+class VectorCollection(Protocol):
+    """本模块用到的 collection 接口（chromadb Collection 的子集）。
+
+    where 只使用字段等值、$in / $nin 与 $and；写入与检索均显式传入 embeddings。
+    """
+
+    name: str
+
+    def count(self) -> int: ...
+
+    def add(self, ids: Sequence[str], embeddings: Any, documents: Any = None, metadatas: Any = None) -> None: ...
+
+    def upsert(self, ids: Sequence[str], embeddings: Any, documents: Any = None, metadatas: Any = None) -> None: ...
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> None: ...
+
+    def get(self, ids: Any = None, where: Any = None, include: Any = ..., limit: Any = None, offset: Any = None) -> Dict[str, Any]: ...
+
+    def query(self, query_embeddings: Any, n_results: int = 10, where: Any = None) -> Dict[str, Any]: ...
+
+    def modify(self, name: Optional[str] = None) -> None: ...
+
+
+class VectorClient(Protocol):
+    """本模块用到的 client 接口（chromadb Client 的子集）。"""
+
+    def heartbeat(self) -> int: ...
+
+    def get_or_create_collection(self, name: str, embedding_function: Any = None) -> VectorCollection: ...
+
+    def list_collections(self) -> Sequence[Any]: ...
+
+    def delete_collection(self, name: str) -> None: ...
+
+
+# chromadb 导入与 client 创建较慢（约 1 秒），推迟到首次读写时进行，见 get_client()
+_client: Any = None
+_backend: Optional[str] = None
+_client_lock = threading.Lock()
+# 为 None 时使用 Chroma 默认的嵌入模型
+_embedding_function = None
+_default_embedding_function = None
+
+class _StoreLock:
+    """向量库读写锁，同一线程可重入。
+
+    检索与普通写入持共享锁，互不等待；压缩、迁移会删除并重建 collection，持独占锁，
+    期间其他读写必须等待，否则会拿到失效的 collection。等待中的独占请求优先，避免被持续的检索饿死。
+    持有共享锁的线程不能再申请独占锁。
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        me = threading.get_ident()
+        depth = getattr(self._local, "depth", 0)
+        if depth or self._writer == me:
+            # 已持有共享锁或独占锁时直接重入，不再排队（否则会被等待中的独占请求卡住）
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                if getattr(self._local, "depth", 0):
+                    raise RuntimeError("持有向量库共享锁时不能申请独占锁")
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
 
-# 使用 PersistentClient 持久化到项目目录下的 chroma_db/
-_client = chromadb.PersistentClient(path=str(Path(__file__).resolve().parent / "chroma_db"))
+_store_lock = _StoreLock()
+# 写入之间仍然串行（读取旧哈希、删除、写入需要看到一致的状态），但不阻塞检索；
+# 嵌入计算在取锁之前完成，持锁时间只包含实际写入
+_write_lock = threading.RLock()
+# 分片登记的懒加载
+_registry_lock = threading.Lock()
 
+_F = TypeVar("_F", bound=Callable[..., Any])
 
-def get_slides_collection(name: str = "ppt_slides"):
+
+def _shared_store_lock(func: _F) -> _F:
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with _store_lock.shared():
+            return func(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+@contextmanager
+def _store_write() -> Iterator[None]:
+    with _store_lock.shared(), _write_lock:
+        yield
+
+
+def _exclusive_store_lock(func: _F) -> _F:
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with _store_lock.exclusive():
+            return func(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def configure_vector_store(
+    path: str | Path | None = None,
+    client: Any = None,
+    embedding_function: Any = None,
+    backend: Optional[str] = None,
+) -> None:
+    """替换底层向量库 client / 嵌入函数 / 后端，主要用于离线测试与基准测试。
+
+    - path: 新的持久化目录；
+    - client: 直接传入已创建的 client（如 EphemeralClient），优先于 path；
+    - embedding_function: 自定义嵌入函数；
+    - backend: chroma / numpy，覆盖 PPT_AGENT_VECTOR_BACKEND。
+    """
+
+    global _client, _embedding_function, _shard_registry, _backend, CHROMA_DIR
+    if backend is not None:
+        if backend not in VECTOR_BACKENDS:
+            raise ValueError(f"未知的向量后端: {backend}")
+        _backend = backend
+        _client = None
+    if client is not None:
+        _client = client
+    elif path is not None:
+        CHROMA_DIR = Path(path)
+        _client = None
+    if embedding_function is not None:
+        _embedding_function = embedding_function
+    _shard_registry = None
+
+
+def vector_backend() -> str:
+    if _backend is not None:
+        return _backend
+    backend = os.getenv(VECTOR_BACKEND_ENV, "chroma").strip().lower()
+    return backend if backend in VECTOR_BACKENDS else "chroma"
+
+
+def get_client() -> VectorClient:
+    """返回向量库 client，首次调用时才导入对应后端并打开持久化目录。"""
+
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if vector_backend() == "numpy":
+                    from core.numpy_store import NumpyVectorClient
+
+                    _client = NumpyVectorClient(CHROMA_DIR / NUMPY_SUBDIR)
+                else:
+                    import chromadb
+
+                    _client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+    return _client
+
+
+def get_slides_collection(name: str = "ppt_slides") -> VectorCollection:
     """获取（或创建）用于存储 PPT 切片的 Chroma collection。
 
     默认 collection 名为 ppt_slides，可根据需要扩展多课程/多项目。
     """
 
-    return _client.get_or_create_collection(name)
+    if _embedding_function is not None:
+        return get_client().get_or_create_collection(name, embedding_function=_embedding_function)
+    return get_client().get_or_create_collection(name)
+
+
+def embed_texts(texts: List[str]) -> List[Any]:
+    """计算文本向量。
+
+    写入与检索时由本模块显式计算 embedding 再交给 Chroma，
+    这样嵌入耗时可以单独计入 ppt_agent_stage_seconds{stage="embed"}。
+    使用的嵌入函数与 collection 中登记的一致，结果与 Chroma 内部计算相同。
+    """
+
+    global _default_embedding_function
+    if not texts:
+        return []
+    ef = _embedding_function
+    if ef is None:
+        if _default_embedding_function is None:
+            from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+            _default_embedding_function = DefaultEmbeddingFunction()
+        ef = _default_embedding_function
+    with STAGE_SECONDS.time(stage="embed"):
+        return list(ef(texts))
+
+
+# ---------------------------------------------------------------------------
+# 分片：按用户 / 课程 / 哈希桶把 PPT 路由到不同 collection
+#
+# - PPT_AGENT_SHARD_MODE:    none（默认，全部写入 ppt_slides）/ user / course / hash
+# - PPT_AGENT_SHARD_BUCKETS: hash 模式下的桶数，默认 16
+#
+# 每个 PPT 最终落在哪个 collection 记录在 chroma_db/shards.json 中，
+# 检索、删除、增量更新都按该记录路由；未登记的 PPT 按当前模式推算。
+# ---------------------------------------------------------------------------
+
+DEFAULT_COLLECTION = "ppt_slides"
+SHARD_MODE_ENV = "PPT_AGENT_SHARD_MODE"
+SHARD_BUCKETS_ENV = "PPT_AGENT_SHARD_BUCKETS"
+SHARD_MODES = ("none", "user", "course", "hash")
+
+# ppt_id -> collection 名；None 表示尚未从磁盘加载
+_shard_registry: Optional[Dict[str, str]] = None
+
+
+def _shard_mode() -> str:
+    mode = os.getenv(SHARD_MODE_ENV, "none").strip().lower()
+    return mode if mode in SHARD_MODES else "none"
+
+
+def _short_hash(text: str) -> str:
+    # collection 名只允许 [a-zA-Z0-9._-]，用户名/课程名可能含中文，统一取哈希
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def shard_collection_name(
+    ppt_id: str,
+    user: Optional[str] = None,
+    course: Optional[str] = None,
+    mode: Optional[str] = None,
+) -> str:
+    """按分片模式计算某个 PPT 应写入的 collection 名。
+
+    user / course 模式下缺少对应信息时退回默认 collection。
+    """
+
+    mode = mode or _shard_mode()
+    if mode == "hash":
+        buckets = max(1, int(os.getenv(SHARD_BUCKETS_ENV, "16")))
+        bucket = int(hashlib.sha1(ppt_id.encode("utf-8")).hexdigest()[:8], 16) % buckets
+        return f"{DEFAULT_COLLECTION}_h{bucket:02d}"
+    if mode == "user" and user:
+        return f"{DEFAULT_COLLECTION}_u_{_short_hash(user)}"
+    if mode == "course" and course:
+        return f"{DEFAULT_COLLECTION}_c_{_short_hash(course)}"
+    return DEFAULT_COLLECTION
+
+
+def _registry_path() -> Path:
+    return CHROMA_DIR / "shards.json"
+
+
+def _load_registry() -> Dict[str, str]:
+    global _shard_registry
+    with _registry_lock:
+        if _shard_registry is None:
+            path = _registry_path()
+            try:
+                _shard_registry = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+            except Exception:
+                _shard_registry = {}
+        return _shard_registry
+
+
+def _save_registry() -> None:
+    path = _registry_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(_load_registry(), ensure_ascii=False), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def assign_deck_shard(ppt_id: str, user: Optional[str] = None, course: Optional[str] = None) -> str:
+    """为新 PPT 分配分片并登记，返回 collection 名；已登记的 PPT 保持原分片。"""
+
+    with _store_write():
+        registry = _load_registry()
+        if ppt_id in registry:
+            return registry[ppt_id]
+        name = shard_collection_name(ppt_id, user=user, course=course)
+        if name != DEFAULT_COLLECTION:
+            registry[ppt_id] = name
+            _save_registry()
+        return name
+
+
+@_shared_store_lock
+def shard_for_deck(ppt_id: str) -> str:
+    """返回某个 PPT 所在的 collection 名。"""
+
+    registry = _load_registry()
+    if ppt_id in registry:
+        return registry[ppt_id]
+    return shard_collection_name(ppt_id)
+
+
+@_shared_store_lock
+def list_shard_collections() -> List[str]:
+    """列出所有存放 PPT 切片的 collection（默认 collection 与各分片）。"""
+
+    names: List[str] = []
+    for col in get_client().list_collections():
+        name = getattr(col, "name", col)
+        if name == DEFAULT_COLLECTION or (
+            name.startswith(f"{DEFAULT_COLLECTION}_")
+            and not name.endswith("__compact")
+            and not name.endswith(CHUNK_SUFFIX)
+        ):
+            names.append(name)
+    return sorted(names)
 
 
 def slide_to_document(slide: Slide) -> str:
@@ -34,15 +398,183 @@ def slide_to_document(slide: Slide) -> str:
     return "\n".join(lines)
 
 
-def index_slides(slides: List[Slide], ppt_id: str, collection_name: str = "ppt_slides") -> None:
+def slide_content_hash(slide: Slide) -> str:
+    """计算单页内容哈希，用于重新上传时判断该页是否被修改。"""
+
+    return hashlib.sha1(slide_to_document(slide).encode("utf-8")).hexdigest()
+
+
+def _slide_metadata(slide: Slide, ppt_id: str) -> Dict[str, Any]:
+    return {
+        "ppt_id": ppt_id,
+        "slide_index": slide.index,
+        "title": slide.title,
+        "content_hash": slide_content_hash(slide),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 细粒度索引：把每页拆成要点 / 备注段落级别的 chunk，与整页文档并存
+#
+# 整页文档把标题、全部要点和备注压成一个向量，要点较多的页面语义被稀释；
+# 扩展笔记时也只能把相关页面整页拼进 Prompt。chunk 索引用于按要点检索：
+# - chunk 存放在 "<整页 collection>__chunks" 中，随整页文档一起写入、增量更新、删除、压缩与迁移；
+# - metadata 中的 ppt_id / slide_index 指回所属页面，检索命中后按页聚合（见 query_similar_chunks）；
+# - PPT_AGENT_CHUNK_INDEX=0 时不写入 chunk，上层检索退回整页粒度；
+# - PPT_AGENT_CHUNK_MAX_CHARS：相邻的短要点合并到不超过该长度的 chunk，默认 80。
+# ---------------------------------------------------------------------------
+
+CHUNK_INDEX_ENV = "PPT_AGENT_CHUNK_INDEX"
+CHUNK_MAX_CHARS_ENV = "PPT_AGENT_CHUNK_MAX_CHARS"
+CHUNK_SUFFIX = "__chunks"
+
+# 按页聚合前多取的 chunk 倍数：同一页的多个 chunk 可能同时命中
+_CHUNK_OVERSAMPLE = 4
+
+
+def chunk_index_enabled() -> bool:
+    return os.getenv(CHUNK_INDEX_ENV, "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def chunk_collection_name(collection_name: str) -> str:
+    """整页 collection 对应的 chunk collection 名。"""
+
+    return f"{collection_name}{CHUNK_SUFFIX}"
+
+
+@dataclass(frozen=True)
+class SlideChunk:
+    """页内的一个检索单元。kind 为 bullet / notes / title（页面只有标题时）。"""
+
+    slide_index: int
+    chunk_no: int
+    kind: str
+    text: str
+
+
+def _pack_lines(lines: List[str], max_chars: int) -> List[str]:
+    """把相邻的短行合并为不超过 max_chars 的段落，单行超长时单独成段。"""
+
+    packed: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if current and size + len(line) > max_chars:
+            packed.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        packed.append("\n".join(current))
+    return packed
+
+
+def slide_to_chunks(slide: Slide, max_chars: Optional[int] = None) -> List[SlideChunk]:
+    """将单个 Slide 拆分为要点 / 备注段落级别的 chunk。"""
+
+    if max_chars is None:
+        max_chars = int(os.getenv(CHUNK_MAX_CHARS_ENV, "80"))
+    bullets = [b.strip() for b in slide.bullets if b and b.strip()]
+    notes = [p.strip() for p in (slide.notes or "").splitlines() if p.strip()]
+
+    groups: List[Tuple[str, str]] = [("bullet", t) for t in _pack_lines(bullets, max_chars)]
+    groups += [("notes", t) for t in _pack_lines(notes, max_chars)]
+    if not groups and slide.title:
+        groups.append(("title", slide.title))
+    return [SlideChunk(slide.index, no, kind, text) for no, (kind, text) in enumerate(groups)]
+
+
+def _chunk_records(
+    slides: Iterable[Slide], ppt_id: str
+) -> Tuple[List[str], List[str], List[Dict[str, Any]], List[str]]:
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    embed_inputs: List[str] = []
+    for slide in slides:
+        for chunk in slide_to_chunks(slide):
+            ids.append(f"{ppt_id}-{slide.index}-c{chunk.chunk_no}")
+            documents.append(chunk.text)
+            metadatas.append(
+                {
+                    "ppt_id": ppt_id,
+                    "slide_index": slide.index,
+                    "title": slide.title,
+                    "chunk_no": chunk.chunk_no,
+                    "kind": chunk.kind,
+                }
+            )
+            # 嵌入时带上页标题作为上下文；文档本身只存 chunk 文本，拼进 Prompt 时不重复标题
+            if slide.title and chunk.kind != "title":
+                embed_inputs.append(f"{slide.title}\n{chunk.text}")
+            else:
+                embed_inputs.append(chunk.text)
+    return ids, documents, metadatas, embed_inputs
+
+
+def _chunk_where(ppt_id: str, slide_indices: Optional[List[int]] = None) -> Dict[str, Any]:
+    if slide_indices is None:
+        return {"ppt_id": ppt_id}
+    return {"$and": [{"ppt_id": ppt_id}, {"slide_index": {"$in": slide_indices}}]}
+
+
+@dataclass
+class _PreparedChunks:
+    """已算好嵌入、待写入的页内 chunk。"""
+
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    embeddings: List[Any]
+
+
+def _prepare_chunks(slides: List[Slide], ppt_id: str) -> Optional[_PreparedChunks]:
+    """切分并向量化若干页的 chunk（不持锁）；未启用 chunk 索引时返回 None。"""
+
+    if not chunk_index_enabled():
+        return None
+    ids, documents, metadatas, embed_inputs = _chunk_records(slides, ppt_id)
+    return _PreparedChunks(ids, documents, metadatas, embed_texts(embed_inputs) if ids else [])
+
+
+def _write_chunks(
+    collection_name: str,
+    prepared: Optional[_PreparedChunks],
+    ppt_id: str,
+    replace: Optional[List[int]] = None,
+) -> None:
+    """写入已向量化的 chunk；replace 给出的页面会先删除旧 chunk（要点数可能变化）。"""
+
+    if prepared is None:
+        return
+    collection = get_slides_collection(chunk_collection_name(collection_name))
+    if replace:
+        collection.delete(where=_chunk_where(ppt_id, replace))
+    if prepared.ids:
+        collection.add(
+            ids=prepared.ids,
+            documents=prepared.documents,
+            metadatas=prepared.metadatas,
+            embeddings=prepared.embeddings,
+        )
+
+
+@timed("index")
+def index_slides(
+    slides: List[Slide],
+    ppt_id: str,
+    collection_name: Optional[str] = None,
+) -> None:
     """将一组 Slide 写入 Chroma 向量库。
 
     - ppt_id: 用于标记属于同一 PPT 的切片。
     - 每个 slide 将生成一个唯一 id: f"{ppt_id}-{slide.index}"。
+    - metadata 中附带 content_hash，供增量更新时比对。
+    - collection_name 为空时写入该 PPT 所在的分片。
+    - 同时写入页内 chunk（id 为 f"{ppt_id}-{slide.index}-c{chunk_no}"），见 slide_to_chunks。
+    - 嵌入在取锁之前计算，写入期间不阻塞其他 PPT 的检索。
     """
 
-    collection = get_slides_collection(collection_name)
-
     ids: List[str] = []
     documents: List[str] = []
     metadatas: List[Dict[str, Any]] = []
@@ -51,19 +583,139 @@ def index_slides(slides: List[Slide], ppt_id: str, collection_name: str = "ppt_s
         sid = f"{ppt_id}-{slide.index}"
         ids.append(sid)
         documents.append(slide_to_document(slide))
-        metadatas.append(
-            {
-                "ppt_id": ppt_id,
-                "slide_index": slide.index,
-                "title": slide.title,
-            }
-        )
+        metadatas.append(_slide_metadata(slide, ppt_id))
+
+    embeddings = embed_texts(documents) if ids else []
+    chunks = _prepare_chunks(slides, ppt_id)
+
+    with _store_write():
+        name = collection_name or shard_for_deck(ppt_id)
+        if ids:
+            get_slides_collection(name).add(
+                ids=ids,
+                documents=documents,
+                metadatas=metadatas,
+                embeddings=embeddings,
+            )
+        _write_chunks(name, chunks, ppt_id)
+
+
+@dataclass
+class IndexDiff:
+    """增量更新结果：各列表均为 slide_index。
+
+    carried: 新页 index -> 旧页 index，表示内容完全相同的页面（可能换了位置），
+    其已生成的笔记可以直接沿用。
+    """
+
+    added: List[int] = field(default_factory=list)
+    updated: List[int] = field(default_factory=list)
+    removed: List[int] = field(default_factory=list)
+    unchanged: List[int] = field(default_factory=list)
+    carried: Dict[int, int] = field(default_factory=dict)
 
-    if ids:
-        collection.add(ids=ids, documents=documents, metadatas=metadatas)
 
+@_shared_store_lock
+def get_indexed_hashes(ppt_id: str, collection_name: Optional[str] = None) -> Dict[int, str]:
+    """读取某个 PPT 已入库页面的内容哈希：slide_index -> content_hash。
+
+    旧版本写入、没有 content_hash 的页面对应空字符串，会被视为已修改。
+    """
+
+    collection = get_slides_collection(collection_name or shard_for_deck(ppt_id))
+    got = collection.get(where={"ppt_id": ppt_id}, include=["metadatas"])
+    hashes: Dict[int, str] = {}
+    for meta in got.get("metadatas") or []:
+        if not isinstance(meta, dict):
+            continue
+        hashes[int(meta.get("slide_index", 0))] = str(meta.get("content_hash", ""))
+    return hashes
+
+
+@timed("index")
+def update_indexed_slides(
+    slides: List[Slide],
+    ppt_id: str,
+    collection_name: Optional[str] = None,
+) -> IndexDiff:
+    """将重新解析得到的 Slide 列表与库中已有内容比对，只写入变化的部分。
+
+    - 同一 index 且哈希一致的页面不做任何写入；
+    - 新增或内容变化的页面 upsert（重新向量化）；
+    - 新版本中已不存在的 index 从 collection 中删除，避免残留孤立向量；
+    - 页内 chunk 随页面一起重建或删除。
+
+    比对与向量化不持写锁；同一 PPT 的两次更新需由调用方串行（后端上传按 ppt_id 加锁）。
+    """
 
-def index_ppt_file(ppt_path: str | Path, ppt_id: str, collection_name: str = "ppt_slides") -> List[Slide]:
+    collection_name = collection_name or shard_for_deck(ppt_id)
+    old_hashes = get_indexed_hashes(ppt_id, collection_name=collection_name)
+    old_by_hash: Dict[str, int] = {}
+    for idx, h in sorted(old_hashes.items()):
+        if h:
+            old_by_hash.setdefault(h, idx)
+
+    diff = IndexDiff()
+    ids: List[str] = []
+    documents: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+
+    for slide in slides:
+        new_hash = slide_content_hash(slide)
+        if new_hash in old_by_hash:
+            diff.carried[slide.index] = old_by_hash[new_hash]
+
+        old_hash = old_hashes.get(slide.index)
+        if old_hash == new_hash:
+            diff.unchanged.append(slide.index)
+            continue
+        if old_hash is None:
+            diff.added.append(slide.index)
+        else:
+            diff.updated.append(slide.index)
+        ids.append(f"{ppt_id}-{slide.index}")
+        documents.append(slide_to_document(slide))
+        metadatas.append(_slide_metadata(slide, ppt_id))
+
+    new_indices = {s.index for s in slides}
+    diff.removed = sorted(idx for idx in old_hashes if idx not in new_indices)
+    embeddings = embed_texts(documents) if ids else []
+
+    chunks: Optional[_PreparedChunks] = None
+    replace: Optional[List[int]] = None
+    if chunk_index_enabled():
+        with _store_lock.shared():
+            chunk_col = get_slides_collection(chunk_collection_name(collection_name))
+            has_chunks = bool(chunk_col.get(where={"ppt_id": ppt_id}, include=[], limit=1).get("ids"))
+        if not has_chunks:
+            # 旧版本入库、尚无 chunk 的 PPT：整体补建
+            chunks = _prepare_chunks(slides, ppt_id)
+        else:
+            changed = set(diff.added) | set(diff.updated)
+            chunks = _prepare_chunks([s for s in slides if s.index in changed], ppt_id)
+            replace = sorted(changed | set(diff.removed))
+
+    with _store_write():
+        collection = get_slides_collection(collection_name)
+        if ids:
+            collection.upsert(
+                ids=ids,
+                documents=documents,
+                metadatas=metadatas,
+                embeddings=embeddings,
+            )
+        if diff.removed:
+            collection.delete(ids=[f"{ppt_id}-{idx}" for idx in diff.removed])
+        _write_chunks(collection_name, chunks, ppt_id, replace=replace)
+
+    return diff
+
+
+def index_ppt_file(
+    ppt_path: str | Path,
+    ppt_id: str,
+    collection_name: Optional[str] = None,
+) -> List[Slide]:
     """从 PPT 文件解析 Slide，并写入 Chroma，返回解析得到的 Slide 列表。"""
 
     slides = parse_ppt(ppt_path)
@@ -71,17 +723,448 @@ def index_ppt_file(ppt_path: str | Path, ppt_id: str, collection_name: str = "pp
     return slides
 
 
+@timed("retrieve")
 def query_similar_slides(
     query_text: str,
     n_results: int = 5,
-    collection_name: str = "ppt_slides",
+    collection_name: Optional[str] = None,
+    ppt_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     """基于语义相似度，在Chroma 向量库中检索相关的幻灯片。
 
     返回值为 Chroma 的原始 query 结果字典，其中包含 ids、distances、metadatas 等字段。
     上层可以根据 metadatas 中的 ppt_id、slide_index 做进一步渲染。
+
+    - 指定 ppt_id 时只查询该 PPT 所在分片，并在库内按 ppt_id 过滤；
+    - 未指定 collection_name 与 ppt_id 且启用了分片时，对所有分片做 fan-out 检索。
     """
 
-    collection = get_slides_collection(collection_name)
-    results = collection.query(query_texts=[query_text], n_results=n_results)
-    return results
+    query_embeddings = embed_texts([query_text])
+    with _store_lock.shared():
+        if ppt_id:
+            collection = get_slides_collection(collection_name or shard_for_deck(ppt_id))
+            return collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where={"ppt_id": ppt_id},
+            )
+
+        if collection_name is None and _shard_mode() != "none":
+            return _query_across_shards(query_embeddings, n_results=n_results)
+
+        collection = get_slides_collection(collection_name or DEFAULT_COLLECTION)
+        return collection.query(query_embeddings=query_embeddings, n_results=n_results)
+
+
+def _empty_query_result() -> Dict[str, Any]:
+    return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+
+@timed("retrieve")
+def query_across_shards(
+    query_text: str,
+    n_results: int = 5,
+    collection_names: Optional[List[str]] = None,
+    ppt_ids: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """跨分片检索：并行查询多个 collection，按距离合并出全局 top-k。
+
+    - collection_names 为空时查询全部分片；
+    - 指定 ppt_ids 时只查询这些 PPT 所在的分片，并在每个分片内按 ppt_id 过滤。
+    返回结构与 Chroma query 结果一致（单条查询）。查询向量只计算一次，各分片复用。
+    """
+
+    query_embeddings = embed_texts([query_text])
+    with _store_lock.shared():
+        return _query_across_shards(query_embeddings, n_results, collection_names, ppt_ids)
+
+
+def _query_across_shards(
+    query_embeddings: List[Any],
+    n_results: int = 5,
+    collection_names: Optional[List[str]] = None,
+    ppt_ids: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+
+    where: Optional[Dict[str, Any]] = None
+    if ppt_ids is not None:
+        if not ppt_ids:
+            return _empty_query_result()
+        names = sorted({shard_for_deck(pid) for pid in ppt_ids})
+        where = {"ppt_id": ppt_ids[0]} if len(ppt_ids) == 1 else {"ppt_id": {"$in": list(ppt_ids)}}
+    else:
+        names = collection_names or list_shard_collections()
+    if not names:
+        return _empty_query_result()
+
+    def _query(name: str) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"query_embeddings": query_embeddings, "n_results": n_results}
+        if where is not None:
+            kwargs["where"] = where
+        return get_slides_collection(name).query(**kwargs)
+
+    if len(names) == 1:
+        partials = [_query(names[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(8, len(names))) as pool:
+            partials = list(pool.map(_query, names))
+
+    merged = []
+    for res in partials:
+        merged.extend(
+            zip(
+                (res.get("distances") or [[]])[0],
+                (res.get("ids") or [[]])[0],
+                (res.get("documents") or [[]])[0],
+                (res.get("metadatas") or [[]])[0],
+            )
+        )
+    merged.sort(key=lambda item: item[0])
+    merged = merged[:n_results]
+
+    return {
+        "ids": [[m[1] for m in merged]],
+        "documents": [[m[2] for m in merged]],
+        "metadatas": [[m[3] for m in merged]],
+        "distances": [[m[0] for m in merged]],
+    }
+
+
+@dataclass
+class SlideHit:
+    """chunk 检索按页聚合后的一条结果。
+
+    distance 为该页命中 chunk 中的最小距离；chunks 为命中的 chunk 文本，按页内顺序排列。
+    """
+
+    ppt_id: str
+    slide_index: int
+    title: str
+    distance: float
+    chunks: List[str] = field(default_factory=list)
+
+
+def aggregate_chunk_hits(
+    results: Dict[str, Any],
+    n_slides: int,
+    chunks_per_slide: int = 3,
+) -> List[SlideHit]:
+    """把 chunk 级的 Chroma query 结果按所属页面聚合，按各页最佳距离排序取前 n_slides 页。"""
+
+    merged = sorted(
+        zip(
+            (results.get("distances") or [[]])[0],
+            (results.get("documents") or [[]])[0],
+            (results.get("metadatas") or [[]])[0],
+        ),
+        key=lambda item: item[0],
+    )
+
+    hits: Dict[Tuple[str, int], SlideHit] = {}
+    picked: Dict[Tuple[str, int], List[Tuple[int, str]]] = {}
+    for distance, doc, meta in merged:
+        if not isinstance(meta, dict):
+            continue
+        key = (str(meta.get("ppt_id", "")), int(meta.get("slide_index", 0)))
+        if key not in hits:
+            if len(hits) >= n_slides:
+                continue
+            hits[key] = SlideHit(key[0], key[1], str(meta.get("title") or ""), float(distance))
+            picked[key] = []
+        if len(picked[key]) < chunks_per_slide:
+            picked[key].append((int(meta.get("chunk_no", 0)), doc or ""))
+
+    for key, hit in hits.items():
+        hit.chunks = [text for _no, text in sorted(picked[key])]
+    return list(hits.values())
+
+
+@timed("retrieve")
+def query_similar_chunks(
+    query_text: str,
+    n_slides: int = 5,
+    ppt_id: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    chunks_per_slide: int = 3,
+    exclude_slides: Iterable[int] = (),
+) -> List[SlideHit]:
+    """在 chunk 级索引上检索，再把命中的 chunk 聚合回页面。
+
+    - 指定 ppt_id 时只查询该 PPT 所在分片的 chunk，exclude_slides 可排除若干页（如当前页本身）；
+    - 未指定 ppt_id 且启用了分片时，对所有分片的 chunk collection 做 fan-out 检索；
+    - 未启用 chunk 索引或该 PPT 尚无 chunk 时返回空列表，由上层退回整页检索。
+    """
+
+    if not chunk_index_enabled():
+        return []
+    n_results = max(1, n_slides) * _CHUNK_OVERSAMPLE
+    query_embeddings = embed_texts([query_text])
+
+    with _store_lock.shared():
+        if ppt_id:
+            where: Dict[str, Any] = {"ppt_id": ppt_id}
+            excluded = sorted(set(exclude_slides))
+            if excluded:
+                where = {"$and": [where, {"slide_index": {"$nin": excluded}}]}
+            collection = get_slides_collection(
+                chunk_collection_name(collection_name or shard_for_deck(ppt_id))
+            )
+            raw = collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+        elif collection_name is None and _shard_mode() != "none":
+            names = [chunk_collection_name(name) for name in list_shard_collections()]
+            raw = _query_across_shards(query_embeddings, n_results=n_results, collection_names=names)
+        else:
+            collection = get_slides_collection(chunk_collection_name(collection_name or DEFAULT_COLLECTION))
+            raw = collection.query(query_embeddings=query_embeddings, n_results=n_results)
+
+    return aggregate_chunk_hits(raw, n_slides=n_slides, chunks_per_slide=chunks_per_slide)
+
+
+def delete_deck_vectors(ppt_ids: Iterable[str], collection_name: Optional[str] = None) -> int:
+    """批量删除若干 PPT 在向量库中的全部切片（连同页内 chunk），返回删除的整页切片条数。
+
+    未指定 collection_name 时按各 PPT 所在分片分组删除，并注销分片登记。
+    """
+
+    ids = [pid for pid in ppt_ids if pid]
+    if not ids:
+        return 0
+
+    with _store_write():
+        groups: Dict[str, List[str]] = {}
+        for pid in ids:
+            groups.setdefault(collection_name or shard_for_deck(pid), []).append(pid)
+
+        total = 0
+        existing_names = _collection_names()
+        for name, group in groups.items():
+            collection = get_slides_collection(name)
+            where: Dict[str, Any] = {"ppt_id": group[0]} if len(group) == 1 else {"ppt_id": {"$in": group}}
+            existing = collection.get(where=where, include=[])
+            doomed = existing.get("ids") or []
+            if doomed:
+                collection.delete(ids=doomed)
+            total += len(doomed)
+            if chunk_collection_name(name) in existing_names:
+                get_slides_collection(chunk_collection_name(name)).delete(where=where)
+
+        registry = _load_registry()
+        if any(pid in registry for pid in ids):
+            for pid in ids:
+                registry.pop(pid, None)
+            _save_registry()
+        return total
+
+
+def _collection_names() -> set[str]:
+    return {getattr(col, "name", col) for col in get_client().list_collections()}
+
+
+def _dir_size(path: Path) -> int:
+    if not path.exists():
+        return 0
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _iter_collection(collection: Any, batch_size: int) -> Iterable[Dict[str, Any]]:
+    """分批读取 collection 的全部条目（含 embedding）。"""
+
+    offset = 0
+    while True:
+        batch = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=offset,
+        )
+        ids = batch.get("ids") or []
+        if not ids:
+            return
+        yield batch
+        offset += len(ids)
+
+
+def _rebuild_collection(name: str, batch_size: int) -> int:
+    """将 collection 的现存条目复制到新 collection 并替换原 collection，返回条目数。"""
+
+    source = get_slides_collection(name)
+    tmp_name = f"{name}__compact"
+    try:
+        get_client().delete_collection(tmp_name)
+    except Exception:
+        pass
+    target = get_slides_collection(tmp_name)
+
+    kept = 0
+    for batch in _iter_collection(source, batch_size):
+        target.add(
+            ids=batch["ids"],
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"],
+        )
+        kept += len(batch["ids"])
+
+    get_client().delete_collection(name)
+    target.modify(name=name)
+    return kept
+
+
+@_exclusive_store_lock
+def compact_vector_store(
+    collection_name: Optional[str] = None,
+    batch_size: int = 2000,
+) -> Dict[str, int]:
+    """压缩向量库，回收已删除切片占用的空间。
+
+    Chroma 删除条目后 HNSW 索引只做标记删除，检索仍要跳过这些节点。
+    这里的做法是：
+    1. 将现存条目连同原有 embedding 复制到临时 collection（不重新向量化）；
+    2. 删除原 collection，再把临时 collection 重命名回原名；
+    3. 清理 SQLite 中已无引用的段目录，并执行 VACUUM（仅 Chroma 后端）。
+
+    collection_name 为空时压缩全部分片（连同对应的 chunk collection）。
+    返回压缩前后的磁盘占用（字节）与保留的整页 / chunk 条目数。
+    """
+
+    bytes_before = _dir_size(CHROMA_DIR)
+
+    names = [collection_name] if collection_name else list_shard_collections()
+    existing_names = _collection_names()
+    kept = 0
+    kept_chunks = 0
+    for name in names:
+        kept += _rebuild_collection(name, batch_size)
+        if chunk_collection_name(name) in existing_names:
+            kept_chunks += _rebuild_collection(chunk_collection_name(name), batch_size)
+
+    if vector_backend() == "chroma":
+        _remove_orphan_segments(CHROMA_DIR)
+        _vacuum_sqlite(CHROMA_DIR / "chroma.sqlite3")
+
+    bytes_after = _dir_size(CHROMA_DIR)
+    return {
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "reclaimed_bytes": max(0, bytes_before - bytes_after),
+        "kept_vectors": kept,
+        "kept_chunks": kept_chunks,
+        "collections": len(names),
+    }
+
+
+@_exclusive_store_lock
+def migrate_to_shards(
+    source_name: str = DEFAULT_COLLECTION,
+    owners: Optional[Dict[str, str]] = None,
+    courses: Optional[Dict[str, str]] = None,
+    batch_size: int = 2000,
+) -> Dict[str, int]:
+    """把单一 collection 中的切片按当前分片模式拆分到各分片。
+
+    - 复用已有 embedding，不重新向量化；
+    - owners / courses 为 ppt_id -> 用户名 / 课程名，供 user、course 模式使用；
+    - 迁出的条目会从源 collection 删除，仍归属源 collection 的条目保持不动；
+    - 源 collection 的页内 chunk 一并迁到对应分片的 chunk collection。
+
+    返回 目标 collection 名 -> 迁入的整页切片条数。
+    """
+
+    owners = owners or {}
+    courses = courses or {}
+
+    def target_shard(ppt_id: str) -> str:
+        return assign_deck_shard(ppt_id, user=owners.get(ppt_id), course=courses.get(ppt_id))
+
+    moved = _move_entries(source_name, source_name, target_shard, batch_size)
+    if chunk_collection_name(source_name) in _collection_names():
+        _move_entries(
+            chunk_collection_name(source_name),
+            source_name,
+            lambda pid: chunk_collection_name(target_shard(pid)),
+            batch_size,
+        )
+    return moved
+
+
+def _move_entries(
+    name: str,
+    source_name: str,
+    target_for: Callable[[str], str],
+    batch_size: int,
+) -> Dict[str, int]:
+    """把 collection name 中的条目按 ppt_id 移到 target_for(ppt_id)，目标为 source_name 的保持不动。"""
+
+    source = get_slides_collection(name)
+    moved: Dict[str, int] = {}
+    moved_ids: List[str] = []
+    for batch in _iter_collection(source, batch_size):
+        groups: Dict[str, Dict[str, List[Any]]] = {}
+        for sid, emb, doc, meta in zip(
+            batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"]
+        ):
+            target = target_for(str((meta or {}).get("ppt_id", "")))
+            if target in (name, source_name):
+                continue
+            group = groups.setdefault(
+                target, {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+            )
+            group["ids"].append(sid)
+            group["embeddings"].append(emb)
+            group["documents"].append(doc)
+            group["metadatas"].append(meta)
+
+        for target, group in groups.items():
+            get_slides_collection(target).upsert(**group)
+            moved[target] = moved.get(target, 0) + len(group["ids"])
+            moved_ids.extend(group["ids"])
+
+    for i in range(0, len(moved_ids), batch_size):
+        source.delete(ids=moved_ids[i : i + batch_size])
+    return moved
+
+
+def _is_segment_dir_name(name: str) -> bool:
+    """Chroma 的段目录以段 id（UUID）命名。"""
+
+    try:
+        uuid.UUID(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _remove_orphan_segments(store_dir: Path) -> None:
+    """删除 chroma.sqlite3 的 segments 表中已不存在的段目录（删除 collection 后的残留）。
+
+    CHROMA_DIR 可由环境变量指定，只处理名称为 UUID 的目录，其余目录一律保留，避免误删无关数据。
+    """
+
+    db_path = store_dir / "chroma.sqlite3"
+    if not db_path.exists():
+        return
+    try:
+        with sqlite3.connect(str(db_path)) as conn:
+            live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    except sqlite3.Error:
+        return
+
+    for child in store_dir.iterdir():
+        if child.is_dir() and _is_segment_dir_name(child.name) and child.name not in live:
+            logger.info("删除孤立的 Chroma 段目录：%s", child)
+            shutil.rmtree(child, ignore_errors=True)
+
+
+def _vacuum_sqlite(db_path: Path) -> Optional[str]:
+    """对 Chroma 的 SQLite 文件执行 VACUUM；数据库被占用时返回错误信息而不抛出。"""
+
+    if not db_path.exists():
+        return None
+    try:
+        conn = sqlite3.connect(str(db_path), timeout=5)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    except sqlite3.Error as exc:
+        return str(exc)
+    return None
@@ -435,9 +435,21 @@
       resetNotes();
       setProgress(true, 1, '开始生成整份笔记…');
 
+      // 先一次性读取已生成（含后台预热）的笔记，只对缺失的页面调用 /expand
+      const ready = new Set();
+      try {
+        const stored = await apiFetch('/notes?ppt_id=' + encodeURIComponent(pptId));
+        (stored || []).forEach((n) => {
+          const idx = Number(n.slide_index || 0);
+          setNote(idx, n.title || '', n.expanded_markdown || '');
+          ready.add(idx);
+        });
+      } catch (err) {}
+
       for (let i = 0; i < slides.length; i++) {
         const s = slides[i];
         const idx = Number(s.index || 0);
+        if (ready.has(idx)) continue;
         const pct = ((i) / slides.length) * 100;
         setProgress(true, pct, '正在生成第 ' + idx + ' / ' + slides.length + ' 页…');
 
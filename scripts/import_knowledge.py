@@ -0,0 +1,62 @@
+"""把 arXiv 元数据 / Wikipedia 摘要 dump 导入本地离线知识索引。
+
+运行方式（在项目根目录下，可与后端同时运行；重复导入同一条目会覆盖旧内容）：
+
+    python -m scripts.import_knowledge --arxiv arxiv-metadata-oai-snapshot.json --arxiv-categories cs. stat.ML
+    python -m scripts.import_knowledge --wikipedia zhwiki-latest-abstract.xml.gz
+
+- arXiv 元数据为每行一个 JSON 的快照文件（含 id / title / abstract / categories）；
+- Wikipedia 摘要 dump 即 dumps.wikimedia.org 上的 *-abstract.xml；
+- 均支持 .gz / .bz2 压缩文件；
+- 索引文件位置由 PPT_AGENT_KNOWLEDGE_DB 决定，也可用 --db 指定。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from core.knowledge_index import (
+    KNOWLEDGE_DB,
+    KnowledgeIndex,
+    iter_arxiv_metadata,
+    iter_wikipedia_abstracts,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="导入离线知识 dump 到本地 FTS5 索引")
+    parser.add_argument("--arxiv", type=Path, nargs="*", default=[], help="arXiv 元数据快照（JSON Lines）")
+    parser.add_argument(
+        "--arxiv-categories", nargs="*", default=None, help="只导入这些分类前缀的论文，如 cs. stat.ML"
+    )
+    parser.add_argument("--wikipedia", type=Path, nargs="*", default=[], help="Wikipedia 摘要 dump（XML）")
+    parser.add_argument("--db", type=Path, default=KNOWLEDGE_DB, help="索引文件路径")
+    args = parser.parse_args()
+
+    if not args.arxiv and not args.wikipedia:
+        parser.error("至少需要指定 --arxiv 或 --wikipedia")
+
+    index = KnowledgeIndex(args.db)
+    report: Dict[str, object] = {"db": str(args.db)}
+    imported: List[Dict[str, object]] = []
+    for path in args.arxiv:
+        start = time.perf_counter()
+        n = index.add_documents(iter_arxiv_metadata(path, categories=args.arxiv_categories))
+        imported.append({"file": str(path), "source": "arxiv", "docs": n, "seconds": round(time.perf_counter() - start, 1)})
+    for path in args.wikipedia:
+        start = time.perf_counter()
+        n = index.add_documents(iter_wikipedia_abstracts(path))
+        imported.append({"file": str(path), "source": "wikipedia", "docs": n, "seconds": round(time.perf_counter() - start, 1)})
+    index.optimize()
+
+    report["imported"] = imported
+    report["total_docs"] = index.count()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
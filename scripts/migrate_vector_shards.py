@@ -0,0 +1,58 @@
+"""将已有的单一 ppt_slides collection 拆分到分片 collection。
+
+运行方式（在项目根目录下，先停止后端服务）：
+
+    python -m scripts.migrate_vector_shards --mode hash --buckets 16
+    python -m scripts.migrate_vector_shards --mode user --owners owners.json --compact
+
+- owners.json / courses.json 为 {"<ppt_id>": "<用户名或课程名>"}；
+- 迁移复用已有 embedding，不会重新调用嵌入模型；
+- 迁移完成后，请以相同的 PPT_AGENT_SHARD_MODE / PPT_AGENT_SHARD_BUCKETS 启动后端。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def _load_mapping(path: Optional[Path]) -> Dict[str, str]:
+    if path is None:
+        return {}
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return {str(k): str(v) for k, v in data.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="拆分 ppt_slides collection 到分片")
+    parser.add_argument("--mode", choices=["user", "course", "hash"], required=True)
+    parser.add_argument("--buckets", type=int, default=None, help="hash 模式下的桶数")
+    parser.add_argument("--source", default="ppt_slides", help="待拆分的 collection 名")
+    parser.add_argument("--owners", type=Path, default=None, help="ppt_id -> 用户名 的 JSON 文件")
+    parser.add_argument("--courses", type=Path, default=None, help="ppt_id -> 课程名 的 JSON 文件")
+    parser.add_argument("--compact", action="store_true", help="迁移后压缩向量库")
+    args = parser.parse_args()
+
+    # 分片模式通过环境变量读取，需在导入 vector_store 之前设置
+    os.environ["PPT_AGENT_SHARD_MODE"] = args.mode
+    if args.buckets is not None:
+        os.environ["PPT_AGENT_SHARD_BUCKETS"] = str(args.buckets)
+
+    from core import vector_store
+
+    moved = vector_store.migrate_to_shards(
+        source_name=args.source,
+        owners=_load_mapping(args.owners),
+        courses=_load_mapping(args.courses),
+    )
+    report: Dict[str, object] = {"moved": moved, "total": sum(moved.values())}
+    if args.compact:
+        report["compaction"] = vector_store.compact_vector_store()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""测试公共夹具。
+
+Chroma 默认的嵌入模型需要联网下载，这里复用基准测试的离线嵌入函数，
+并把向量库放到临时目录，保证测试可离线运行且互不干扰。
+后端接口测试共用 api_client：临时用户库与签名密钥、临时笔记目录和单线程的后台生成线程池。
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import api
+from benchmarks._offline import use_offline_store
+from core import auth, note_store, vector_store
+
+
+@pytest.fixture
+def offline_store(tmp_path, monkeypatch):
+    """将 vector_store 切换到临时目录下的独立 Chroma 实例。"""
+
+    monkeypatch.setattr(vector_store, "_client", vector_store._client)
+    monkeypatch.setattr(vector_store, "_embedding_function", vector_store._embedding_function)
+    monkeypatch.setattr(vector_store, "CHROMA_DIR", vector_store.CHROMA_DIR)
+    use_offline_store(tmp_path / "chroma")
+    yield vector_store.get_client()
+
+
+@pytest.fixture
+def api_client(tmp_path, monkeypatch):
+    """返回 `api_client(username)`：创建已登录该用户的 TestClient。
+
+    用户库、笔记与后台生成都使用临时目录和独立的线程池；结束时关闭线程池，
+    并恢复 AUTH_DIR，避免后续测试指向已删除的临时目录。
+    """
+
+    monkeypatch.setattr(auth, "AUTH_DIR", auth.AUTH_DIR)
+    auth.configure_auth(secret="test-secret", auth_dir=tmp_path / "auth")
+    monkeypatch.setattr(note_store, "NOTES_DIR", tmp_path / "notes")
+    monkeypatch.setattr(note_store, "_cache", {})
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warm-notes")
+    monkeypatch.setattr(api, "_WARM_EXECUTOR", executor)
+    monkeypatch.setattr(api, "NOTE_FUTURES", {})
+
+    def login(username: str = "alice") -> TestClient:
+        client = TestClient(api.app)
+        client.headers["Authorization"] = f"Bearer {auth.issue_token(username)}"
+        return client
+
+    yield login
+    executor.shutdown(wait=True)
+    auth.configure_auth()
@@ -0,0 +1,76 @@
+"""无状态签名 token、持久化用户表与加盐密码哈希 (core.auth) 的单元测试。"""
+
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import api
+from core import auth
+
+
+@pytest.fixture
+def auth_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_DIR", auth.AUTH_DIR)
+    monkeypatch.delenv(auth.AUTH_SECRET_ENV, raising=False)
+    auth.configure_auth(auth_dir=tmp_path / "auth")
+    yield tmp_path / "auth"
+    auth.configure_auth()
+
+
+def test_token_roundtrip_and_expiry(auth_dir) -> None:
+    token = auth.issue_token("张三 student", now=1000)
+
+    assert auth.verify_token(token, now=1001) == "张三 student"
+    with pytest.raises(auth.TokenExpired):
+        auth.verify_token(token, now=1000 + 25 * 3600)
+
+
+def test_tampered_or_foreign_token_is_rejected(auth_dir) -> None:
+    token = auth.issue_token("alice")
+    user_part, expires, signature = token.split(".")
+
+    forged = f"{auth._b64encode(b'mallory')}.{expires}.{signature}"
+    with pytest.raises(auth.TokenInvalid):
+        auth.verify_token(forged)
+    with pytest.raises(auth.TokenInvalid):
+        auth.verify_token("not-a-token")
+
+    # 另一个 worker 读取同一密钥文件，可以校验本进程签发的 token
+    auth.configure_auth(auth_dir=auth_dir)
+    assert auth.verify_token(token) == "alice"
+    # 密钥不同则无法通过
+    auth.configure_auth(secret="other-secret", auth_dir=auth_dir)
+    with pytest.raises(auth.TokenInvalid):
+        auth.verify_token(token)
+
+
+def test_user_store_persists(auth_dir) -> None:
+    store = auth.USER_STORE
+    assert store.create_user("alice", "hash-1")
+    assert not store.create_user("alice", "hash-2")
+
+    store.reset()
+    assert store.get_password_hash("alice") == "hash-1"
+    assert store.get_password_hash("bob") is None
+
+
+def test_salted_password_hash(auth_dir, monkeypatch) -> None:
+    first, second = auth.hash_password("secret-1"), auth.hash_password("secret-1")
+    assert first != second and first.startswith("scrypt$")
+    assert auth.verify_password("secret-1", first) and not auth.verify_password("secret-2", first)
+    assert not auth.verify_password("secret-1", "scrypt$broken")
+
+    client = TestClient(api.app)
+    assert client.post("/auth/register", json={"username": "alice", "password": "secret-1"}).status_code == 200
+    assert auth.verify_password("secret-1", auth.USER_STORE.get_password_hash("alice"))
+    assert client.post("/auth/login", json={"username": "alice", "password": "wrong-1"}).status_code == 400
+    assert client.post("/auth/login", json={"username": "alice", "password": "secret-1"}).status_code == 200
+
+    # 未注册的用户名同样计算一次 scrypt，响应时间不暴露用户是否存在
+    calls = []
+    scrypt = auth._scrypt
+    monkeypatch.setattr(auth, "_scrypt", lambda *args: calls.append(args[0]) or scrypt(*args))
+    assert client.post("/auth/login", json={"username": "nobody", "password": "secret-1"}).status_code == 400
+    assert client.post("/auth/login", json={"username": "alice", "password": "wrong-1"}).status_code == 400
+    assert calls == ["secret-1", "wrong-1"]
@@ -0,0 +1,82 @@
+"""整份 PPT 生成笔记时把小页面打包进一次 LLM 调用：打包、拆分、退回单页与后台预热的测试。"""
+
+from __future__ import annotations
+
+import re
+import threading
+
+from backend import api
+from benchmarks._offline import offline_llm
+from core import llm_agent, note_store, vector_store
+from core.ppt_parser import Slide, SlideDeck
+
+
+def _deck() -> list[Slide]:
+    slides = [Slide(index=i, title=f"梯度下降 第 {i} 节", bullets=[f"学习率与步长 {i}"]) for i in range(1, 7)]
+    slides.append(Slide(index=7, title="反向传播推导", bullets=["链式法则逐层求导的完整推导过程。" * 20]))
+    return slides
+
+
+def test_pack_parse_and_fallback(offline_store, monkeypatch) -> None:
+    slides = _deck()
+    vector_store.index_slides(slides, ppt_id="d")
+    prompts: list = []
+
+    def fake_call_llm(prompt: str, api_key=None) -> str:
+        prompts.append(prompt)
+        batch = re.search(r"本次需要输出的页面索引依次为：([\d、]+)。", prompt)
+        if batch is None:
+            return "# 背景说明\n单页调用"
+        # 模型漏掉了第 2 页
+        indices = [i for i in batch.group(1).split("、") if i != "2"]
+        return "\n".join(f"<<<SLIDE {i}>>>\n# 背景说明\n第 {i} 页（打包）" for i in indices)
+
+    monkeypatch.setattr(llm_agent, "call_llm", fake_call_llm)
+    cfg = llm_agent.AgentConfig(use_wikipedia=False)
+    notes = llm_agent.expand_slides_batched(slides, config=cfg, ppt_id="d")
+
+    # [1-4] 与 [5, 6] 各打包一次，第 2 页退回单页调用，内容较多的第 7 页单独调用
+    assert len(prompts) == 4
+    assert list(notes) == [1, 2, 3, 4, 5, 6, 7]
+    assert notes[1] == "# 背景说明\n第 1 页（打包）"
+    assert notes[2] == notes[7] == "# 背景说明\n单页调用"
+
+    packed = prompts[0]
+    assert packed.count("重要约束") == 1 and "依次为：1、2、3、4。" in packed
+    context = packed.split("【PPT 内部相关页面（检索得到，各页共用）】")[1].split("【外部知识片段")[0]
+    related = re.findall(r"\[相关页 index=(\d+),", context)
+    assert related and len(related) == len(set(related))
+    assert not {"1", "2", "3", "4"} & set(related)
+
+    # 预算不足以容纳两页时全部逐页调用，prompt 与单页生成完全相同
+    prompts.clear()
+    monkeypatch.setenv(llm_agent.BATCH_TOKEN_BUDGET_ENV, "1")
+    llm_agent.expand_slides_batched(slides[:3], config=cfg, ppt_id="d")
+    single = llm_agent.build_prompt_for_slide_expansion(
+        slides[0], *llm_agent._slide_materials(slides[0], cfg, "d")
+    )
+    assert len(prompts) == 3 and prompts[0] == single
+
+
+def test_deck_warmup_packs_slides(offline_store, api_client, monkeypatch) -> None:
+    slides = _deck()
+    vector_store.index_slides(slides, ppt_id="d")
+    monkeypatch.setitem(api.PPT_SLIDES, "d", SlideDeck(slides))
+    note_store.save_note("d", 5, "已有笔记")
+    gate = threading.Event()
+    api._WARM_EXECUTOR.submit(gate.wait, 5)
+
+    with offline_llm() as prompts:
+        assert api.schedule_deck_warmup("d", slides) == 6
+        # 每页仍有各自的 Future；排队中被取消的页面不再生成
+        assert sorted(key[1] for key in api.NOTE_FUTURES) == [1, 2, 3, 4, 6, 7]
+        api.NOTE_FUTURES[api._note_key("d", slides[2])].cancel()
+        pending = api.NOTE_FUTURES[api._note_key("d", slides[3])]
+        gate.set()
+        assert "# AI 自评" in pending.result(timeout=5)
+        api._WARM_EXECUTOR.submit(lambda: None).result(timeout=5)
+
+    # 打包的第 1、2、4 页，加上单独成组的第 6 页与第 7 页，共 3 次调用
+    assert len(prompts) == 3
+    assert sorted(note_store.load_deck_notes("d")) == [1, 2, 4, 5, 6, 7]
+    assert api.NOTE_FUTURES == {}
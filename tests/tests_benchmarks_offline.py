@@ -0,0 +1,89 @@
+"""离线基准套件的冒烟测试：保证替身与基准脚本不会随代码演进而失效。"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks._common import compare_results, summarize
+from benchmarks._offline import build_synthetic_pptx
+from benchmarks.bench_pipeline import bench_deck
+from benchmarks.loadtest import parse_mix
+from benchmarks.stub_services import StubConfig, create_stub_app
+from core.ppt_parser import parse_ppt
+
+
+def test_synthetic_deck_roundtrip(tmp_path) -> None:
+    path = build_synthetic_pptx(tmp_path / "deck.pptx", num_slides=3, bullets_per_slide=4)
+    slides = parse_ppt(path)
+
+    assert len(slides) == 3
+    assert slides[0].title.startswith("第 1 节")
+    assert len(slides[0].bullets) == 4
+
+
+def test_bench_deck_runs_offline(offline_store, tmp_path) -> None:
+    path = build_synthetic_pptx(tmp_path / "deck.pptx", num_slides=4)
+    cases = bench_deck(
+        "synthetic-4", path, rounds=1, expand_slides=2, llm_latency_s=0, external_latency_s=0
+    )
+
+    names = [c["case"] for c in cases]
+    assert names == [
+        "parse_ppt[synthetic-4]",
+        "index_slides[synthetic-4]",
+        "query_similar_slides[synthetic-4]",
+        "retrieval_context_slide[synthetic-4]",
+        "retrieval_context_chunk[synthetic-4]",
+        "build_prompt_for_slide_expansion[synthetic-4]",
+        "expand_slide_with_tools[synthetic-4]",
+        "expand_slides_batched[synthetic-4]",
+    ]
+    expand, batched = cases[-2:]
+    assert expand["llm_calls"] == 2
+    assert expand["external_requests"] == 2
+    assert batched["llm_calls"] == 1
+
+
+def test_summarize_and_compare() -> None:
+    stats = summarize([1.0, 2.0, 3.0, 4.0])
+    assert stats["n"] == 4 and stats["p50_ms"] == 2.5 and stats["max_ms"] == 4.0
+
+    old = {"cases": [{"case": "a", "p50_ms": 1.0}]}
+    new = {"cases": [{"case": "a", "p50_ms": 2.0}, {"case": "b", "p50_ms": 1.0}]}
+    lines = compare_results(old, new)
+    assert "slower" in lines[0]
+    assert lines[1].startswith("b:")
+
+
+def test_stub_llm_streams_openai_chunks() -> None:
+    config = StubConfig(llm_ttft_s=0, llm_tokens_per_sec=0, llm_output_tokens=3, external_latency_s=0)
+    client = TestClient(create_stub_app(config))
+
+    resp = client.post(
+        "/v1/chat/completions",
+        json={
+            "model": "m",
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            "messages": [{"role": "user", "content": "你好"}],
+        },
+    )
+    events = [line[len("data: "):] for line in resp.text.splitlines() if line.startswith("data: ")]
+
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+    assert text == "知识点 " * 3
+    assert chunks[-1]["usage"]["completion_tokens"] == 3
+
+    wiki = client.get("/wikipedia/w/api.php", params={"srsearch": "梯度", "srlimit": 2}).json()
+    assert len(wiki["query"]["search"]) == 2
+
+
+def test_parse_mix() -> None:
+    assert parse_mix("slides=3,expand=1") == {"slides": 3.0, "expand": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("delete=1")
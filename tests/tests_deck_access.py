@@ -0,0 +1,94 @@
+"""按用户隔离的 PPT 访问控制：重新上传只允许上传者本人，检索需要有效的 ppt_id，全局维护需要管理员令牌；不同 PPT 的上传互不阻塞。"""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import api
+from benchmarks._offline import build_synthetic_pptx
+from core import auth, profiling
+from core.ppt_parser import Slide
+
+
+@pytest.fixture
+def deck_api(offline_store, api_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "UPLOAD_DIR", tmp_path / "uploads")
+    for name in ("PPT_SLIDES", "SLIDES_PAYLOADS", "DECK_OWNERS"):
+        monkeypatch.setattr(api, name, {})
+    monkeypatch.setattr(api, "DECK_ACTIVITY", api.DeckActivity())
+    api.UPLOAD_DIR.mkdir()
+    return tmp_path
+
+
+def _upload(client: TestClient, path, **params):
+    with open(path, "rb") as f:
+        files = {"file": ("deck.pptx", f, "application/vnd.openxmlformats-officedocument.presentationml.presentation")}
+        return client.post("/upload", params={"warm": False, **params}, files=files)
+
+
+def test_reupload_requires_owner(deck_api, api_client) -> None:
+    small = build_synthetic_pptx(deck_api / "small.pptx", num_slides=3)
+    large = build_synthetic_pptx(deck_api / "large.pptx", num_slides=5)
+    alice, bob = api_client("alice"), api_client("bob")
+
+    ppt_id = _upload(alice, small).json()["ppt_id"]
+    resp = _upload(bob, large, ppt_id=ppt_id)
+    assert resp.status_code == 403
+    assert len(api.PPT_SLIDES[ppt_id]) == 3 and api.DECK_OWNERS[ppt_id] == "alice"
+
+    resp = _upload(alice, large, ppt_id=ppt_id)
+    assert resp.status_code == 200 and resp.json()["num_slides"] == 5
+    # 每次重新上传使用独立的临时文件，完成后只留下正式文件
+    assert sorted(p.name for p in api.UPLOAD_DIR.glob("*.pptx")) == [f"{ppt_id}.pptx"]
+
+
+def test_search_and_maintenance_access(deck_api, api_client, monkeypatch) -> None:
+    monkeypatch.setenv(api.MAX_DECKS_ENV, "2")
+    monkeypatch.setenv(auth.ADMIN_TOKEN_ENV, "admin-secret")
+    monkeypatch.setenv(profiling.PROFILE_TOKEN_ENV, "profile-secret")
+    path = build_synthetic_pptx(deck_api / "deck.pptx", num_slides=2)
+    alice, bob = api_client("alice"), api_client("bob")
+    decks = [_upload(alice, path).json()["ppt_id"] for _ in range(2)]
+
+    # 不存在的 ppt_id 不进入访问记录，也不会挤掉真实的 PPT
+    for n in range(3):
+        assert bob.get("/search", params={"ppt_id": f"bogus{n}", "q": "梯度"}).status_code == 404
+    assert len(api.DECK_ACTIVITY) == 2
+
+    # 全局维护操作需要管理员令牌
+    assert bob.post("/maintenance/evict").status_code == 403
+    assert bob.post("/maintenance/compact", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert bob.post("/maintenance/compact", headers={"X-Admin-Token": "profile-secret"}).status_code == 403
+    resp = bob.post("/maintenance/evict", headers={"X-Admin-Token": "admin-secret"})
+    assert resp.json() == {"evicted": []}
+    assert sorted(api.PPT_SLIDES) == sorted(decks)
+
+
+def test_uploads_of_different_decks_run_concurrently(deck_api, monkeypatch) -> None:
+    first_started, release = threading.Event(), threading.Event()
+    index_slides = api.index_slides
+
+    def slow_index(slides, ppt_id):
+        if ppt_id == "slow":
+            first_started.set()
+            release.wait(5)
+        return index_slides(slides, ppt_id=ppt_id)
+
+    monkeypatch.setattr(api, "index_slides", slow_index)
+    slides = [Slide(index=1, title="梯度下降", bullets=["学习率"])]
+
+    def store(ppt_id: str) -> None:
+        api._store_deck(ppt_id, deck_api / f"{ppt_id}.pptx", slides, "deck.pptx", False, "alice")
+
+    slow = threading.Thread(target=store, args=("slow",))
+    slow.start()
+    assert first_started.wait(5)
+    # 另一份 PPT 的上传不必等待正在入库的 "slow"
+    store("fast")
+    assert "fast" in api.PPT_SLIDES and slow.is_alive()
+    release.set()
+    slow.join(5)
+    assert sorted(api.PPT_SLIDES) == ["fast", "slow"] and len(api._STORE_DECK_LOCKS) == 0
@@ -0,0 +1,183 @@
+"""/upload_url 异步下载：分段并行、断点续传与提前结构校验，使用本地支持 Range 的 HTTP 服务器。"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import re
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from core import downloader
+from core.downloader import DownloadError, InvalidPackage, download_file
+
+
+SAMPLE = Path(__file__).resolve().parent.parent / "examples" / "sample.pptx"
+SEGMENT = 64 * 1024
+
+
+class _Server:
+    """内存中的文件服务器，可关闭 Range 支持、让指定请求中途断开或返回 500。"""
+
+    def __init__(self, files: dict[str, bytes], ranges: bool = True) -> None:
+        self.files = files
+        self.ranges = ranges
+        self.requests: list[str] = []
+        self.bytes_sent = 0
+        self.drop_after: dict[int, int] = {}  # 从该偏移开始的 Range 请求首次只发送这么多字节后断开
+        self.fail_from: int | None = None  # 从第 n 个请求起返回 500
+        self.redirects: dict[str, str] = {}  # 路径 -> 302 跳转目标
+        self.lock = threading.Lock()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                data = outer.files.get(self.path)
+                with outer.lock:
+                    n = len(outer.requests)
+                    outer.requests.append(self.headers.get("Range", ""))
+                if self.path in outer.redirects:
+                    self.send_response(302)
+                    self.send_header("Location", outer.redirects[self.path])
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if data is None:
+                    self.send_error(404)
+                    return
+                if outer.fail_from is not None and n >= outer.fail_from:
+                    self.send_error(500)
+                    return
+                m = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if outer.ranges and m:
+                    start = int(m.group(1))
+                    end = min(int(m.group(2) or len(data) - 1), len(data) - 1)
+                    body = data[start : end + 1]
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                else:
+                    body = data
+                    self.send_response(200)
+                self.send_header("ETag", '"v1"')
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                with outer.lock:
+                    limit = outer.drop_after.pop(int(m.group(1)), None) if m else None
+                if limit is not None:
+                    body = body[:limit]
+                self.wfile.write(body)
+                with outer.lock:
+                    outer.bytes_sent += len(body)
+                if limit is not None:
+                    self.close_connection = True
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def __enter__(self) -> "_Server":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _download(server: _Server, path: str, tmp_path: Path, **kwargs):
+    kwargs.setdefault("segment_bytes", SEGMENT)
+    kwargs.setdefault("backoff_s", 0.01)
+    return asyncio.run(
+        download_file(server.url(path), tmp_path / "out.pptx", tmp_path / "partial", max_bytes=50 * 1024 * 1024, **kwargs)
+    )
+
+
+def test_parallel_ranges_and_retry_mid_segment(tmp_path) -> None:
+    data = SAMPLE.read_bytes()
+    with _Server({"/a.pptx": data}) as server:
+        server.drop_after[2 * SEGMENT] = 40000  # 第 3 个分段传到一半连接断开
+        result = _download(server, "/a.pptx", tmp_path, parallel=4)
+
+    assert (tmp_path / "out.pptx").read_bytes() == data
+    assert result.ranged and result.segments == -(-len(data) // SEGMENT)
+    # 首个请求取第一个分段，第二个请求即取末尾的中央目录
+    tail_start = len(data) - downloader._TAIL_BYTES
+    assert server.requests[1] == f"bytes={tail_start}-{len(data) - 1}"
+    # 断开后从已收到的位置续传，而不是重新请求整个分段
+    starts = [int(r[6:].split("-")[0]) for r in server.requests]
+    assert any(s % SEGMENT and s != tail_start for s in starts)
+    assert list((tmp_path / "partial").iterdir()) == []
+    # 下载结束后不再保留该 URL 的锁
+    assert len(downloader._partial_locks) == 0
+
+
+def test_resume_after_failed_download(tmp_path) -> None:
+    data = SAMPLE.read_bytes()
+    with _Server({"/a.pptx": data}) as server:
+        server.fail_from = 6
+        with pytest.raises(DownloadError):
+            _download(server, "/a.pptx", tmp_path, parallel=1, retries=0)
+        assert not (tmp_path / "out.pptx").exists()
+
+        server.fail_from = None
+        sent_before = server.bytes_sent
+        result = _download(server, "/a.pptx", tmp_path, parallel=2)
+        second_run = server.bytes_sent - sent_before
+
+    assert (tmp_path / "out.pptx").read_bytes() == data
+    assert result.resumed_bytes >= 4 * SEGMENT
+    assert second_run <= len(data) - result.resumed_bytes + downloader._TAIL_BYTES + 1
+
+
+def test_rejects_non_pptx_early(tmp_path) -> None:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as z:
+        z.writestr("[Content_Types].xml", "<Types/>")
+        z.writestr("word/document.xml", b"x" * (40 * SEGMENT))
+    docx = buf.getvalue()
+
+    with _Server({"/fake.pptx": docx, "/page.pptx": b"<html>not found</html>"}) as server:
+        with pytest.raises(InvalidPackage):
+            _download(server, "/fake.pptx", tmp_path, parallel=2)
+        # 末尾的中央目录先到，其余分段被取消
+        assert server.bytes_sent < len(docx) // 2
+
+        server.ranges = False
+        with pytest.raises(InvalidPackage):
+            _download(server, "/page.pptx", tmp_path)
+
+    assert not (tmp_path / "out.pptx").exists()
+    assert list((tmp_path / "partial").iterdir()) == []
+
+
+def test_sequential_when_ranges_unsupported(tmp_path) -> None:
+    data = SAMPLE.read_bytes()
+    with _Server({"/a.pptx": data}, ranges=False) as server:
+        result = _download(server, "/a.pptx", tmp_path)
+
+    assert not result.ranged
+    assert (tmp_path / "out.pptx").read_bytes() == data
+    assert len(server.requests) == 1
+
+
+def test_invalid_url_and_redirect_loop_raise_download_error(tmp_path) -> None:
+    with pytest.raises(DownloadError, match="URL 无效"):
+        asyncio.run(download_file("http://[::1/x.pptx", tmp_path / "out.pptx", tmp_path / "partial", max_bytes=1024))
+
+    with _Server({}) as server:
+        server.redirects = {"/a.pptx": "/b.pptx", "/b.pptx": "/a.pptx"}
+        with pytest.raises(DownloadError):
+            _download(server, "/a.pptx", tmp_path)
+        # 重定向过多不属于可重试的错误
+        assert len(server.requests) == 21
+
+    assert not (tmp_path / "out.pptx").exists()
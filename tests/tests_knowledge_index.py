@@ -0,0 +1,77 @@
+"""本地离线知识索引：dump 导入、中英文检索与 external_knowledge 优先查本地的测试。"""
+
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+from core import external_knowledge, knowledge_index
+from core.knowledge_index import KnowledgeDoc, KnowledgeIndex
+
+
+ARXIV_LINES = [
+    {"id": "1412.6980", "title": "Adam: A Method for\n  Stochastic Optimization", "abstract": "We introduce Adam, an algorithm for first-order gradient-based optimization.", "categories": "cs.LG"},
+    {"id": "1706.03762", "title": "Attention Is All You Need", "abstract": "The dominant sequence transduction models ...", "categories": "cs.CL cs.LG"},
+    {"id": "hep-th/9901001", "title": "String theory", "abstract": "Physics.", "categories": "hep-th"},
+]
+
+WIKI_XML = """<feed>
+<doc><title>Wikipedia: 梯度下降法</title><url>https://zh.wikipedia.org/wiki/梯度下降法</url>
+<abstract>梯度下降法是一个一阶最优化算法，通常也称为最陡下降法。</abstract></doc>
+<doc><title>Wikipedia: 卷积神经网络</title><url>https://zh.wikipedia.org/wiki/卷积神经网络</url>
+<abstract>卷积神经网络是一种前馈神经网络，对于大型图像处理有出色表现。</abstract></doc>
+</feed>"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    arxiv_path = tmp_path / "arxiv.json"
+    arxiv_path.write_text("\n".join(json.dumps(x) for x in ARXIV_LINES), encoding="utf-8")
+    wiki_path = tmp_path / "zhwiki-abstract.xml.gz"
+    with gzip.open(wiki_path, "wt", encoding="utf-8") as f:
+        f.write(WIKI_XML)
+
+    idx = KnowledgeIndex(tmp_path / "knowledge.sqlite3")
+    idx.add_documents(knowledge_index.iter_arxiv_metadata(arxiv_path, categories=["cs."]))
+    idx.add_documents(knowledge_index.iter_wikipedia_abstracts(wiki_path))
+    yield idx
+    idx.close()
+
+
+def test_import_and_search(index) -> None:
+    assert index.count() == 4
+
+    hits = index.search("第 3 节：梯度下降", max_results=3)
+    assert [h[1] for h in hits] == ["梯度下降法"]
+    assert index.search("adam optimization")[0][1] == "Adam: A Method for Stochastic Optimization"
+    # 只共享个别常见字的结果会被覆盖率过滤掉
+    assert index.search("下载网络图片") == []
+
+    # 重复导入同一条目即更新
+    index.add_documents([KnowledgeDoc("wikipedia", "https://zh.wikipedia.org/wiki/梯度下降法", "梯度下降", "新的摘要")])
+    assert index.count() == 4
+    assert index.search("梯度下降")[0][2] == "新的摘要"
+    assert index.search("最陡下降法") == []
+
+
+def test_external_knowledge_prefers_local_index(index, monkeypatch) -> None:
+    requested = []
+    monkeypatch.setattr(external_knowledge.requests, "get", lambda *a, **k: requested.append(a) or 1 / 0)
+    knowledge_index.configure_knowledge_index(index.path)
+    try:
+        res = external_knowledge.search_external_knowledge("卷积神经网络", max_results=2)
+        assert res == ["【卷积神经网络】卷积神经网络是一种前馈神经网络，对于大型图像处理有出色表现。"]
+        assert external_knowledge.search_external_knowledge("Attention")[0].startswith("【arXiv: Attention")
+        assert requested == []
+
+        # 本地未命中时才访问网络；KNOWLEDGE_ONLY 时不访问
+        assert external_knowledge.search_external_knowledge("量子计算") == []
+        assert len(requested) == 1
+        for flag in ("1", "true", "ON"):
+            monkeypatch.setenv(external_knowledge.KNOWLEDGE_ONLY_ENV, flag)
+            assert external_knowledge.search_external_knowledge("量子计算") == []
+        assert len(requested) == 1
+    finally:
+        knowledge_index.configure_knowledge_index()
@@ -0,0 +1,93 @@
+"""PPT 生命周期（淘汰策略、向量删除与压缩）的单元测试。"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+from benchmarks._offline import HashEmbeddingFunction
+from core import vector_store
+from core.lifecycle import DeckActivity
+from core.ppt_parser import Slide
+
+
+def test_select_evictions_ttl_and_lru() -> None:
+    activity = DeckActivity()
+    activity.touch("a", now=0)
+    activity.touch("b", now=50)
+    activity.touch("c", now=90)
+    activity.touch("a", now=95)  # a 重新被访问，变为最新
+
+    assert activity.select_evictions(ttl_seconds=30, now=100) == ["b"]
+    assert activity.select_evictions(max_decks=1, now=100) == ["b", "c"]
+    assert activity.select_evictions(now=100) == []
+    # 不在内存中的 ppt_id 不计入总数
+    assert activity.select_evictions(max_decks=1, now=100, live={"a", "c"}) == ["c"]
+
+    activity.forget("b")
+    assert len(activity) == 2
+
+
+def test_delete_and_compact(offline_store, caplog) -> None:
+    for n in range(5):
+        slides = [Slide(index=i, title=f"deck{n} slide{i}", bullets=["要点"]) for i in range(1, 4)]
+        vector_store.index_slides(slides, ppt_id=f"deck{n}")
+
+    deleted = vector_store.delete_deck_vectors(["deck0", "deck1", "deck2"])
+    assert deleted == 9
+
+    # 只清理以 UUID 命名、且已不在 segments 表中的段目录；其他目录不受影响
+    stray = vector_store.CHROMA_DIR / "00000000-0000-4000-8000-000000000000"
+    unrelated = vector_store.CHROMA_DIR / "backup"
+    for d in (stray, unrelated):
+        d.mkdir()
+        (d / "data.bin").write_bytes(b"x")
+
+    with caplog.at_level("INFO", logger="core.vector_store"):
+        report = vector_store.compact_vector_store()
+    assert report["kept_vectors"] == 6
+    assert report["bytes_after"] <= report["bytes_before"]
+    assert (unrelated / "data.bin").exists()
+    if vector_store.vector_backend() == "chroma":
+        assert not stray.exists() and str(stray) in caplog.text
+
+    remaining = vector_store.get_slides_collection().get(include=["metadatas"])
+    assert sorted({m["ppt_id"] for m in remaining["metadatas"]}) == ["deck3", "deck4"]
+    hits = vector_store.query_similar_slides("deck4 slide2", n_results=1)
+    assert hits["ids"][0] == ["deck4-2"]
+
+
+class _SlowEmbedding(HashEmbeddingFunction):
+    """含“慢”字的文本嵌入耗时 0.5 秒，模拟大 PPT 入库。"""
+
+    def __call__(self, input):
+        if any("慢" in text for text in input):
+            time.sleep(0.5)
+        return super().__call__(input)
+
+
+def test_queries_not_blocked_by_indexing(offline_store) -> None:
+    vector_store.configure_vector_store(embedding_function=_SlowEmbedding())
+    vector_store.index_slides([Slide(index=1, title="快速检索", bullets=["要点"])], ppt_id="fast")
+
+    slow = threading.Thread(
+        target=vector_store.index_slides,
+        args=([Slide(index=1, title="慢速入库", bullets=["要点"])],),
+        kwargs={"ppt_id": "slow"},
+    )
+    slow.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    assert vector_store.query_similar_slides("快速检索", n_results=1, ppt_id="fast")["ids"][0] == ["fast-1"]
+    assert time.perf_counter() - start < 0.3
+    slow.join()
+
+    # 压缩持独占锁：要等正在进行的检索结束，之后的检索也要等压缩完成
+    done = threading.Event()
+    with vector_store._store_lock.shared():
+        compact = threading.Thread(target=lambda: (vector_store.compact_vector_store(), done.set()))
+        compact.start()
+        assert not done.wait(0.2)
+    compact.join()
+    assert done.is_set()
+    assert vector_store.query_similar_slides("慢速入库", n_results=1, ppt_id="slow")["ids"][0] == ["slow-1"]
@@ -0,0 +1,47 @@
+"""Prometheus 风格指标 (core.metrics) 的单元测试。"""
+
+from __future__ import annotations
+
+from core import metrics
+
+
+def test_histogram_buckets_and_render() -> None:
+    hist = metrics.Histogram("test_stage_seconds", "test histogram", buckets=(0.1, 1.0))
+    try:
+        hist.observe(0.05, stage="parse")
+        hist.observe(0.1, stage="parse")
+        hist.observe(3.0, stage="parse")
+
+        text = metrics.render_prometheus()
+        assert "# TYPE test_stage_seconds histogram" in text
+        assert 'test_stage_seconds_bucket{stage="parse",le="0.1"} 2' in text
+        assert 'test_stage_seconds_bucket{stage="parse",le="1.0"} 2' in text
+        assert 'test_stage_seconds_bucket{stage="parse",le="+Inf"} 3' in text
+        assert 'test_stage_seconds_count{stage="parse"} 3' in text
+    finally:
+        metrics._REGISTRY.remove(hist)
+
+
+def test_counter_gauge_and_timed() -> None:
+    counter = metrics.Counter("test_hits_total", "test counter")
+    gauge = metrics.Gauge("test_inflight", "test gauge")
+    try:
+        counter.inc(result="hit")
+        counter.inc(2, result="hit")
+        assert counter.value(result="hit") == 3
+
+        with gauge.track_inprogress(route="/expand"):
+            assert gauge.value(route="/expand") == 1
+        assert gauge.value(route="/expand") == 0
+    finally:
+        metrics._REGISTRY.remove(counter)
+        metrics._REGISTRY.remove(gauge)
+
+    before = metrics.STAGE_SECONDS.count(stage="unit_test")
+
+    @metrics.timed("unit_test")
+    def work() -> int:
+        return 42
+
+    assert work() == 42
+    assert metrics.STAGE_SECONDS.count(stage="unit_test") == before + 1
@@ -0,0 +1,62 @@
+"""扩展笔记持久化存储 (note_store) 的单元测试。"""
+
+from __future__ import annotations
+
+from core import note_store
+
+
+def _use_tmp_store(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(note_store, "NOTES_DIR", tmp_path / "notes")
+    monkeypatch.setattr(note_store, "_cache", {})
+
+
+def test_save_and_get_note(tmp_path, monkeypatch) -> None:
+    _use_tmp_store(tmp_path, monkeypatch)
+
+    assert note_store.get_note("deck", 1) is None
+    note_store.save_note("deck", 1, "# 笔记 1")
+
+    assert note_store.get_note("deck", 1) == "# 笔记 1"
+    # 生成配置不一致时不复用
+    assert note_store.get_note("deck", 1, use_wikipedia=False) is None
+
+    # 两种配置分别保存，互不覆盖；整份读取时优先返回默认配置的笔记
+    note_store.save_note("deck", 1, "# 无外部知识 1", use_wikipedia=False)
+    note_store.save_note("deck", 2, "# 无外部知识 2", use_wikipedia=False)
+    monkeypatch.setattr(note_store, "_cache", {})
+    assert note_store.get_note("deck", 1) == "# 笔记 1"
+    assert note_store.get_note("deck", 1, use_wikipedia=False) == "# 无外部知识 1"
+    assert note_store.load_deck_notes("deck") == {1: "# 笔记 1", 2: "# 无外部知识 2"}
+    assert note_store.load_deck_notes("deck", use_wikipedia=True) == {1: "# 笔记 1"}
+
+
+def test_notes_survive_cache_reset(tmp_path, monkeypatch) -> None:
+    """写盘后清空内存缓存，整份笔记仍可一次性读回。"""
+
+    _use_tmp_store(tmp_path, monkeypatch)
+    flushes = []
+    flush = note_store._flush_locked
+    monkeypatch.setattr(note_store, "_flush_locked", lambda ppt_id: (flushes.append(ppt_id), flush(ppt_id)))
+    # 一组页面只写一次盘
+    note_store.save_notes("deck", {2: "b", 1: "a"})
+    assert flushes == ["deck"]
+
+    monkeypatch.setattr(note_store, "_cache", {})
+    assert note_store.load_deck_notes("deck") == {1: "a", 2: "b"}
+
+    note_store.delete_deck_notes("deck")
+    assert note_store.load_deck_notes("deck") == {}
+    assert not (tmp_path / "notes" / "deck.json").exists()
+
+
+def test_remap_keeps_only_carried_notes(tmp_path, monkeypatch) -> None:
+    """重新上传后：未变化的页面沿用笔记（可换位置），修改过的页面丢弃。"""
+
+    _use_tmp_store(tmp_path, monkeypatch)
+    for idx in (1, 2, 3):
+        note_store.save_note("deck", idx, f"note-{idx}")
+
+    kept = note_store.remap_deck_notes("deck", {1: 1, 3: 2})
+
+    assert kept == 2
+    assert note_store.load_deck_notes("deck") == {1: "note-1", 3: "note-2"}
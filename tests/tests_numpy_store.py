@@ -0,0 +1,78 @@
+"""NumPy 向量后端：与 Chroma 检索结果一致、内存映射存储与增删改的测试。"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from benchmarks._offline import HashEmbeddingFunction
+from core import numpy_store, vector_store
+from core.ppt_parser import Slide
+
+
+def _deck(n: int, topic: str) -> list[Slide]:
+    return [
+        Slide(index=i, title=f"{topic} 第 {i} 节", bullets=[f"{topic} 要点 {i}-{j}" for j in range(3)])
+        for i in range(1, n + 1)
+    ]
+
+
+def _use_backend(monkeypatch, path, backend: str) -> None:
+    monkeypatch.setattr(vector_store, "_client", None)
+    monkeypatch.setattr(vector_store, "_backend", None)
+    monkeypatch.setattr(vector_store, "_embedding_function", vector_store._embedding_function)
+    monkeypatch.setattr(vector_store, "CHROMA_DIR", vector_store.CHROMA_DIR)
+    vector_store.configure_vector_store(path=path, embedding_function=HashEmbeddingFunction(), backend=backend)
+
+
+def _results(query: str) -> dict:
+    vector_store.index_slides(_deck(12, "梯度下降"), ppt_id="a")
+    vector_store.index_slides(_deck(8, "卷积神经网络"), ppt_id="b")
+    deck = vector_store.query_similar_slides(query, n_results=4, ppt_id="b")
+    both = vector_store.query_across_shards(query, n_results=5, ppt_ids=["a", "b"])
+    chunks = vector_store.query_similar_chunks(query, n_slides=3, ppt_id="a", exclude_slides=[3])
+    return {
+        "deck": (deck["ids"][0], deck["distances"][0]),
+        "both": (both["ids"][0], both["distances"][0]),
+        "chunks": [(h.slide_index, h.chunks) for h in chunks],
+    }
+
+
+def test_matches_chroma_results(tmp_path, monkeypatch) -> None:
+    _use_backend(monkeypatch, tmp_path / "chroma", "chroma")
+    expected = _results("卷积神经网络 要点 3-1")
+    _use_backend(monkeypatch, tmp_path / "numpy", "numpy")
+    got = _results("卷积神经网络 要点 3-1")
+
+    for key in ("deck", "both"):
+        assert got[key][0] == expected[key][0]
+        np.testing.assert_allclose(got[key][1], expected[key][1], rtol=1e-4, atol=1e-5)
+    assert got["chunks"] == expected["chunks"] and 3 not in [i for i, _ in got["chunks"]]
+
+    # 每份 PPT 一个连续矩阵，检索时内存映射打开
+    collection = vector_store.get_slides_collection("ppt_slides")
+    deck = collection._load(numpy_store._deck_key("a"))
+    assert isinstance(deck.vectors, np.memmap) and deck.vectors.shape == (12, HashEmbeddingFunction.dim)
+    assert deck.vectors.flags["C_CONTIGUOUS"] and deck.vectors.dtype == np.float32
+
+
+def test_float16_update_delete_and_compact(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv(numpy_store.NUMPY_DTYPE_ENV, "float16")
+    _use_backend(monkeypatch, tmp_path / "store", "numpy")
+    vector_store.index_slides(_deck(5, "激活函数"), ppt_id="a")
+    vector_store.index_slides(_deck(3, "损失函数"), ppt_id="b")
+    npy = tmp_path / "store" / "numpy" / "ppt_slides" / f"{numpy_store._deck_key('a')}.npy"
+    assert np.load(npy, mmap_mode="r").dtype == np.float16
+
+    new_deck = _deck(4, "激活函数")
+    new_deck[1] = Slide(index=2, title="ReLU", bullets=["max(0, x)"])
+    diff = vector_store.update_indexed_slides(new_deck, ppt_id="a")
+    assert (diff.updated, diff.removed) == ([2], [5])
+    hit = vector_store.query_similar_slides("ReLU\nmax(0, x)", n_results=1, ppt_id="a")
+    assert hit["ids"][0] == ["a-2"] and hit["distances"][0][0] == pytest.approx(0, abs=1e-3)
+
+    assert vector_store.delete_deck_vectors(["a"]) == 4
+    assert not npy.exists()
+    report = vector_store.compact_vector_store()
+    assert (report["kept_vectors"], report["kept_chunks"]) == (3, 3)
+    assert vector_store.query_similar_slides("损失函数", n_results=5)["ids"][0][0].startswith("b-")
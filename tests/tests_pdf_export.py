@@ -0,0 +1,70 @@
+"""PDF 导出 (pdf_export) 的单元测试：用线程池与假渲染函数替代 WeasyPrint 进程池。"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core import pdf_export
+
+
+@pytest.fixture
+def fake_renderer(monkeypatch):
+    calls: list[str] = []
+    release = threading.Event()
+    release.set()
+
+    def fake_render(document: str) -> bytes:
+        release.wait(5)
+        calls.append(document)
+        return b"%PDF-" + str(len(document)).encode()
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(pdf_export, "_render_in_worker", fake_render)
+    monkeypatch.setattr(pdf_export, "_get_pool", lambda: pool)
+    pdf_export.clear_pdf_cache()
+    yield calls, release
+    pool.shutdown(wait=True)
+    pdf_export.clear_pdf_cache()
+
+
+def test_identical_exports_render_once(fake_renderer) -> None:
+    calls, release = fake_renderer
+    document = pdf_export.build_note_html("# 梯度下降\n\n```python\nprint(1)\n```")
+
+    # 第一次渲染未完成时，相同内容的请求复用同一个任务
+    release.clear()
+    first = pdf_export.submit_render(document)
+    second = pdf_export.submit_render(document)
+    assert first is second
+    release.set()
+
+    assert first.result(5).startswith(b"%PDF-")
+    assert asyncio.run(pdf_export.render_pdf(document)) == first.result()
+    assert len(calls) == 1
+
+    asyncio.run(pdf_export.render_pdf(pdf_export.build_note_html("# 另一份笔记")))
+    assert len(calls) == 2
+
+
+def test_cache_respects_byte_limit(fake_renderer, monkeypatch) -> None:
+    calls, _ = fake_renderer
+    monkeypatch.setenv(pdf_export.PDF_CACHE_MB_ENV, "0")
+
+    document = pdf_export.build_note_html("不缓存")
+    asyncio.run(pdf_export.render_pdf(document))
+    asyncio.run(pdf_export.render_pdf(document))
+
+    assert len(calls) == 2
+
+
+def test_deck_html_keeps_slide_order() -> None:
+    document = pdf_export.build_deck_html(
+        [(1, "导言", "# 背景"), (3, "<卷积>", "- 要点")], title="课程笔记"
+    )
+
+    assert document.index("第 1 页：导言") < document.index("第 3 页：&lt;卷积&gt;")
+    assert document.count('<section class="slide-note">') == 2
@@ -0,0 +1,160 @@
+"""/expand 预取之后几页与相似页：命中、取消与按用户限额的测试。"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from backend import api
+from core import note_store, vector_store
+from core.metrics import NOTE_CACHE
+from core.ppt_parser import Slide, SlideDeck
+
+
+class _FakeAgent:
+    """后台线程中的生成在 gate 打开前阻塞，交互式请求直接返回。"""
+
+    def __init__(self) -> None:
+        self.gate = threading.Event()
+        self.interactive: list = []
+        self.background: list = []
+
+    def expand(self, slide, config=None, ppt_id=None) -> str:
+        if threading.current_thread().name.startswith("warm-notes"):
+            self.background.append(slide.index)
+            self.gate.wait(5)
+        else:
+            self.interactive.append(slide.index)
+        return f"{slide.title}笔记"
+
+
+@pytest.fixture
+def agent(api_client, monkeypatch):
+    monkeypatch.setattr(api, "PREFETCH_KEYS", {})
+
+    fake = _FakeAgent()
+    monkeypatch.setattr(api, "expand_slide_with_tools", fake.expand)
+    # 检索近邻时总是先返回当前页与第 5 页，再返回第 4 页
+    monkeypatch.setattr(
+        api,
+        "query_similar_slides",
+        lambda *a, **k: {"metadatas": [[{"slide_index": 5}, {"slide_index": 4}, {"slide_index": 9}]]},
+    )
+    slides = [Slide(index=i, title=f"第 {i} 页", bullets=[f"要点 {i}"]) for i in range(1, 10)]
+    monkeypatch.setitem(api.PPT_SLIDES, "deck", SlideDeck(slides))
+    yield fake
+    fake.gate.set()
+
+
+def _drain() -> None:
+    # 后台线程池只有一个线程且先进先出：两轮空任务可保证近邻检索及其提交的预取都已完成
+    for _ in range(2):
+        api._WARM_EXECUTOR.submit(lambda: None).result(timeout=5)
+
+
+def test_prefetch_next_and_neighbour_slides(agent, api_client) -> None:
+    client = api_client()
+    assert client.get("/expand", params={"ppt_id": "deck", "slide_index": 1}).status_code == 200
+
+    # 第 2 页生成中、第 3 页排队时用户跳到第 5 页：第 3 页被取消，第 1 页的近邻检索作废
+    client.get("/expand", params={"ppt_id": "deck", "slide_index": 5})
+    agent.gate.set()
+    _drain()
+
+    assert agent.interactive == [1, 5]
+    assert agent.background == [2, 6, 7, 4]
+    assert sorted(note_store.load_deck_notes("deck")) == [1, 2, 4, 5, 6, 7]
+    assert api.NOTE_FUTURES == {} and api.PREFETCH_KEYS == {}
+
+    # 下一次点击直接命中预取的结果
+    resp = client.get("/expand", params={"ppt_id": "deck", "slide_index": 6})
+    assert resp.json()["expanded_markdown"] == "第 6 页笔记"
+    assert agent.interactive == [1, 5]
+
+
+def test_prefetch_budget_and_cancel(agent, api_client, monkeypatch) -> None:
+    monkeypatch.setenv(api.PREFETCH_BUDGET_ENV, "2")
+    alice, bob = api_client("alice"), api_client("bob")
+
+    alice.get("/expand", params={"ppt_id": "deck", "slide_index": 1})
+    assert {key[1] for key in api.PREFETCH_KEYS["alice"]} == {2, 3}
+    # 限额按用户计算
+    bob.get("/expand", params={"ppt_id": "deck", "slide_index": 7})
+    assert {key[1] for key in api.PREFETCH_KEYS["bob"]} == {8, 9}
+
+    # 取消排队中的预取与尚未执行的近邻检索；生成中的第 2 页照常完成
+    assert alice.delete("/prefetch").json() == {"cancelled": 1}
+    assert bob.delete("/prefetch").json() == {"cancelled": 2}
+    agent.gate.set()
+    _drain()
+
+    assert agent.background == [2]
+    assert sorted(note_store.load_deck_notes("deck")) == [1, 2, 7]
+
+    # 关闭外部知识的请求不预取
+    alice.get("/expand", params={"ppt_id": "deck", "slide_index": 3, "use_wikipedia": False})
+    assert "alice" not in api.PREFETCH_KEYS
+
+
+def test_running_prefetch_not_saved_after_change_or_delete(agent, api_client) -> None:
+    client = api_client()
+    client.get("/expand", params={"ppt_id": "deck", "slide_index": 1})
+
+    # 第 2 页生成中、第 3 页排队时重新上传改动了第 2 页：第 2 页的结果丢弃，未变的第 3 页照常保存
+    changed = [Slide(index=i, title=f"第 {i} 页", bullets=[f"要点 {i}"]) for i in range(1, 10)]
+    changed[1] = Slide(index=2, title="第 2 页（新版）", bullets=["新要点"])
+    api.PPT_SLIDES["deck"] = SlideDeck(changed)
+    agent.gate.set()
+    _drain()
+    assert agent.background[:2] == [2, 3]
+    assert 2 not in note_store.load_deck_notes("deck") and 3 in note_store.load_deck_notes("deck")
+
+    # 生成中途 PPT 被删除：结果不再写回
+    agent.gate.clear()
+    client.get("/expand", params={"ppt_id": "deck", "slide_index": 6})
+    with api._NOTE_SAVE_LOCK:
+        api.PPT_SLIDES.pop("deck")
+        note_store.delete_deck_notes("deck")
+    agent.gate.set()
+    _drain()
+    assert 7 in agent.background and note_store.load_deck_notes("deck") == {}
+
+
+def test_expand_waits_for_regenerated_slide_after_reupload(
+    offline_store, agent, api_client, tmp_path, monkeypatch
+) -> None:
+    monkeypatch.setattr(api, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(api, "DECK_OWNERS", {})
+    monkeypatch.setattr(api, "DECK_ACTIVITY", api.DeckActivity())
+    api.UPLOAD_DIR.mkdir()
+    vector_store.index_slides(list(api.PPT_SLIDES["deck"]), ppt_id="deck")
+    client = api_client()
+    client.get("/expand", params={"ppt_id": "deck", "slide_index": 1})
+
+    # 第 2 页的预取生成中时重新上传改动了第 2 页：旧任务无法取消，按新内容重新提交
+    changed = [Slide(index=i, title=f"第 {i} 页", bullets=[f"要点 {i}"]) for i in range(1, 10)]
+    changed[1] = Slide(index=2, title="第 2 页（新版）", bullets=["新要点"])
+    (tmp_path / "new.pptx").write_bytes(b"")
+    api._store_deck("deck", tmp_path / "new.pptx", changed, "deck.pptx", False, "alice")
+    assert api._note_key("deck", changed[1]) in api.NOTE_FUTURES
+
+    # /expand 等待的是新内容的生成，而不是仍在运行的旧任务
+    waiting = NOTE_CACHE.value(result="pending")
+    result = {}
+    expand = threading.Thread(
+        target=lambda: result.update(client.get("/expand", params={"ppt_id": "deck", "slide_index": 2}).json())
+    )
+    expand.start()
+    for _ in range(500):
+        if NOTE_CACHE.value(result="pending") > waiting:
+            break
+        time.sleep(0.01)
+    agent.gate.set()
+    expand.join(5)
+    _drain()
+
+    assert result["expanded_markdown"] == "第 2 页（新版）笔记"
+    assert agent.interactive == [1] and agent.background.count(2) == 2
+    assert note_store.load_deck_notes("deck")[2] == "第 2 页（新版）笔记"
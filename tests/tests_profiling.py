@@ -0,0 +1,86 @@
+"""按请求采样剖析：管理员令牌触发、按百分比随机触发与 folded stacks 输出的测试。"""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from backend import api
+from core import auth, profiling
+
+
+def _busy_evict() -> list:
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    return []
+
+
+@pytest.fixture
+def client(api_client, tmp_path, monkeypatch):
+    monkeypatch.setenv(api.PRELOAD_ENV, "0")
+    monkeypatch.setenv(profiling.PROFILE_TOKEN_ENV, "admin-secret")
+    monkeypatch.setenv(auth.ADMIN_TOKEN_ENV, "maintenance-secret")
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path / "profiles"))
+    monkeypatch.setenv(profiling.PROFILE_INTERVAL_MS_ENV, "2")
+    monkeypatch.setattr(api, "evict_inactive_decks", _busy_evict)
+    profiling.PROFILES.clear()
+    with api_client() as test_client:
+        # /maintenance/evict 需要管理员令牌；是否剖析只看 X-Profile-Token
+        test_client.headers["X-Admin-Token"] = "maintenance-secret"
+        yield test_client
+    profiling.PROFILES.clear()
+
+
+def test_admin_token_profiles_request(client, tmp_path) -> None:
+    resp = client.post("/maintenance/evict", headers={"X-Profile-Token": "admin-secret"})
+    assert resp.status_code == 200
+    profile_id = resp.headers["X-Profile-Id"]
+
+    folded = client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile-Token": "admin-secret"}).text
+    lines = folded.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    # 线程池中执行的函数计入该请求，根节点为 “方法 路由模板;线程角色”
+    busy = [line for line in lines if "_busy_evict (tests/tests_profiling.py" in line]
+    assert busy and all(line.startswith("POST /maintenance/evict;worker;") for line in busy)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in busy) >= 10
+    assert (tmp_path / "profiles" / f"{profile_id}.folded").read_text(encoding="utf-8") == folded
+
+    # 令牌错误或放在查询参数中时不剖析；剖析结果仅管理员可见
+    resp = client.post("/maintenance/evict", headers={"X-Profile-Token": "wrong"})
+    assert resp.status_code == 200 and "X-Profile-Id" not in resp.headers
+    resp = client.post("/maintenance/evict", params={"profile": "admin-secret"})
+    assert resp.status_code == 200 and "X-Profile-Id" not in resp.headers
+    assert client.get("/debug/profiles").status_code == 403
+    assert client.get("/debug/profiles", headers={"X-Profile-Token": "wrong"}).status_code == 403
+    assert client.get("/debug/profiles", params={"profile": "admin-secret"}).status_code == 403
+
+
+def test_sample_percent_and_merge(client, monkeypatch) -> None:
+    admin = {"X-Profile-Token": "admin-secret"}
+    for _ in range(2):
+        client.post("/maintenance/evict")
+    assert client.get("/debug/profiles", headers=admin).json() == {"profiles": []}
+
+    monkeypatch.setenv(profiling.PROFILE_SAMPLE_PERCENT_ENV, "100")
+    for _ in range(2):
+        resp = client.post("/maintenance/evict")
+        assert "X-Profile-Id" not in resp.headers
+    monkeypatch.delenv(profiling.PROFILE_SAMPLE_PERCENT_ENV)
+
+    listed = client.get("/debug/profiles", params={"route": "/maintenance/evict"}, headers=admin).json()["profiles"]
+    assert [(p["route"], p["reason"]) for p in listed] == [("/maintenance/evict", "sampled")] * 2
+
+    merged = client.get("/debug/profiles", params={"merge": "true"}, headers=admin).text
+    busy = sum(int(line.rsplit(" ", 1)[1]) for line in merged.splitlines() if "_busy_evict" in line)
+    assert busy == sum(
+        int(line.rsplit(" ", 1)[1])
+        for p in listed
+        for line in profiling.read_profile(p["id"]).splitlines()
+        if "_busy_evict" in line
+    )
+
+    monkeypatch.setenv(profiling.PROFILE_KEEP_ENV, "1")
+    client.post("/maintenance/evict", headers=admin)
+    assert len(client.get("/debug/profiles", headers=admin).json()["profiles"]) == 1
@@ -0,0 +1,44 @@
+"""紧凑的 Slide / SlideDeck 表示的单元测试。"""
+
+from __future__ import annotations
+
+import dataclasses
+
+import pytest
+
+from core.ppt_parser import Slide, SlideDeck
+
+
+def _slides() -> list[Slide]:
+    return [
+        Slide(index=1, title="导言", bullets=["课程目标", "页脚"]),
+        Slide(index=2, title="空白页", bullets=[], notes="讲者备注"),
+        Slide(index=4, title="总结", bullets=["页脚", ""], notes=""),
+    ]
+
+
+def test_slide_is_compact_and_accepts_lists() -> None:
+    slide = Slide(index=1, title="t", bullets=["a", "b"])
+
+    assert slide.bullets == ("a", "b")
+    assert not hasattr(slide, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        slide.title = "x"  # type: ignore[misc]
+
+
+def test_deck_behaves_like_list_of_slides() -> None:
+    slides = _slides()
+    deck = SlideDeck(slides)
+
+    assert len(deck) == 3
+    assert list(deck) == slides
+    assert deck[-1] == slides[-1]
+    assert deck[1:] == slides[1:]
+    with pytest.raises(IndexError):
+        deck[3]
+
+    # 页码不连续时也能按 Slide.index 取页
+    assert deck.get_by_index(4) == slides[2]
+    assert deck.get_by_index(3) is None
+    # 重复文本只保存一份
+    assert deck._text.count("页脚") == 1
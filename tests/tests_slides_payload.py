@@ -0,0 +1,52 @@
+"""/slides 预序列化响应、ETag 条件请求与分页的测试。"""
+
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+from backend import api
+from core.ppt_parser import Slide, SlideDeck
+
+
+@pytest.fixture
+def client(api_client, monkeypatch):
+    slides = [Slide(index=i, title=f"第 {i} 页", bullets=[f"要点 {i}"] * 20) for i in range(1, 8)]
+    monkeypatch.setitem(api.PPT_SLIDES, "deck", SlideDeck(slides))
+    monkeypatch.setitem(api.SLIDES_PAYLOADS, "deck", api.build_slides_payload(slides))
+
+    return api_client()
+
+
+def test_slides_etag_and_304(client) -> None:
+    first = client.get("/slides", params={"ppt_id": "deck"}, headers={"Accept-Encoding": "identity"})
+    assert first.status_code == 200
+    assert [s["index"] for s in first.json()] == list(range(1, 8))
+    etag = first.headers["ETag"]
+
+    again = client.get("/slides", params={"ppt_id": "deck"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_slides_gzip_matches_plain_body() -> None:
+    slides = [Slide(index=i, title="标题", bullets=["内容" * 50]) for i in range(1, 4)]
+    payload = api.build_slides_payload(slides)
+
+    assert payload.gzip_body is not None
+    assert gzip.decompress(payload.gzip_body) == payload.body
+    assert json.loads(payload.body)[0]["bullets"] == ["内容" * 50]
+
+
+def test_slides_pagination(client) -> None:
+    resp = client.get("/slides", params={"ppt_id": "deck", "offset": 2, "limit": 3})
+
+    assert resp.status_code == 200
+    assert [s["index"] for s in resp.json()] == [3, 4, 5]
+    assert resp.headers["X-Total-Count"] == "7"
+
+    tail = client.get("/slides", params={"ppt_id": "deck", "offset": 6, "limit": 10})
+    assert [s["index"] for s in tail.json()] == [7]
+    assert client.get("/slides", params={"ppt_id": "deck", "offset": 9}).json() == []
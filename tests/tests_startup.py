@@ -0,0 +1,53 @@
+"""延迟加载与就绪检查的测试。"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from backend import api
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_import_does_not_load_heavy_dependencies() -> None:
+    code = (
+        "import sys, backend.api\n"
+        "print(sorted(m for m in ('chromadb', 'langchain_openai', 'weasyprint', 'pptx', 'markdown') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, timeout=120
+    )
+
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == "[]"
+
+
+def test_ready_reports_starting_then_ready(monkeypatch) -> None:
+    calls = []
+
+    def fake_preload():
+        calls.append(1)
+        return {"vector_store": True, "llm_client": len(calls) > 1}
+
+    monkeypatch.setattr(api, "_preload_dependencies", fake_preload)
+    monkeypatch.setattr(api, "_preload_task", None)
+    client = TestClient(api.app)
+
+    assert client.get("/health").json() == {"status": "ok"}
+
+    statuses = []
+    for _ in range(200):
+        resp = client.get("/ready")
+        statuses.append(resp.json()["status"])
+        if resp.status_code == 200:
+            break
+
+    # 第一次检查失败（unavailable）后会重新检查，第二次通过
+    assert "unavailable" in statuses
+    assert statuses[-1] == "ready"
+    assert len(calls) == 2
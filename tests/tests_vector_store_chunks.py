@@ -0,0 +1,70 @@
+"""要点级 chunk 索引：拆分、按页聚合检索与随页面同步更新的测试。"""
+
+from __future__ import annotations
+
+from core import llm_agent, vector_store
+from core.ppt_parser import Slide
+
+
+def _deck() -> list[Slide]:
+    return [
+        Slide(index=1, title="云计算概述", bullets=["IaaS 提供虚拟机", "PaaS 提供运行环境", "SaaS 提供应用"]),
+        Slide(index=2, title="虚拟化", bullets=["Hypervisor 管理虚拟机", "KVM 与 Xen"], notes="第一类与第二类\n性能对比"),
+        Slide(index=3, title="容器", bullets=["Docker 镜像分层", "Kubernetes 调度 Pod"]),
+    ]
+
+
+def _chunk_ids(ppt_id: str) -> list[str]:
+    got = vector_store.get_slides_collection("ppt_slides__chunks").get(where={"ppt_id": ppt_id}, include=[])
+    return sorted(got["ids"])
+
+
+def test_slide_to_chunks_packs_short_lines() -> None:
+    slide = Slide(index=7, title="标题", bullets=["短", "也短", "x" * 30, ""], notes="备注段落")
+
+    chunks = vector_store.slide_to_chunks(slide, max_chars=10)
+    assert [(c.kind, c.text) for c in chunks] == [
+        ("bullet", "短\n也短"),
+        ("bullet", "x" * 30),
+        ("notes", "备注段落"),
+    ]
+    assert [c.chunk_no for c in chunks] == [0, 1, 2]
+    # 只有标题的页面以标题作为唯一 chunk
+    assert [c.kind for c in vector_store.slide_to_chunks(Slide(index=1, title="封面", bullets=[]))] == ["title"]
+
+
+def test_chunk_search_aggregates_to_slides(offline_store, monkeypatch) -> None:
+    monkeypatch.setenv(vector_store.CHUNK_MAX_CHARS_ENV, "1")
+    vector_store.index_slides(_deck(), ppt_id="deck")
+
+    hits = vector_store.query_similar_chunks("Kubernetes 调度 Pod", n_slides=2, ppt_id="deck", chunks_per_slide=1)
+    assert hits[0].slide_index == 3
+    assert hits[0].chunks == ["Kubernetes 调度 Pod"]
+    assert len(hits) == 2 and len({h.slide_index for h in hits}) == 2
+
+    excluded = vector_store.query_similar_chunks("Kubernetes 调度 Pod", n_slides=5, ppt_id="deck", exclude_slides=[3])
+    assert {h.slide_index for h in excluded} == {1, 2}
+
+    # Prompt 上下文只含相关页的要点，且不重复当前页
+    context = llm_agent.build_slide_context_from_retrieval(_deck()[2], top_k=1, ppt_id="deck", chunks_per_slide=1)
+    assert context.startswith("[相关页 index=")
+    assert "Kubernetes" not in context and context.count("\n") == 1
+
+
+def test_chunks_follow_incremental_update_and_delete(offline_store, monkeypatch) -> None:
+    monkeypatch.setenv(vector_store.CHUNK_MAX_CHARS_ENV, "1")
+    vector_store.index_slides(_deck(), ppt_id="deck")
+    assert len(_chunk_ids("deck")) == 9
+
+    new_deck = _deck()[:2]
+    new_deck[1] = Slide(index=2, title="虚拟化", bullets=["Hypervisor 管理虚拟机"])
+    vector_store.update_indexed_slides(new_deck, ppt_id="deck")
+    assert _chunk_ids("deck") == ["deck-1-c0", "deck-1-c1", "deck-1-c2", "deck-2-c0"]
+
+    report = vector_store.compact_vector_store()
+    assert report["kept_chunks"] == 4
+
+    assert vector_store.delete_deck_vectors(["deck"]) == 2
+    assert _chunk_ids("deck") == []
+    # 没有 chunk 时退回整页检索
+    assert vector_store.query_similar_chunks("虚拟化", ppt_id="deck") == []
@@ -0,0 +1,56 @@
+"""向量库增量更新 (update_indexed_slides) 的单元测试。"""
+
+from __future__ import annotations
+
+from core import vector_store
+from core.ppt_parser import Slide
+from core.vector_store import get_indexed_hashes, index_slides, update_indexed_slides
+
+
+def _deck() -> list[Slide]:
+    return [
+        Slide(index=1, title="云计算概述", bullets=["IaaS", "PaaS", "SaaS"]),
+        Slide(index=2, title="虚拟化", bullets=["Hypervisor"]),
+        Slide(index=3, title="容器", bullets=["Docker", "Kubernetes"]),
+    ]
+
+
+def test_index_slides_stores_content_hash(offline_store) -> None:
+    index_slides(_deck(), ppt_id="deck")
+
+    hashes = get_indexed_hashes("deck")
+    assert sorted(hashes) == [1, 2, 3]
+    assert all(len(h) == 40 for h in hashes.values())
+
+
+def test_update_only_touches_changed_slides(offline_store) -> None:
+    index_slides(_deck(), ppt_id="deck")
+
+    # 修正第 2 页的错别字，删除第 3 页
+    new_deck = _deck()[:2]
+    new_deck[1] = Slide(index=2, title="虚拟化技术", bullets=["Hypervisor"])
+    diff = update_indexed_slides(new_deck, ppt_id="deck")
+
+    assert diff.unchanged == [1]
+    assert diff.updated == [2]
+    assert diff.added == []
+    assert diff.removed == [3]
+    assert diff.carried == {1: 1}
+
+    got = vector_store.get_slides_collection().get(where={"ppt_id": "deck"})
+    assert sorted(got["ids"]) == ["deck-1", "deck-2"]
+
+
+def test_moved_slide_is_carried(offline_store) -> None:
+    """在开头插入新页后，原有页面整体后移，其笔记仍可按内容沿用。"""
+
+    index_slides(_deck(), ppt_id="deck")
+
+    shifted = [Slide(index=1, title="课程导言", bullets=[])]
+    shifted += [Slide(index=s.index + 1, title=s.title, bullets=s.bullets) for s in _deck()]
+    diff = update_indexed_slides(shifted, ppt_id="deck")
+
+    assert diff.carried == {2: 1, 3: 2, 4: 3}
+    assert diff.added == [4]
+    assert diff.removed == []
+    assert len(get_indexed_hashes("deck")) == 4
@@ -0,0 +1,64 @@
+"""向量库分片路由、跨分片检索与迁移的单元测试。"""
+
+from __future__ import annotations
+
+from core import vector_store
+from core.ppt_parser import Slide
+
+
+def _deck(tag: str) -> list[Slide]:
+    return [Slide(index=i, title=f"{tag} 第 {i} 页", bullets=[f"{tag} 要点 {i}"]) for i in range(1, 4)]
+
+
+def test_shard_collection_name(monkeypatch) -> None:
+    monkeypatch.setenv(vector_store.SHARD_BUCKETS_ENV, "4")
+
+    assert vector_store.shard_collection_name("deck", mode="none") == "ppt_slides"
+    hashed = vector_store.shard_collection_name("deck", mode="hash")
+    assert hashed.startswith("ppt_slides_h0") and hashed == vector_store.shard_collection_name("deck", mode="hash")
+    assert vector_store.shard_collection_name("deck", user="张三", mode="user").startswith("ppt_slides_u_")
+    # 缺少课程信息时退回默认 collection
+    assert vector_store.shard_collection_name("deck", mode="course") == "ppt_slides"
+
+
+def test_user_shards_and_fan_out(offline_store, monkeypatch) -> None:
+    monkeypatch.setenv(vector_store.SHARD_MODE_ENV, "user")
+
+    for ppt_id, user in (("a1", "alice"), ("a2", "alice"), ("b1", "bob")):
+        vector_store.assign_deck_shard(ppt_id, user=user)
+        vector_store.index_slides(_deck(ppt_id), ppt_id=ppt_id)
+
+    shards = vector_store.list_shard_collections()
+    assert len(shards) == 2
+    assert vector_store.shard_for_deck("a1") == vector_store.shard_for_deck("a2")
+    assert vector_store.shard_for_deck("a1") != vector_store.shard_for_deck("b1")
+
+    single = vector_store.query_similar_slides("b1 第 2 页", n_results=5, ppt_id="b1")
+    assert {m["ppt_id"] for m in single["metadatas"][0]} == {"b1"}
+
+    merged = vector_store.query_across_shards("第 2 页", n_results=4, ppt_ids=["a1", "b1"])
+    assert len(merged["ids"][0]) == 4
+    assert {m["ppt_id"] for m in merged["metadatas"][0]} <= {"a1", "b1"}
+    assert merged["distances"][0] == sorted(merged["distances"][0])
+
+    assert vector_store.delete_deck_vectors(["a1", "b1"]) == 6
+    assert vector_store.shard_for_deck("b1") == "ppt_slides"
+
+
+def test_migrate_single_collection(offline_store, monkeypatch) -> None:
+    for ppt_id in ("d1", "d2", "d3"):
+        vector_store.index_slides(_deck(ppt_id), ppt_id=ppt_id)
+    assert vector_store.list_shard_collections() == ["ppt_slides"]
+
+    monkeypatch.setenv(vector_store.SHARD_MODE_ENV, "hash")
+    monkeypatch.setenv(vector_store.SHARD_BUCKETS_ENV, "4")
+    moved = vector_store.migrate_to_shards()
+
+    assert sum(moved.values()) == 9
+    assert vector_store.get_slides_collection("ppt_slides").count() == 0
+    # 页内 chunk 随整页切片一起迁移
+    assert vector_store.get_slides_collection("ppt_slides__chunks").count() == 0
+    assert vector_store.query_similar_chunks("d2 要点 1", n_slides=1, ppt_id="d2")[0].slide_index == 1
+    for ppt_id in ("d1", "d2", "d3"):
+        hits = vector_store.query_similar_slides(f"{ppt_id} 第 1 页", n_results=1, ppt_id=ppt_id)
+        assert hits["ids"][0] == [f"{ppt_id}-1"]